@@ -0,0 +1,141 @@
+"""Binary archive of trajectories, one or many runs to a file, read by memory mapping.
+
+The file starts with a magic string. Each run follows as a block of contiguous
+columns, one per quantity in the order of trajectory.COLUMNS, little endian, each
+padded to 8 bytes. The index comes last, as JSON: for each run its name, the offset,
+sample count and dtype of its block, the stage parameters, the events and the
+summary. The file ends with the offset of the index and the magic string again,
+so runs are written one at a time without holding them, and the index is found
+without reading the rest.
+
+Reading maps the file into memory, so opening a large sweep archive reads only
+its index, and a column of one run is a view into the file that loads only the
+pages it touches. Runs read like a Trajectory: run['Height'] is the array."""
+
+import struct
+import json
+import numpy
+from sim import Simulation
+from events import Event
+from trajectory import COLUMNS
+
+MAGIC = 'IRBMARC1'
+VERSION = 1
+TRAILER = struct.Struct('<Q8s') #offset of the index, magic
+
+class ArchiveWriter(object):
+    "Writes runs to a new archive at path, one at a time; call close to finish it"
+    def __init__(self,path):
+        self.path = path
+        self.stream = open(path,'wb')
+        self.stream.write(MAGIC)
+        self.runs = []
+
+    def add(self,result,config,name=None):
+        """Appends the trajectory, events and summary of a SimResult and the stage
+        parameters of the SimConfig it was run from, named name or by its number"""
+        data = result.data
+        dtype = numpy.dtype(data.buffer.dtype).newbyteorder('<')
+        offset = self.stream.tell()
+        for row in range(len(COLUMNS)):
+            column = numpy.ascontiguousarray(data.buffer[row,:data.size],dtype=dtype)
+            column.tofile(self.stream)
+            self.stream.write('\0'*(-column.nbytes % 8))
+        sim = Simulation(config)
+        stages = []
+        for i in range(1,sim.numstages+1):
+            #as the text export writes them, thrust in N
+            stages.append({'fuelmass':sim.fuelmass[i],'drymass':sim.m0[i] - sim.fuelmass[i],
+                'fuelfraction':sim.fuelfraction[i],'Isp0':sim.Isp0[i],'thrust':sim.thrust0[i],'dMdt':sim.dMdt[i],
+                'burntime':sim.Isp0[i]*9.81*sim.fuelmass[i]/sim.thrust0[i]})
+        parameters = {'payload':float(config.payload),'missilediam':float(config.missilediam),
+            'rvdiam':float(config.rvdiam),'estrange':float(config.estrange),'trajectory':config.trajectory,
+            'integrator':config.integrator,'burnout_angle':config.burnout_angle}
+        events = [[event.kind,event.t,event.h,event.v,event.gamma,event.range,event.m,event.stage]
+            for event in result.events]
+        summary = {'range':result.range,'apogee':result.apogee,'velocity':result.velocity,
+            'flight_time':result.flight_time,'timed_out':bool(result.timed_out),'steps':result.steps}
+        if name is None:
+            name = str(len(self.runs))
+        run = {'name':name,'offset':offset,'count':data.size,'dtype':dtype.str,
+            'stages':stages,'parameters':parameters,'events':events,'summary':summary}
+        if result.profile is not None:
+            run['profile'] = result.profile.to_dict()
+        self.runs.append(run)
+
+    def close(self):
+        "Writes the index and closes the file"
+        index = json.dumps({'version':VERSION,'columns':list(COLUMNS),'runs':self.runs})
+        offset = self.stream.tell()
+        self.stream.write(index)
+        self.stream.write(TRAILER.pack(offset,MAGIC))
+        self.stream.close()
+
+def write(path,runs):
+    "Writes an archive of runs, a list of (result, config) or (result, config, name)"
+    writer = ArchiveWriter(path)
+    try:
+        for run in runs:
+            writer.add(*run)
+    finally:
+        writer.close()
+
+class Archive(object):
+    """An archive opened for reading: runs by number or name, archive[i] or archive['name'].
+    Raises ValueError if path is not an archive."""
+    def __init__(self,path):
+        self.path = path
+        self.memory = numpy.memmap(path,dtype=numpy.uint8,mode='r')
+        if len(self.memory) < len(MAGIC) + TRAILER.size or self.memory[:len(MAGIC)].tostring() != MAGIC:
+            raise ValueError("%s is not a trajectory archive" % path)
+        offset,magic = TRAILER.unpack(self.memory[-TRAILER.size:].tostring())
+        if magic != MAGIC:
+            raise ValueError("%s is not a complete trajectory archive" % path)
+        index = json.loads(self.memory[offset:-TRAILER.size].tostring())
+        if index['version'] > VERSION:
+            raise ValueError("%s is from a newer version, %i" % (path,index['version']))
+        self.columns = [str(column) for column in index['columns']]
+        self.runs = [ArchivedRun(self,entry) for entry in index['runs']]
+        self.names = dict([(run.name,run) for run in self.runs])
+
+    def __len__(self):
+        return len(self.runs)
+
+    def __getitem__(self,key):
+        if isinstance(key,basestring):
+            return self.names[key]
+        return self.runs[key]
+
+    def __iter__(self):
+        return iter(self.runs)
+
+class ArchivedRun(object):
+    """One run of an Archive. Indexing by quantity gives a read-only array mapped from the
+    file; stages, parameters and summary are as written, profile the phases of a run
+    with a profile as dicts, or None, events a list of Events, and
+    range, apogee, velocity, flight_time, timed_out and steps as in SimResult."""
+    def __init__(self,archive,entry):
+        self.archive = archive
+        self.name = entry['name']
+        self.offset = entry['offset']
+        self.size = entry['count']
+        self.dtype = numpy.dtype(str(entry['dtype']))
+        self.stages = entry['stages']
+        self.parameters = entry['parameters']
+        self.events = [Event(str(kind),t,h,v,gamma,range,m,stage) for kind,t,h,v,gamma,range,m,stage in entry['events']]
+        self.summary = entry['summary']
+        self.profile = entry.get('profile')
+        for name,value in self.summary.items():
+            setattr(self,str(name),value)
+        nbytes = self.size*self.dtype.itemsize
+        self.stride = nbytes + (-nbytes % 8) #bytes from one column to the next
+
+    def __getitem__(self,name):
+        start = self.offset + self.archive.columns.index(name)*self.stride
+        return self.archive.memory[start:start + self.size*self.dtype.itemsize].view(self.dtype)
+
+    def __contains__(self,name):
+        return name in self.archive.columns
+
+    def keys(self):
+        return list(self.archive.columns)
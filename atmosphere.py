@@ -0,0 +1,122 @@
+"""Tabulated atmosphere and drag, for fast lookups in the integration loops.
+
+The tables are built once per process from the model in Simulation (density,
+temperature and the V2 drag curve) and interpolated linearly. Lookups take a number,
+for the scalar engine, or an array, for the batch engine. The accuracy level sets
+the altitude spacing of the tables; 'exact' uses the model itself."""
+
+import numpy
+from math import sqrt
+
+#altitude spacing [m] of the tables for each accuracy level
+#spacings divide the heights where the model jumps (11000, 19200, 47000 m), so the jumps stay sharp
+ACCURACY = {'exact':None,'fine':10.0,'medium':50.0,'coarse':200.0}
+h_top = 200000 #[m] top of the speed of sound table, above it drag is zero anyway
+h_atmosphere = 47000 #[m] above it density is zero
+mach_spacing = 0.05 #the drag curve is linear between multiples of this, so its table is exact
+mach_top = 5.0 #drag coefficient is constant above
+
+_tables = {} #built tables by accuracy, shared by every run in the process
+
+def table(accuracy,model):
+    """Tables for an accuracy level, built from model the first time they are asked for.
+    model has density(h), temperature(h) and Cdrag(v,h) as Simulation does.
+    Returns None for 'exact'."""
+    if accuracy not in ACCURACY:
+        raise ValueError("unknown atmosphere accuracy %r" % accuracy)
+    if ACCURACY[accuracy] is None:
+        return None
+    if accuracy not in _tables:
+        _tables[accuracy] = AtmosphereTable(model,ACCURACY[accuracy])
+    return _tables[accuracy]
+
+class Piecewise(object):
+    """Linear interpolation of fn on a uniform grid from 0 to top.
+    Each cell takes both ends from just inside itself, so a jump of fn at a grid node
+    is kept. Beyond top the value is beyond, or the last cell carried on if beyond is
+    None; below 0 the first cell is carried on."""
+    def __init__(self,fn,spacing,top,beyond=None):
+        self.spacing = spacing
+        self.inverse = 1.0/spacing
+        self.cells = int(round(top/spacing))
+        inside = spacing*1e-9
+        left = [fn(i*spacing + inside) for i in range(self.cells)]
+        right = [fn((i+1)*spacing - inside) for i in range(self.cells)]
+        slope = [(right[i] - left[i])/(spacing - 2*inside) for i in range(self.cells)]
+        self.left = [left[i] - slope[i]*inside for i in range(self.cells)]
+        self.slope = slope
+        self.beyond = beyond
+        #the same as arrays, for vector lookups
+        self.left_array = numpy.array(self.left)
+        self.slope_array = numpy.array(self.slope)
+
+    def __call__(self,x):
+        "Interpolated value at x, a float or an array"
+        if isinstance(x,numpy.ndarray):
+            return self.lookup(x)
+        i = int(x*self.inverse)
+        if i >= self.cells:
+            if self.beyond is not None:
+                return self.beyond
+            i = self.cells - 1
+        elif i < 0:
+            i = 0
+        return self.left[i] + self.slope[i]*(x - i*self.spacing)
+
+    def lookup(self,x):
+        "Interpolated values for an array of x"
+        x = numpy.asarray(x,dtype=float)
+        i = numpy.clip(numpy.floor(x*self.inverse).astype(int),0,self.cells - 1)
+        y = self.left_array[i] + self.slope_array[i]*(x - i*self.spacing)
+        if self.beyond is not None:
+            y = numpy.where(x*self.inverse >= self.cells,self.beyond,y)
+        return y
+
+class AtmosphereTable(object):
+    "Density, speed of sound and drag coefficient tables for one altitude spacing"
+    def __init__(self,model,spacing):
+        self.spacing = spacing
+        self.rho = Piecewise(model.density,spacing,h_atmosphere,beyond=0.0)
+        def sound_speed(h):
+            return sqrt(1.4*287*(model.temperature(h) + 273.15))
+        self.sound = Piecewise(sound_speed,spacing,h_top)
+        #drag curve against Mach number, from the model at sea level
+        a0 = sound_speed(0)
+        def drag(mach):
+            return model.Cdrag(mach*a0,0)
+        self.cd = Piecewise(drag,mach_spacing,mach_top,beyond=drag(mach_top))
+
+    def density(self,h):
+        "Air density [kg/m^3] at altitude [m]"
+        if isinstance(h,numpy.ndarray):
+            return self.rho.lookup(h)
+        #same as self.rho(h), written out since it runs every step
+        rho = self.rho
+        i = int(h*rho.inverse)
+        if i >= rho.cells:
+            return 0.0
+        if i < 0:
+            i = 0
+        return rho.left[i] + rho.slope[i]*(h - i*rho.spacing)
+
+    def sound_speed(self,h):
+        "Speed of sound [m/s] at altitude [m]"
+        return self.sound(h)
+
+    def Cdrag(self,v,h):
+        "V2 drag coefficient at speed v [m/s] and altitude h [m]"
+        if isinstance(h,numpy.ndarray) or isinstance(v,numpy.ndarray):
+            return self.cd.lookup(v/self.sound.lookup(h))
+        #same as self.cd(v/self.sound(h)), written out since it runs every step
+        sound = self.sound
+        i = int(h*sound.inverse)
+        if i >= sound.cells:
+            i = sound.cells - 1
+        elif i < 0:
+            i = 0
+        mach = v/(sound.left[i] + sound.slope[i]*(h - i*sound.spacing))
+        cd = self.cd
+        j = int(mach*cd.inverse)
+        if j >= cd.cells:
+            return cd.beyond
+        return cd.left[j] + cd.slope[j]*(mach - j*cd.spacing)
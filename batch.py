@@ -0,0 +1,329 @@
+"""Vectorized simulation of many missiles at once.
+
+Advances N trajectories in lockstep as struct-of-arrays with NumPy, using the same
+RK2 scheme as Simulation.integrate in sim.py. Intended for sweeps and solvers, where
+interpreter overhead of the scalar loop dominates."""
+
+from math import pi
+import numpy
+from events import Step
+from sim import Simulation,Rearth,g0,h_vacuum,vertical_flight_period
+import atmosphere
+
+class BatchSimulation(object):
+    """Integrates N missiles together.
+
+    Stage parameters are arrays of shape (N, stages), where column 0 is stage 1.
+    Missiles with fewer stages than the widest one give their own count in numstages,
+    and the unused columns are ignored. Units are as in Simulation:
+    kg, sec, N (thrust0), m (diameters and est_range)."""
+    def __init__(self,fuelmass,drymass,Isp0,thrust0,payload,missilediam,rvdiam,est_range,numstages=None):
+        self.fuelmass = numpy.atleast_2d(numpy.asarray(fuelmass,dtype=float))
+        self.drymass = numpy.atleast_2d(numpy.asarray(drymass,dtype=float))
+        self.Isp0 = numpy.atleast_2d(numpy.asarray(Isp0,dtype=float))
+        self.thrust0 = numpy.atleast_2d(numpy.asarray(thrust0,dtype=float))
+        n,stages = self.fuelmass.shape
+        self.size = n
+        self.stages = stages
+        #per missile values, broadcast so a single number applies to all
+        self.payload = self.lanes(payload)
+        self.missilediam = self.lanes(missilediam)
+        self.rvdiam = self.lanes(rvdiam)
+        self.est_range = self.lanes(est_range)
+        if numstages is None:
+            numstages = stages
+        self.numstages = numpy.zeros(n,dtype=int) + numstages
+        #Thrust Vector parameters, set by caller as for Simulation
+        self.TStartTurn = None
+        self.TEndTurn = None
+        self.TurnAngle = None
+        #Burnout Angle parameter in degrees from horizontal, set by caller; None steers by est_range
+        self.burnout_angle = None
+        #accuracy of density and drag lookups, as Simulation.atmosphere
+        self.atmosphere = 'exact'
+        #time step after the first second, as Simulation.step
+        self.step = .1
+
+    def lanes(self,value):
+        "Broadcasts a scalar or sequence to one float per missile"
+        return numpy.zeros(self.size) + numpy.asarray(value,dtype=float)
+
+    def from_simulations(cls,sims):
+        "Builds a batch from configured Simulation objects, which keep stage lists from index 1"
+        stages = max([sim.numstages for sim in sims])
+        def table(name):
+            rows = numpy.zeros((len(sims),stages))
+            for row,sim in enumerate(sims):
+                rows[row,:sim.numstages] = getattr(sim,name)[1:sim.numstages+1]
+            return rows
+        fuelmass = table('fuelmass')
+        drymass = table('m0') - fuelmass
+        batch = cls(fuelmass,drymass,table('Isp0'),table('thrust0'),
+            [sim.payload for sim in sims],
+            [sim.missilediam for sim in sims],
+            [sim.rvdiam for sim in sims],
+            [getattr(sim,'est_range',0.0) for sim in sims],
+            numstages=[sim.numstages for sim in sims])
+        if sims[0].trajectory == 'Thrust Vector':
+            batch.TStartTurn = batch.lanes([sim.TStartTurn for sim in sims])
+            batch.TEndTurn = batch.lanes([sim.TEndTurn for sim in sims])
+            batch.TurnAngle = batch.lanes([sim.TurnAngle for sim in sims])
+        if sims[0].trajectory == 'Burnout Angle':
+            batch.burnout_angle = batch.lanes([sim.burnout_angle for sim in sims])
+        batch.atmosphere = sims[0].atmosphere
+        batch.step = sims[0].step
+        return batch
+    from_simulations = classmethod(from_simulations)
+
+    def from_configs(cls,configs):
+        "Builds a batch from SimConfig objects, which must share a trajectory and step"
+        return cls.from_simulations([Simulation(config) for config in configs])
+    from_configs = classmethod(from_configs)
+
+    def density(self,h):
+        "Air density at altitude, as Simulation.density"
+        rho0 = 1.225 #[kg/m^3] air density at sea level
+        rho = numpy.zeros(h.shape)
+        low = h < 19200
+        rho[low] = rho0 * numpy.exp(-h[low]/8420)
+        mid = (h > 19200) & (h < 47000)
+        rho[mid] = rho0 * (.857003 + h[mid]/57947)**-13.201
+        return rho
+
+    def temperature(self,h):
+        "Air temperature [Celsius] at altitude [m], as Simulation.temperature"
+        return numpy.where(h <= 11000, 15.04 - .00649*h,
+            numpy.where(h <= 25000, -56.46, -131.21 + .00299*h))
+
+    def Cdrag(self,v,h):
+        "V2 drag coefficient, as Simulation.Cdrag"
+        t = self.temperature(h) + 273.15 #convert to kelvin
+        mach = v/numpy.sqrt(1.4*287*t)
+        cd = numpy.where(mach > 5, 0.15,
+            numpy.where(mach > 1.8, -0.03125*mach + 0.30625,
+            numpy.where(mach > 1.2, -0.25*mach + 0.7,
+            numpy.where(mach > 0.8, 0.625*mach - 0.35, 0.15))))
+        return cd
+
+    def integrate(self,trajectory):
+        """Runs every missile to impact or timeout. Returns a dict of per-missile arrays:
+        Range, Apogee and Velocity at the end of flight, FlightTime, TimedOut,
+        with apogee and impact located inside the step as by Simulation,
+        and per-stage burnout values StageVelocity, StageGamma, StageHeight,
+        StageRange and StageTime, shaped (N, stages) and NaN where not reached."""
+        #unused stage columns and the gravity turn at v=0 divide by zero; masked out below
+        old_settings = numpy.seterr(divide='ignore',invalid='ignore')
+        try:
+            return self._integrate(trajectory)
+        finally:
+            numpy.seterr(**old_settings)
+
+    def _integrate(self,trajectory):
+        n = self.size
+        stages = self.stages
+        ##### SET INTEGRATION PARAMETERS, as Simulation.integrate
+        tEND = 20000        #timeout value
+        deltaend = self.step    #time increment used for integration
+        deltatinit = min(.01,deltaend)  #time increment for t < tinit
+        tinit = 1           # integrate more carefully during first second
+
+        ##### INITIALIZE ROCKET MODELS
+        active_stage = numpy.arange(stages) < self.numstages[:,numpy.newaxis]
+        m0 = numpy.where(active_stage,self.fuelmass + self.drymass,0.0)
+        dMdt = numpy.where(active_stage,self.thrust0/(self.Isp0*9.81),0.0)
+        burntime = numpy.where(active_stage,self.Isp0*9.81*self.fuelmass/self.thrust0,0.0)
+        Thrust_ideal = numpy.where(active_stage,self.Isp0*dMdt*9.81,0.0)
+        mtot = m0.sum(axis=1) + self.payload
+        if self.burnout_angle is None:
+            opt_burnout_angle = pi/2 - .25*(self.est_range/Rearth + pi)
+        else:
+            opt_burnout_angle = self.lanes(self.burnout_angle)*pi/180
+        burntimetot = burntime.sum(axis=1)
+        #per missile constants, compacted along with the state as missiles land
+        lane = {'burntimetot':burntimetot,
+            'area_missile':(self.missilediam/2)**2 * pi,
+            'area_rv':self.rvdiam/2**2 * pi, #as Simulation, which divides by 2**2
+            'mtot':mtot,
+            'turn_rate':(opt_burnout_angle - pi/2)/(burntimetot - vertical_flight_period),
+            'numstages':self.numstages,
+            'm0':m0,
+            'dMdt':dMdt,
+            'burntime':burntime,
+            'Thrust_ideal':Thrust_ideal}
+        thrust_vector = trajectory == 'Thrust Vector'
+        air = atmosphere.table(self.atmosphere,Simulation()) or self
+        if thrust_vector:
+            lane['TStartTurn'] = self.lanes(self.TStartTurn)
+            lane['TEndTurn'] = self.lanes(self.TEndTurn)
+            lane['TurnAngle'] = -self.lanes(self.TurnAngle)*pi/180
+
+        ##### RESULTS
+        results = {'Range':numpy.zeros(n),'Apogee':numpy.zeros(n),'Velocity':numpy.zeros(n),
+            'FlightTime':numpy.zeros(n),'TimedOut':numpy.zeros(n,dtype=bool)}
+        for name in ('StageVelocity','StageGamma','StageHeight','StageRange','StageTime'):
+            results[name] = numpy.empty((n,stages))
+            results[name].fill(numpy.nan)
+
+        ##### INTEGRATE
+        #state of the missiles still in flight; all share t and deltat
+        idx = numpy.arange(n) #index of each lane in the results
+        rows = numpy.arange(n) #for per lane stage lookups
+        t = 0.0
+        deltat = deltatinit
+        flagdeltat = True
+        v = numpy.zeros(n)
+        h = numpy.zeros(n) + 0.001
+        psi = numpy.zeros(n)
+        gamma = numpy.zeros(n) + pi/2
+        m = mtot.copy()
+        m_half = numpy.zeros(n)
+        apogee = numpy.zeros(n)
+        nstage = numpy.zeros(n,dtype=int) #index of burning stage, 0 is stage 1
+        tlimit = burntime[:,0].copy()
+        dMdt0 = dMdt[:,0].copy()
+        Thrust_stage = Thrust_ideal[:,0].copy() #ideal thrust of burning stage
+        flag = numpy.ones(n,dtype=bool) #stages remain to burn out
+        vz = numpy.zeros(n) #vertical speed, for finding apogee
+
+        while t < tEND and len(idx): # big loop
+            if (t + deltat/5) >= tinit and flagdeltat == True:
+                deltat = deltaend
+                flagdeltat = False
+
+            psi_old = psi
+            h_old = h
+            gamma_old = gamma
+            v_old = v
+            m_old = m
+            t_old = t
+
+            #masks for boost, per missile
+            burning = (t + deltat/5) <= lane['burntimetot']
+            m_half = numpy.where(burning,m_old - (dMdt0 * deltat/2),m_half) #burn fuel
+            area = numpy.where(burning,lane['area_missile'],lane['area_rv'])
+
+            #calculate drag
+            rho = air.density(h)
+            if rho.any():
+                cd = air.Cdrag(v_old,h)
+                drag = cd*area*rho*(v_old**2)/2
+            else:
+                #all above the atmosphere
+                drag = numpy.zeros(h.shape)
+
+            #calculate thrust as function of altitude
+            h_norm = h / h_vacuum
+            Thrust_pct_increase = numpy.where(~burning,0,
+                numpy.where(h < h_vacuum,-.4339*(h_norm)**3+.6233*(h_norm)**2-.01*(h_norm)+1.004,
+                numpy.where(nstage == 0,1.19,1)))
+            Thrust = Thrust_stage*Thrust_pct_increase
+            Force = Thrust - drag
+
+            g = g0*Rearth**2/(h+Rearth)**2 #calculate grav accel at height
+
+            if thrust_vector:
+                ETA_old = numpy.where((t_old > lane['TStartTurn']) & (t_old < lane['TEndTurn']),lane['TurnAngle'],0.0)
+            else:
+                ETA_old = 0.0
+
+            # 1- Calculate values at midpoint, t = t_old + deltat/2
+            t_half = t_old + deltat/2
+            d_psi = (v_old * numpy.cos(gamma_old)/(Rearth + h_old)) * deltat/2
+            psi_half = psi_old + d_psi
+            h_half = h_old + v_old*numpy.sin(gamma_old)*deltat/2
+
+            if t < vertical_flight_period:
+                dgamma = 0.0
+            else:
+                dgamma = numpy.where(t <= lane['burntimetot'],lane['turn_rate'],
+                    d_psi/(deltat/2) + Force*numpy.sin(ETA_old)/(v_old * m_old) - (g*numpy.cos(gamma_old)/v_old))
+            gamma_half = gamma_old + dgamma*deltat/2
+
+            dv = (Force/m_old)*numpy.cos(ETA_old) - g*numpy.sin(gamma_old)
+            v_half = v_old + dv*deltat/2
+
+            # 2- Use derivatives at midpoint to calculate values at t + deltat
+            if thrust_vector:
+                ETA_half = numpy.where((t_half > lane['TStartTurn']) & (t_half < lane['TEndTurn']),lane['TurnAngle'],0.0)
+            else:
+                ETA_half = 0.0
+            t += deltat
+
+            d_psi_half = (v_half*numpy.cos(gamma_half))/(Rearth+h_half) * deltat
+            psi = psi_old + d_psi_half
+            h = h_old + v_half*numpy.sin(gamma_half)*deltat
+            apogee = numpy.where(h > h_old,h,apogee)
+
+            if t <= vertical_flight_period:
+                dgamma_half = 0.0
+            else:
+                dgamma_half = numpy.where(t <= lane['burntimetot'],lane['turn_rate'],
+                    d_psi_half/(deltat) + (Force/(v_half*m_half))*numpy.sin(ETA_half) - (g*numpy.cos(gamma_half)/v_half))
+            gamma = gamma_old + dgamma_half*deltat
+
+            m = numpy.where((t + deltat/5) <= lane['burntimetot'],m_old - dMdt0 * deltat,m_old)
+
+            dv_half = (Force/m_half)*numpy.cos(ETA_half) - g*numpy.sin(gamma_half)
+            v = v_old + dv_half*deltat
+
+            def step(mask):
+                "Interpolant of this step for the masked missiles, as Simulation.rk2_step"
+                y0 = [v_old[mask],h_old[mask],psi_old[mask],gamma_old[mask],m_old[mask]]
+                y1 = [v[mask],h[mask],psi[mask],gamma[mask],m[mask]]
+                def f(y):
+                    return [None,y[0]*numpy.sin(y[3]),y[0]*numpy.cos(y[3])/(Rearth + y[1]),None,None]
+                return Step(t_old,y0,f(y0),t,y1,f(y1))
+
+            #apogee, located inside the step
+            vz_old = vz
+            vz = v*numpy.sin(gamma)
+            peak = (vz_old > 0) & (vz <= 0)
+            if peak.any():
+                peak_step = step(peak)
+                apogee[peak] = peak_step.value(1,peak_step.peak())
+
+            #stage burnout, per missile
+            burnout = ((t + deltat/5) > tlimit) & flag
+            if burnout.any():
+                out = idx[burnout]
+                stage = nstage[burnout]
+                #burnout may be up to deltat/5 past the step, extrapolate to it
+                burnout_step = step(burnout)
+                t_burnout,y_burnout = burnout_step.state(burnout_step.fraction(tlimit[burnout]))
+                results['StageVelocity'][out,stage] = y_burnout[0]
+                results['StageGamma'][out,stage] = y_burnout[3]
+                results['StageHeight'][out,stage] = y_burnout[1]
+                results['StageRange'][out,stage] = Rearth*y_burnout[2]
+                results['StageTime'][out,stage] = t_burnout
+                m = numpy.where(burnout,lane['mtot'] - lane['m0'][rows[:len(idx)],nstage],m)
+                advance = burnout & (nstage + 1 < lane['numstages'])
+                nstage = numpy.where(advance,nstage + 1,nstage)
+                tlimit = numpy.where(advance,tlimit + lane['burntime'][rows[:len(idx)],nstage],tlimit)
+                dMdt0 = numpy.where(advance,lane['dMdt'][rows[:len(idx)],nstage],dMdt0)
+                Thrust_stage = numpy.where(advance,lane['Thrust_ideal'][rows[:len(idx)],nstage],Thrust_stage)
+                flag = flag & ~(burnout & ~advance)
+
+            #impact, per missile
+            landed = h <= 0
+            if landed.any():
+                out = idx[landed]
+                impact_step = step(landed)
+                t_impact,y_impact = impact_step.state(impact_step.crossing(0))
+                results['Range'][out] = Rearth*y_impact[2]
+                results['Apogee'][out] = apogee[landed]
+                results['Velocity'][out] = y_impact[0]
+                results['FlightTime'][out] = t_impact
+                keep = ~landed
+                (idx,v,h,psi,gamma,m,m_half,apogee,nstage,tlimit,dMdt0,Thrust_stage,flag,vz) = [a[keep] for a in
+                    (idx,v,h,psi,gamma,m,m_half,apogee,nstage,tlimit,dMdt0,Thrust_stage,flag,vz)]
+                for key in lane:
+                    lane[key] = lane[key][keep]
+            #END BIG LOOP
+
+        #missiles still in flight have exceeded the time limit
+        results['Range'][idx] = Rearth*psi
+        results['Apogee'][idx] = apogee
+        results['Velocity'][idx] = v
+        results['FlightTime'][idx] = t
+        results['TimedOut'][idx] = True
+        return results
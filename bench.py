@@ -0,0 +1,195 @@
+"""Benchmarks of the simulation over the preset catalogue, and comparison with a baseline.
+
+Every preset in presets.txt is flown under each trajectory type and integrator. For each
+case the suite records the wall time of the best of a few runs, the integration steps
+and steps per second, the peak memory, and the range and apogee, and the steps, time and
+calls of each phase of flight from one more run with a profile. Runs bypass the boost
+and result caches, so each one integrates the whole flight. Each case runs in a fresh
+worker process, so its peak memory is its own, measured as the growth in the process's
+maximum resident size where the resource module has it. This includes about
+2 MB that the first run in any process takes.
+
+Results are saved as JSON. Comparing a run with a saved baseline flags cases that got
+slower by more than a threshold, whose range or apogee drifted, that now fail, or that
+are missing. Nothing here needs wx, so it runs on build machines:
+
+    python bench.py run -o baseline.json
+    python bench.py compare baseline.json"""
+
+import sys
+import json
+import time
+import platform
+import multiprocessing
+from optparse import OptionParser
+from sim import SimConfig,simulate
+import presets
+try:
+    import resource
+except ImportError:
+    resource = None #not on Windows, peak memory is not measured
+
+VERSION = 1
+
+#parameters each trajectory type is flown with, besides the preset's
+TRAJECTORIES = [
+    ('Minimum Energy',{}),
+    ('Burnout Angle',{'burnout_angle':40.0}),
+    ('Thrust Vector',{'TStartTurn':10.0,'TEndTurn':30.0,'TurnAngle':2.0}),
+    ('Turn Angle',{'TurnTimeStart':10.0,'TurnTimeEnd':60.0,'TurnAngleStart':0.0,'TurnAngleEnd':45.0}),
+    ]
+INTEGRATORS = ['RK2','DOPRI5']
+
+def peak_memory():
+    "Maximum resident size of this process so far in kB, or None if it cannot be had"
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024 #bytes there
+    return peak
+
+def cases(library,names=None,trajectories=None,integrators=None):
+    "(preset, trajectory, integrator, config) of each case, for presets names or all in library"
+    if names is None:
+        names = sorted(library.keys())
+    if integrators is None:
+        integrators = INTEGRATORS
+    selected = []
+    for name in names:
+        for trajectory,parameters in TRAJECTORIES:
+            if trajectories is not None and trajectory not in trajectories:
+                continue
+            for integrator in integrators:
+                config = SimConfig.from_preset(library[name],trajectory=trajectory,integrator=integrator,
+                    boost_cache=False,**parameters)
+                selected.append((name,trajectory,integrator,config))
+    return selected
+
+def measure(job):
+    """Runs a case repeat times, for worker processes. Returns the dict of its measurements,
+    with the error instead if it fails."""
+    (name,trajectory,integrator,config),repeat = job
+    measured = {'preset':name,'trajectory':trajectory,'integrator':integrator}
+    start = peak_memory()
+    best = None
+    try:
+        for i in range(repeat):
+            began = time.time()
+            result = simulate(config)
+            wall = time.time() - began
+            if best is None or wall < best:
+                best = wall
+    except Exception,e:
+        measured['error'] = "%s: %s" % (e.__class__.__name__,e)
+        return measured
+    end = peak_memory()
+    phases = simulate(config.copy(profile=True)).profile.to_dict()
+    measured.update({'phases':phases,'wall':best,'steps':result.steps,'steps_per_sec':result.steps/best,
+        'peak_memory_kb':start is not None and end - start or None,
+        'range_km':result.range/1000,'apogee_km':result.apogee/1000,'timed_out':result.timed_out})
+    return measured
+
+def run(library,names=None,trajectories=None,integrators=None,repeat=5,isolate=True):
+    """Benchmark of the cases of library, a Presets or dict of entries, as a dict to save as
+    JSON. With isolate, each case runs in a fresh worker process, one at a time."""
+    jobs = [(case,repeat) for case in cases(library,names,trajectories,integrators)]
+    began = time.time()
+    if isolate:
+        pool = multiprocessing.Pool(1,maxtasksperchild=1)
+        try:
+            measured = pool.map(measure,jobs,chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        measured = [measure(job) for job in jobs]
+    return {'version':VERSION,'date':time.strftime('%Y-%m-%d %H:%M:%S'),'machine':platform.platform(),
+        'python':platform.python_version(),'repeat':repeat,'total_wall':time.time() - began,'cases':measured}
+
+def key(case):
+    return (case['preset'],case['trajectory'],case['integrator'])
+
+def compare(baseline,current,threshold=.25,drift=1e-6):
+    """Flags of current against baseline, two benchmarks, as a list of (preset, trajectory,
+    integrator, message): cases slower by more than threshold, a fraction of the baseline
+    time, with range or apogee changed by more than drift, a fraction, and cases that
+    fail or are missing"""
+    flags = []
+    now = dict([(key(case),case) for case in current['cases']])
+    for case in baseline['cases']:
+        other = now.get(key(case))
+        if other is None:
+            flags.append(key(case) + ("missing",))
+        elif 'error' in other:
+            if 'error' not in case:
+                flags.append(key(case) + ("fails, %s" % other['error'],))
+        elif 'error' not in case:
+            if other['wall'] > case['wall']*(1 + threshold):
+                flags.append(key(case) + ("%.0f%% slower, %.4f sec from %.4f" %
+                    (100*(other['wall']/case['wall'] - 1),other['wall'],case['wall']),))
+            for quantity in ('range_km','apogee_km'):
+                if abs(other[quantity] - case[quantity]) > drift*abs(case[quantity]):
+                    flags.append(key(case) + ("%s %.6f from %.6f" % (quantity,other[quantity],case[quantity]),))
+    return flags
+
+def table(benchmark):
+    "Text table of a benchmark, one case to a line"
+    lines = ["%-24s %-15s %-7s %9s %7s %10s %9s %10s %9s" %
+        ('PRESET','TRAJECTORY','INTEG','WALL (s)','STEPS','STEPS/s','MEM (kB)','RANGE (km)','APOGEE')]
+    for case in benchmark['cases']:
+        if 'error' in case:
+            lines.append("%-24s %-15s %-7s %s" % (key(case) + (case['error'],)))
+            continue
+        memory = case['peak_memory_kb']
+        lines.append("%-24s %-15s %-7s %9.4f %7i %10.0f %9s %10.2f %9.2f" % (key(case) +
+            (case['wall'],case['steps'],case['steps_per_sec'],memory is None and '-' or memory,case['range_km'],case['apogee_km'])))
+    lines.append("total %.1f sec" % benchmark['total_wall'])
+    return '\n'.join(lines)
+
+def main(argv=None):
+    parser = OptionParser(usage="%prog run [options]\n       %prog compare BASELINE [CURRENT] [options]",
+        description="Benchmarks the simulation over the presets, or compares a benchmark with a baseline, "
+        "running the baseline's cases if no current benchmark is given.")
+    parser.add_option('-o','--output',metavar='FILE',help="save the benchmark as JSON")
+    parser.add_option('--presets',default='presets.txt',metavar='FILE',help="presets file [%default]")
+    parser.add_option('-p','--preset',action='append',help="preset to run, may be repeated; all by default")
+    parser.add_option('-t','--trajectory',action='append',choices=[name for name,parameters in TRAJECTORIES],
+        help="trajectory type to run, may be repeated; all by default")
+    parser.add_option('-i','--integrator',action='append',choices=INTEGRATORS,help="integrator to run, may be repeated; all by default")
+    parser.add_option('-r','--repeat',type='int',default=5,help="runs of each case, the fastest counts [%default]")
+    parser.add_option('--threshold',type='float',default=.25,help="slowdown to flag, a fraction of the baseline time [%default]")
+    parser.add_option('--drift',type='float',default=1e-6,help="change in range or apogee to flag, a fraction [%default]")
+    options,args = parser.parse_args(argv)
+    if not args or args[0] not in ('run','compare') or (args[0] == 'run' and len(args) > 1) or \
+            (args[0] == 'compare' and not 2 <= len(args) <= 3):
+        parser.error("give run, or compare with a baseline file")
+    library = None
+    if args[0] == 'run' or len(args) == 2:
+        library = presets.Presets(options.presets)
+    if args[0] == 'run':
+        benchmark = run(library,options.preset,options.trajectory,options.integrator,options.repeat)
+        print table(benchmark)
+        if options.output:
+            json.dump(benchmark,open(options.output,'w'),indent=1)
+        return 0
+    baseline = json.load(open(args[1]))
+    if len(args) == 3:
+        current = json.load(open(args[2]))
+    else:
+        #the baseline's cases, as far as the presets still have them
+        names = sorted(set([case['preset'] for case in baseline['cases']]) & set(library.keys()))
+        trajectories = set([case['trajectory'] for case in baseline['cases']])
+        integrators = sorted(set([case['integrator'] for case in baseline['cases']]))
+        current = run(library,names,trajectories,integrators,options.repeat)
+        print table(current)
+        if options.output:
+            json.dump(current,open(options.output,'w'),indent=1)
+    flags = compare(baseline,current,options.threshold,options.drift)
+    for flag in flags:
+        print "%s, %s, %s: %s" % flag
+    print "%i of %i cases flagged" % (len(set([flag[:3] for flag in flags])),len(baseline['cases']))
+    return flags and 1 or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
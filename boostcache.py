@@ -0,0 +1,71 @@
+"""Cache of integrator states at the end of boost.
+
+Runs that differ only after boost, in the reentry vehicle diameter, the coast
+method or the recording policy, fly the same boost phase. The simulation saves
+its state when the last stage burns out, keyed on everything the boost depends
+on, and a later run with the same key resumes from there instead of flying the
+boost again. The result is the same as from a full run.
+
+Runs that record no samples save and use the state alone, and allocate nothing
+per step; a run that records samples does not resume from such a state, and
+replaces it with its own.
+
+The cache is bounded, dropping the least recently used state when full, and
+counts its hits and misses. One cache is shared by every run in the process,
+unless a run is given its own."""
+
+from collections import OrderedDict
+
+class BoostState(object):
+    """What a run needs to resume after boost: the integrator's own state, a tuple
+    it knows how to unpack, the events and step count so far, and the boost samples
+    at every step as an array with one row per trajectory quantity, or None if the run
+    that saved it recorded no samples."""
+    def __init__(self,state,events,steps,samples):
+        self.state = state
+        self.events = events
+        self.steps = steps
+        self.samples = samples
+
+class BoostCache(object):
+    "Least recently used cache of BoostStates, holding at most size of them"
+    def __init__(self,size=32):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+    def clear(self):
+        "Drops every saved state, the counters are kept"
+        self.states = OrderedDict() #from least to most recently used
+
+    def get(self,key,samples=True):
+        """Saved state for key, or None, counting a hit or a miss. With samples, a state
+        saved without samples is a miss."""
+        state = self.states.get(key)
+        if state is None or (samples and state.samples is None):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touch(key)
+        return state
+
+    def put(self,key,state):
+        "Saves a state, dropping the least recently used one if full"
+        self.states.pop(key,None)
+        self.states[key] = state
+        while len(self.states) > self.size:
+            self.states.popitem(last=False)
+
+    def touch(self,key):
+        "Marks key as the most recently used"
+        self.states[key] = self.states.pop(key)
+
+    def __len__(self):
+        return len(self.states)
+
+    def __contains__(self,key):
+        return key in self.states
+
+#shared by every run that does not bring its own
+cache = BoostCache()
@@ -0,0 +1,177 @@
+"""Runs simulations from the command line, without prompts, and prints their summaries.
+
+Cases come from presets.txt by name, or from parameter files in the same format,
+a dict of named entries. --set changes a config attribute for every case, with
+stage lists indexed as in fuelmass.2=12000; a comma separated list of values runs
+each of them, and several lists run every combination. Cases run in a pool of
+--jobs worker processes, and their summaries go to stdout, in order, as CSV or as
+JSON lines, as each finishes. --archive keeps the trajectories too.
+
+    python cli.py --preset "DPRK - TD-2" --set payload=500,1000,1500 --jobs 4
+    python cli.py --all --integrator DOPRI5 --format jsonl > ranges.jsonl"""
+
+import sys
+import csv
+import json
+import itertools
+import multiprocessing
+from collections import OrderedDict
+from optparse import OptionParser
+from sim import SimConfig,simulate
+from trajectory import RECORD_ALL,RECORD_SUMMARY
+import archive
+import presets
+
+#fields of each summary, after the case name and the values set
+FIELDS = ['range_km','apogee_km','velocity','flight_time','timed_out','steps','error']
+
+TRAJECTORIES = ['Minimum Energy','Burnout Angle','Thrust Vector','Turn Angle']
+
+def load_presets(path):
+    "The dict of valid named entries in a file in the format of presets.txt, reporting the rest on stderr"
+    entries,errors = presets.parse(open(path).read())
+    for error in errors:
+        sys.stderr.write("%s: %s\n" % (path,error))
+    return dict([(name,entry) for name,entry,line in entries])
+
+def parse_value(text):
+    "A number if text is one, otherwise the text"
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+def parse_settings(settings):
+    """List of (name, values) from --set arguments name=value[,value...];
+    raises ValueError for one without a value"""
+    parsed = []
+    for setting in settings:
+        if '=' not in setting:
+            raise ValueError("--set %s has no value, use name=value" % setting)
+        name,values = setting.split('=',1)
+        parsed.append((name.strip(),[parse_value(value.strip()) for value in values.split(',')]))
+    return parsed
+
+def apply_setting(config,name,value):
+    """Sets attribute name of config, or entry i of a stage list for name.i.
+    Raises ValueError for an unknown name or stage."""
+    if '.' in name:
+        name,stage = name.split('.',1)
+        values = getattr(config,name,None)
+        if not isinstance(values,list) or not stage.isdigit() or not 1 <= int(stage) <= config.numstages:
+            raise ValueError("no stage list entry %s.%s" % (name,stage))
+        values[int(stage)] = value
+    elif hasattr(config,name) and not name.startswith('_'):
+        setattr(config,name,value)
+    else:
+        raise ValueError("no config setting %s" % name)
+
+def make_cases(entries,settings,**kwargs):
+    """(name, values set, config) for each entry, a (name, preset entry) pair, and each
+    combination of the values in settings; kwargs go to every SimConfig"""
+    names = [name for name,values in settings]
+    cases = []
+    for entry_name,entry in entries:
+        for values in itertools.product(*[values for name,values in settings]):
+            config = SimConfig.from_preset(entry,**kwargs)
+            for name,value in zip(names,values):
+                apply_setting(config,name,value)
+            cases.append((entry_name,values,config))
+    return cases
+
+def run_case(case):
+    """Runs one case, for worker processes. Returns the summary dict, and the SimResult
+    if trajectories are kept, or None."""
+    name,values,config,keep = case
+    summary = {}
+    try:
+        result = simulate(config)
+    except Exception,e:
+        #one bad case does not stop the rest
+        summary['error'] = "%s: %s" % (e.__class__.__name__,e)
+        return summary,None
+    summary.update({'range_km':result.range/1000,'apogee_km':result.apogee/1000,'velocity':result.velocity,
+        'flight_time':result.flight_time,'timed_out':result.timed_out,'steps':result.steps,'error':''})
+    if not keep:
+        result = None
+    return summary,result
+
+def main(argv=None):
+    parser = OptionParser(usage="%prog [options]",description="Runs presets and parameter files and prints a summary of each run.")
+    parser.add_option('-p','--preset',action='append',default=[],help="preset from the presets file to run, may be repeated")
+    parser.add_option('-a','--all',action='store_true',help="run every preset")
+    parser.add_option('--presets',default='presets.txt',metavar='FILE',help="presets file [%default]")
+    parser.add_option('-f','--params',action='append',default=[],metavar='FILE',
+        help="parameter file in the format of presets.txt, every entry is run; may be repeated")
+    parser.add_option('-s','--set',dest='settings',action='append',default=[],metavar='NAME=VALUE[,VALUE...]',
+        help="config setting for every case, e.g. payload=1000 or fuelmass.2=12000; lists run each value")
+    parser.add_option('-t','--trajectory',choices=TRAJECTORIES,default='Minimum Energy',help="[%default]")
+    parser.add_option('-i','--integrator',choices=['RK2','DOPRI5'],default='RK2',help="[%default]")
+    parser.add_option('-j','--jobs',type='int',default=1,help="worker processes [%default]")
+    parser.add_option('--format',choices=['csv','jsonl'],default='csv',help="csv or jsonl [%default]")
+    parser.add_option('--archive',metavar='FILE',help="also write the trajectories to a binary archive, see archive.py")
+    options,args = parser.parse_args(argv)
+    if args:
+        parser.error("unexpected arguments %s, name presets with --preset" % ' '.join(args))
+
+    entries = []
+    if options.preset or options.all:
+        library = presets.Presets(options.presets)
+        for error in library.errors:
+            sys.stderr.write("%s: %s\n" % (options.presets,error))
+        if options.all:
+            entries += sorted(library.items())
+        for name in options.preset:
+            if name not in library:
+                parser.error("no preset %r in %s" % (name,options.presets))
+            entries.append((name,library[name]))
+    for path in options.params:
+        entries += sorted(load_presets(path).items())
+    if not entries:
+        parser.error("nothing to run, give --preset, --all or --params")
+    try:
+        settings = parse_settings(options.settings)
+        record = options.archive and RECORD_ALL or RECORD_SUMMARY
+        cases = make_cases(entries,settings,trajectory=options.trajectory,integrator=options.integrator,record=record)
+    except (ValueError,KeyError),e:
+        parser.error(str(e))
+    names = [name for name,values in settings]
+    jobs = [(name,values,config,bool(options.archive)) for name,values,config in cases]
+
+    if options.jobs > 1:
+        pool = multiprocessing.Pool(options.jobs)
+        outcomes = pool.imap(run_case,jobs) #in order, as they finish
+    else:
+        pool = None
+        outcomes = (run_case(job) for job in jobs)
+    writer = None
+    if options.format == 'csv':
+        writer = csv.writer(sys.stdout,lineterminator='\n')
+        writer.writerow(['case'] + names + FIELDS)
+    store = None
+    if options.archive:
+        store = archive.ArchiveWriter(options.archive)
+    failed = 0
+    try:
+        for (name,values,config,keep),(summary,result) in itertools.izip(jobs,outcomes):
+            if summary['error']:
+                failed += 1
+            if writer is not None:
+                writer.writerow([name] + list(values) + [summary.get(field,'') for field in FIELDS])
+            else:
+                row = OrderedDict([('case',name)] + zip(names,values))
+                row.update([(field,summary.get(field,'')) for field in FIELDS])
+                sys.stdout.write(json.dumps(row) + '\n')
+            sys.stdout.flush()
+            if store is not None and result is not None:
+                store.add(result,config,' '.join([name] + ['%s=%s' % setting for setting in zip(names,values)]))
+    finally:
+        if store is not None:
+            store.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return failed and 1 or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
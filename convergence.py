@@ -0,0 +1,185 @@
+"""Accuracy against cost of the integrator settings, over a set of presets.
+
+Each preset is flown once with a tight tolerance reference, DOPRI5 at rtol 1e-12,
+and then with each setting studied: RK2 at a range of step sizes, DOPRI5 at a range
+of tolerances, the absolute with the relative, each with the coast integrated or
+followed as a Kepler ellipse. For each run the study keeps the steps and the best wall time of a few runs, and the
+errors of the range, apogee and flight time against the reference. The table can
+be read or plotted as error against steps or wall time, and cheapest picks the
+least costly setting that keeps within an error budget on every preset studied,
+so a study of the presets of one class of missile gives the setting for that class.
+
+    python convergence.py --estrange 1000,3000 --budget 500"""
+
+import sys
+import time
+import multiprocessing
+import numpy
+from optparse import OptionParser
+from sim import simulate,SimConfig
+from trajectory import RECORD_SUMMARY
+import presets
+
+STEPS = [.4,.2,.1,.05,.025,.0125] #of RK2 [sec]
+TOLERANCES = [1e-4,1e-5,1e-6,1e-7,1e-8,1e-9,1e-10] #rtol of DOPRI5
+ATOL = 1e4 #atol of DOPRI5 over rtol [m], as in the default pair; a fixed atol limits the accuracy
+COASTS = ['integrate','kepler']
+REFERENCE = {'integrator':'DOPRI5','rtol':1e-12,'atol':1e-6,'coast':'integrate'}
+
+QUANTITIES = ('range','apogee','flight_time')
+
+def settings(steps=STEPS,tolerances=TOLERANCES,coasts=COASTS):
+    "(label, changes to the config) of each combination of RK2 step or DOPRI5 tolerance and coast"
+    chosen = []
+    for coast in coasts:
+        suffix = coast == 'kepler' and ' kepler' or ''
+        for step in steps:
+            chosen.append(('RK2 step=%g%s' % (step,suffix),{'integrator':'RK2','step':step,'coast':coast}))
+        for rtol in tolerances:
+            chosen.append(('DOPRI5 rtol=%g%s' % (rtol,suffix),{'integrator':'DOPRI5','rtol':rtol,'atol':rtol*ATOL,'coast':coast}))
+    return chosen
+
+def run_setting(job):
+    """Flies a config repeat times, for worker processes. Returns steps, best wall time, range,
+    apogee and flight time, or the error message if it fails."""
+    config,repeat = job
+    best = None
+    try:
+        for i in range(repeat):
+            began = time.time()
+            result = simulate(config)
+            wall = time.time() - began
+            if best is None or wall < best:
+                best = wall
+    except Exception,e:
+        return "%s: %s" % (e.__class__.__name__,e)
+    return result.steps,best,result.range,result.apogee,result.flight_time
+
+class Study(object):
+    """Outcome of study: for each preset and setting, a dict in rows with the preset, setting,
+    steps, wall time, and range_error, apogee_error and flight_time_error, absolute, in m
+    and sec, against the reference; or with error, the message of a run that failed."""
+    def __init__(self,presets,settings,rows):
+        self.presets = presets #names, in order
+        self.settings = settings #labels, in order
+        self.rows = rows
+
+    def select(self,preset=None,setting=None):
+        "Rows of a preset or a setting, or of both, that did not fail"
+        return [row for row in self.rows if 'error' not in row and
+            preset in (None,row['preset']) and setting in (None,row['setting'])]
+
+    def points(self,preset,quantity='range',cost='steps'):
+        """Array of (cost, error) pairs of the settings for one preset, in order of cost, with
+        cost 'steps' or 'wall', for a plot of error against cost"""
+        rows = self.select(preset)
+        rows.sort(key=lambda row: row[cost])
+        return numpy.array([(row[cost],row[quantity + '_error']) for row in rows]).reshape(-1,2)
+
+    def cheapest(self,budget,quantity='range',cost='wall'):
+        """(setting, worst error, total cost) of the setting with the least total cost, 'steps'
+        or 'wall', over the presets, whose error in quantity is within budget, m or sec, on
+        every one, or None if no setting is"""
+        best = None
+        for setting in self.settings:
+            rows = self.select(setting=setting)
+            if len(rows) < len(self.presets):
+                continue #failed on some preset
+            worst = max([row[quantity + '_error'] for row in rows])
+            total = sum([row[cost] for row in rows])
+            if worst <= budget and (best is None or total < best[2]):
+                best = (setting,worst,total)
+        return best
+
+    def table(self):
+        "Comma separated text of the rows"
+        lines = ['PRESET,SETTING,STEPS,WALL (sec),RANGE ERROR (m),APOGEE ERROR (m),FLIGHT TIME ERROR (sec),ERROR']
+        for row in self.rows:
+            if 'error' in row:
+                lines.append('%s,%s,,,,,,%s' % (row['preset'],row['setting'],row['error']))
+            else:
+                lines.append('%s,%s,%i,%.6f,%.3f,%.3f,%.4f,' % (row['preset'],row['setting'],row['steps'],row['wall'],
+                    row['range_error'],row['apogee_error'],row['flight_time_error']))
+        return '\n'.join(lines)
+
+def study(configs,chosen=None,reference=None,repeat=3,processes=1):
+    """Study of the settings chosen, a list of (label, changes) as from settings and by default
+    all of them, on configs, a list of (name, SimConfig), against the reference changes, by
+    default REFERENCE. Runs go to a pool of processes, None for one per processor; the default
+    runs one at a time, so wall times are not shared with other runs."""
+    if chosen is None:
+        chosen = settings()
+    if reference is None:
+        reference = REFERENCE
+    jobs = []
+    for name,config in configs:
+        #every run integrates the whole flight, and records nothing
+        config = config.copy(record=RECORD_SUMMARY,boost_cache=False,result_cache=None,profile=False)
+        jobs.append((config.copy(**reference),1))
+        jobs.extend([(config.copy(**changes),repeat) for label,changes in chosen])
+    if processes == 1:
+        outcomes = map(run_setting,jobs)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            outcomes = pool.map(run_setting,jobs,chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    rows = []
+    per = len(chosen) + 1
+    for i,(name,config) in enumerate(configs):
+        exact = outcomes[i*per]
+        for (label,changes),outcome in zip(chosen,outcomes[i*per+1:(i+1)*per]):
+            row = {'preset':name,'setting':label}
+            if isinstance(exact,str):
+                row['error'] = "reference failed, %s" % exact
+            elif isinstance(outcome,str):
+                row['error'] = outcome
+            else:
+                row['steps'],row['wall'] = outcome[:2]
+                for quantity,value,value_exact in zip(QUANTITIES,outcome[2:],exact[2:]):
+                    row[quantity + '_error'] = abs(value - value_exact)
+            rows.append(row)
+    return Study([name for name,config in configs],[label for label,changes in chosen],rows)
+
+def main(argv=None):
+    parser = OptionParser(usage="%prog [options]",description="Tabulates the error and cost of integrator "
+        "settings against a tight tolerance reference, and picks the cheapest within a budget.")
+    parser.add_option('--presets',default='presets.txt',metavar='FILE',help="presets file [%default]")
+    parser.add_option('-p','--preset',action='append',help="preset to study, may be repeated; all by default")
+    parser.add_option('--estrange',metavar='LOW,HIGH',help="study the presets with estimated ranges in km between these")
+    parser.add_option('-b','--budget',type='float',default=1000.0,help="error allowed, m or sec [%default]")
+    parser.add_option('-q','--quantity',choices=list(QUANTITIES),default='range',help="[%default]")
+    parser.add_option('-c','--cost',choices=['wall','steps'],default='wall',help="[%default]")
+    parser.add_option('-r','--repeat',type='int',default=3,help="runs of each setting, the fastest counts [%default]")
+    parser.add_option('-j','--jobs',type='int',default=1,help="worker processes, more share the wall time [%default]")
+    options,args = parser.parse_args(argv)
+    if args:
+        parser.error("unexpected arguments %s" % ' '.join(args))
+    library = presets.Presets(options.presets)
+    names = options.preset or sorted(library.keys())
+    if options.estrange:
+        try:
+            low,high = [float(bound) for bound in options.estrange.split(',')]
+        except ValueError:
+            parser.error("--estrange takes LOW,HIGH")
+        names = [name for name in names if name in library.query(estrange=(low,high))]
+    for name in names:
+        if name not in library:
+            parser.error("no preset %r in %s" % (name,options.presets))
+    if not names:
+        parser.error("no presets to study")
+    result = study([(name,SimConfig.from_preset(library[name])) for name in names],
+        repeat=options.repeat,processes=options.jobs)
+    print result.table()
+    best = result.cheapest(options.budget,options.quantity,options.cost)
+    if best is None:
+        print "no setting keeps the %s error within %g on every preset" % (options.quantity,options.budget)
+        return 1
+    print "cheapest within %g: %s, worst %s error %.3f, %s %g in all" % ((options.budget,best[0],options.quantity,
+        best[1],options.cost,best[2]))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Events in flight: stage burnout, end of boost, apogee, leaving and re-entering
+the atmosphere, and impact. The integrators check for them after each step and
+locate them inside the step by interpolation, so their times and states do not
+depend on the step size.
+
+The interpolation works elementwise, so the batch integrator can use it on arrays
+with one entry per missile."""
+
+import numpy
+
+#kinds of event, in the order they happen in a normal flight
+BURNOUT = 'burnout'
+BOOST_END = 'boost end'
+ATMOSPHERE_EXIT = 'atmosphere exit'
+APOGEE = 'apogee'
+REENTRY = 'reentry'
+IMPACT = 'impact'
+
+#top of the atmosphere [m], above it the density model is zero
+h_atmosphere = 47000
+
+class Event(object):
+    """Time and state of the missile at an event. Units are as in the results dict:
+    sec, m, m/s, radians from horizontal, kg."""
+    def __init__(self,kind,t,h,v,gamma,range,m,stage=None):
+        self.kind = kind
+        self.t = t
+        self.h = h
+        self.v = v
+        self.gamma = gamma
+        self.range = range
+        self.m = m
+        self.stage = stage #burning stage, for burnouts
+
+    def __repr__(self):
+        if self.stage is None:
+            name = self.kind
+        else:
+            name = "%s %i" % (self.kind,self.stage)
+        return "<Event %s t=%.2f h=%.1f v=%.1f range=%.1f>" % (name,self.t,self.h,self.v,self.range)
+
+def find(events,kind,stage=None):
+    "Returns the first event of a kind in a list, or None"
+    for event in events:
+        if event.kind == kind and (stage is None or event.stage == stage):
+            return event
+    return None
+
+class Step(object):
+    """One integration step from t0 to t1, interpolated to locate events inside it.
+    y is the state v,h,psi,gamma,m; f its time derivative, where entries given as None
+    are interpolated linearly and the rest as cubic Hermite polynomials."""
+    def __init__(self,t0,y0,f0,t1,y1,f1):
+        self.t0 = t0
+        self.dt = t1 - t0
+        self.y0 = y0
+        self.f0 = f0
+        self.y1 = y1
+        self.f1 = f1
+
+    def value(self,i,s):
+        "State variable i at fraction s of the step"
+        y0,y1 = self.y0[i],self.y1[i]
+        if self.f0[i] is None or self.f1[i] is None:
+            return y0 + s*(y1 - y0)
+        s2 = s*s
+        s3 = s2*s
+        return ((2*s3 - 3*s2 + 1)*y0 + (s3 - 2*s2 + s)*self.dt*self.f0[i]
+            + (3*s2 - 2*s3)*y1 + (s3 - s2)*self.dt*self.f1[i])
+
+    def slope(self,i,s):
+        "Derivative of state variable i with respect to s"
+        y0,y1 = self.y0[i],self.y1[i]
+        if self.f0[i] is None or self.f1[i] is None:
+            return (y1 - y0)*(s*0 + 1)
+        s2 = s*s
+        return ((6*s2 - 6*s)*(y0 - y1) + (3*s2 - 4*s + 1)*self.dt*self.f0[i]
+            + (3*s2 - 2*s)*self.dt*self.f1[i])
+
+    def state(self,s):
+        "Time and interpolated state at fraction s of the step"
+        return self.t0 + s*self.dt,[self.value(i,s) for i in range(len(self.y0))]
+
+    def fraction(self,t):
+        "Fraction of the step at time t, may lie outside 0..1 to extrapolate a little"
+        return (t - self.t0)/self.dt
+
+    def crossing(self,height):
+        "Fraction of the step where height passes through a level"
+        return bisect(lambda s: self.value(1,s) - height)
+
+    def peak(self):
+        "Fraction of the step where height stops increasing"
+        return bisect(lambda s: self.slope(1,s))
+
+def bisect(fn,iterations=40):
+    """Root of fn on 0 <= s <= 1, where fn(0) and fn(1) differ in sign.
+    fn may return an array, to find one root per element."""
+    lo,hi = 0.0,1.0
+    flo = fn(lo)
+    if numpy.ndim(flo) == 0:
+        for i in range(iterations):
+            mid = (lo + hi)/2
+            fmid = fn(mid)
+            if fmid*flo > 0:
+                lo,flo = mid,fmid
+            else:
+                hi = mid
+        return (lo + hi)/2
+    lo = numpy.zeros(numpy.shape(flo))
+    hi = lo + 1
+    for i in range(iterations):
+        mid = (lo + hi)/2
+        fmid = fn(mid)
+        same = fmid*flo > 0
+        lo = numpy.where(same,mid,lo)
+        flo = numpy.where(same,fmid,flo)
+        hi = numpy.where(same,hi,mid)
+    return (lo + hi)/2
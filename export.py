@@ -0,0 +1,114 @@
+"""Text export of trajectories, for the GUI, sim.py and scripts alike.
+
+Rows are formatted a block of samples at a time, with one string format over the
+whole block, and streamed to the file through a large buffer, so a long run or a
+sweep of many is written without building a list of rows. Columns can be chosen
+and converted to other units, and files ending in .gz are compressed."""
+
+import gzip
+from trajectory import COLUMNS
+
+#column order of the text files
+EXPORT_COLUMNS = ('Time','Height','Velocity','Mass','Thrust','Drag','Gamma','Range')
+
+#factor from the units of the trajectory to each unit a column can be written in
+UNITS = {
+    'Time':{'sec':1.0,'min':1/60.0},
+    'Height':{'m':1.0,'km':1e-3},
+    'Range':{'m':1.0,'km':1e-3},
+    'Velocity':{'m/s':1.0,'km/s':1e-3},
+    'Mass':{'kg':1.0,'t':1e-3},
+    'Thrust':{'N':1.0,'kN':1e-3,'kgf':1/9.81},
+    'Drag':{'N':1.0,'kN':1e-3,'kgf':1/9.81},
+    'Gamma':{'rad':1.0,'deg':180/3.141592653589793},
+    }
+
+class CSVWriter(object):
+    """Writes trajectories as comma separated text to path, compressed if it ends in .gz.
+    columns is a list of quantities, in order, by default EXPORT_COLUMNS; units maps
+    quantities to the units to write them in, by default those of the trajectory.
+    With run_column, each row starts with the name of its run, for sweeps.
+    stages, a Simulation or a list of them, writes their stage parameters first."""
+    def __init__(self,path,columns=None,units=None,precision=3,run_column=False,stages=None,
+            block=65536,buffering=2**20):
+        if columns is None:
+            columns = EXPORT_COLUMNS
+        self.columns = list(columns)
+        for column in self.columns:
+            if column not in COLUMNS:
+                raise ValueError("unknown quantity %r" % column)
+        self.factors = []
+        header = []
+        units = units or {}
+        for column in self.columns:
+            if column in units:
+                if units[column] not in UNITS.get(column,{}):
+                    raise ValueError("cannot write %s in %r" % (column,units[column]))
+                self.factors.append(UNITS[column][units[column]])
+                header.append("%s (%s)" % (column.upper(),units[column]))
+            else:
+                self.factors.append(1.0)
+                header.append(column.upper())
+        self.run_column = run_column
+        if run_column:
+            header.insert(0,'RUN')
+        self.block = block
+        self.row = ','.join(['%%.%if' % precision]*len(self.columns)) + '\n'
+        self.path = path
+        self.stream = open(path,'wb',buffering)
+        if path.endswith('.gz'):
+            self.raw = self.stream
+            self.stream = gzip.GzipFile(fileobj=self.raw,mode='wb')
+        if stages is not None:
+            if not isinstance(stages,list):
+                stages = [stages]
+            for sim in stages:
+                self.stream.write(stage_parameters(sim))
+            self.stream.write('\n')
+        self.stream.write(','.join(header) + '\n')
+        self.rows = 0
+
+    def write(self,data,run=None):
+        """Appends the samples of data, a Trajectory or anything indexed by quantity,
+        with run as the name in the run column"""
+        columns = [data[column] for column in self.columns]
+        size = len(columns[0])
+        row = self.row
+        if self.run_column:
+            row = str(run).replace('%','%%') + ',' + row
+        for start in range(0,size,self.block):
+            end = min(start + self.block,size)
+            #one format over the whole block, the values interleaved row by row
+            values = [column[start:end]*factor for column,factor in zip(columns,self.factors)]
+            flat = [None]*(len(values)*(end - start))
+            for i,column in enumerate(values):
+                flat[i::len(values)] = column.tolist()
+            self.stream.write(row*(end - start) % tuple(flat))
+        self.rows += size
+
+    def close(self):
+        self.stream.close()
+        if self.path.endswith('.gz'):
+            self.raw.close()
+
+def write_csv(path,data,**kwargs):
+    "Writes one trajectory to path, keyword arguments as for CSVWriter"
+    writer = CSVWriter(path,**kwargs)
+    try:
+        writer.write(data)
+    finally:
+        writer.close()
+
+def stage_parameters(sim):
+    "Text block of the stage parameters of a Simulation, as written before the samples"
+    lines = []
+    for i in range(1,sim.numstages+1):
+        lines.append("STAGE %i Parameters:" % i)
+        lines.append("Fuel mass (kg): " + str(sim.fuelmass[i]))
+        lines.append("Dry mass (kg): " + str(sim.m0[i] - sim.fuelmass[i]))
+        lines.append("Fuel fract: " + str(sim.fuelfraction[i]))
+        lines.append("Isp @ SL: " + str(sim.Isp0[i]))
+        lines.append("Burn time (sec): " + str(sim.Isp0[i]*9.81*sim.fuelmass[i]/sim.thrust0[i]))
+        lines.append("Thrust (N): " + str(sim.thrust0[i]))
+        lines.append("dM/dt: " + str(sim.dMdt[i]))
+    return '\n'.join(lines) + '\n'
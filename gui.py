@@ -49,11 +49,21 @@ from math import *
 
 #my modules
 from sim import * #the simulation
+from trajectory import Trajectory
+from solver import solve,solve_parallel,maximize,FuelFraction,SolverError
+from surrogate import Surrogate
+from resultcache import ResultCache
+from memo import Memo
+from presets import Presets
+import archive
+from export import write_csv
 
 class ParamsPanel(wx.Panel):
     def __init__(self, parent, id,presets):
         wx.Panel.__init__(self, parent, id)
         self.presets = presets #ext ref for loading presets
+        self.surrogate = None #of the chosen preset, for range estimates while editing
+        self.Bind(wx.EVT_TEXT,self.OnEdit)
         
         #MAIN SIZER
         self.MainSizer = wx.FlexGridSizer(4,1,vgap=25,hgap=10)
@@ -117,11 +127,14 @@ class ParamsPanel(wx.Panel):
         self.TopSizer.Add(self.TrajectoryChoiceSizer,0)
         
         #EST RANGE SIZER
-        self.EstRangeSizer = wx.FlexGridSizer(1,3, vgap=0, hgap=5)
+        self.EstRangeSizer = wx.FlexGridSizer(1,4, vgap=0, hgap=5)
         self.EstRangeSizer.Add(wx.StaticText(self,-1,"Estimated Range"),0)
         self.EstRangeControl = NumCtrl(self,-1,"Estimated range (km). Forces missile to MET after stage 1 burnout.")
         self.EstRangeSizer.Add(self.EstRangeControl,0)
         self.EstRangeSizer.Add(wx.StaticText(self,-1,"km"),0)
+        MaximizeButton = wx.Button(self,-1,"Maximize")
+        self.Bind(wx.EVT_BUTTON,self.OnMaximize,MaximizeButton)
+        self.EstRangeSizer.Add(MaximizeButton,0)
         self.TopSizer.Add(self.EstRangeSizer,0)
         
         
@@ -165,6 +178,22 @@ class ParamsPanel(wx.Panel):
         self.TurnAngleSizer.Add(self.TurnAngleEnd)
         self.TopSizer.Add(self.TurnAngleSizer,0)
         
+        #INTEGRATOR SIZER
+        self.IntegratorSizer = wx.FlexGridSizer(1,6, vgap=0, hgap=5)
+        self.IntegratorSizer.Add(wx.StaticText(self,-1,"Integrator"),0)
+        self.IntegratorChoiceBox = wx.Choice(self,-1,choices = ['RK2','DOPRI5'])
+        self.IntegratorChoiceBox.SetSelection(0)
+        self.IntegratorSizer.Add(self.IntegratorChoiceBox,0)
+        self.IntegratorSizer.Add(wx.StaticText(self,-1,"rtol"),0)
+        self.RtolControl = NumCtrl(self,-1,"Relative tolerance of adaptive integrator")
+        self.RtolControl.SetValue("1e-7")
+        self.IntegratorSizer.Add(self.RtolControl,0)
+        self.IntegratorSizer.Add(wx.StaticText(self,-1,"atol"),0)
+        self.AtolControl = NumCtrl(self,-1,"Absolute tolerance of adaptive integrator (m, m/s, kg)")
+        self.AtolControl.SetValue("1e-3")
+        self.IntegratorSizer.Add(self.AtolControl,0)
+        self.TopSizer.Add(self.IntegratorSizer,0)
+        
         #start with MET
         self.TrajectoryChoiceBox.SetSelection(0)
         self.TopSizer.Hide(self.BurnoutAngleSizer)
@@ -269,8 +298,9 @@ class ParamsPanel(wx.Panel):
             self.TopSizer.Hide(self.BurnoutAngleSizer)
             self.TopSizer.Hide(self.TurnAngleSizer)
         if choice == 'Thrust Vector':
+            #steers to the burnout angle for the estimated range
             self.TopSizer.Show(self.EtaSizer)
-            self.TopSizer.Hide(self.EstRangeSizer)
+            self.TopSizer.Show(self.EstRangeSizer)
             self.TopSizer.Hide(self.BurnoutAngleSizer)
             self.TopSizer.Hide(self.TurnAngleSizer)
         if choice == 'Burnout Angle':
@@ -280,13 +310,19 @@ class ParamsPanel(wx.Panel):
             self.TopSizer.Hide(self.TurnAngleSizer)
         if choice == 'Turn Angle':
             self.TopSizer.Show(self.TurnAngleSizer)
+            self.TopSizer.Show(self.EstRangeSizer)
             self.TopSizer.Hide(self.EtaSizer)
-            self.TopSizer.Hide(self.EstRangeSizer)
             self.TopSizer.Hide(self.BurnoutAngleSizer)
         self.Layout()
     
     def OnPresetChoice(self, event):
         #preset dictionary is in presets.txt
+        #surrogates built with surrogate.py are in surrogates/, named after the preset
+        app = wx.GetTopLevelParent(self)
+        surrogate_path = os.path.join(app.get_main_dir(),"surrogates",event.GetString() + ".npz")
+        self.surrogate = None
+        if os.path.exists(surrogate_path):
+            self.surrogate = Surrogate.load(surrogate_path)
         try:
             preset_data = self.presets[event.GetString()]
             numstages = preset_data['numstages']
@@ -312,79 +348,104 @@ class ParamsPanel(wx.Panel):
             #when choosing null twice, catch error
             pass
         
-    def OnRun(self,event):
-        sim = Simulation(self)
-        
+    def OnEdit(self,event):
+        "Shows the surrogate's range estimate for the fields as they are"
+        event.Skip()
+        if self.surrogate is None:
+            return
         try:
-            sim.payload = float(self.PayloadWeightControl.GetValue())
-            sim.rvdiam = float(self.RVControl.GetValue())
-            sim.missilediam = float(self.DiameterControl.GetValue())
-            
-            sim.trajectory = self.TrajectoryChoiceBox.GetStringSelection()
-            if sim.trajectory == 'Minimum Energy':
-                sim.est_range = float(self.EstRangeControl.GetValue())*1000 #convert to m
-
-            if sim.trajectory == 'Thrust Vector':
-                sim.TStartTurn = float(self.EtaTStartTurn.GetValue())
-                sim.TEndTurn = float(self.EtaTEndTurn.GetValue())
-                sim.TurnAngle = float(self.EtaTurnAngle.GetValue())
-                
-            if sim.trajectory == 'Burnout Angle':
-                sim.burnout_angle = float(self.BurnoutAngleCtrl.GetValue())
-                
-            if sim.trajectory == 'Turn Angle':
-                sim.TurnTimeStart = float(self.TurnTimeStart.GetValue())
-                sim.TurnTimeEnd = float(self.TurnTimeEnd.GetValue())
-                sim.TurnAngleStart = float(self.TurnAngleStart.GetValue())
-                sim.TurnAngleEnd = float(self.TurnAngleEnd.GetValue())
-                
-            sim.numstages = int(self.StageChoiceBox.GetSelection()+1)
-            #because choices[0]=1
+            config = self.GetConfig()
+        except ValueError:
+            return
+        app = wx.GetTopLevelParent(self)
+        estimate = self.surrogate.estimate(config)
+        if estimate is None:
+            app.SetStatusText("Outside the range estimate's region, run the simulation")
+        else:
+            app.SetStatusText("Estimated range %.0f km (+/- %.0f km)" % (estimate[0]/1000,self.surrogate.rms[0]/1000))
+        
+    def GetConfig(self):
+        "Reads the panel into a SimConfig, raises ValueError if a field is not a number"
+        numstages = int(self.StageChoiceBox.GetSelection()+1)
+        #because choices[0]=1
+        fuelmass,drymass,Isp0,thrust0 = [0],[0],[0],[0]
+        for i in range(1,numstages+1):
+            fuelmass.append(float(self.StageFuelMassCtrl[i].GetValue()))
+            drymass.append(float(self.StageDryMassCtrl[i].GetValue()))
+            Isp0.append(float(self.StageIspCtrl[i].GetValue()))
+            thrust0.append(float(self.StageThrustCtrl[i].GetValue())) #in kgf
+        config = SimConfig(float(self.PayloadWeightControl.GetValue()),
+            float(self.DiameterControl.GetValue()),
+            float(self.RVControl.GetValue()),
+            fuelmass,drymass,Isp0,thrust0,
+            trajectory=self.TrajectoryChoiceBox.GetStringSelection(),
+            integrator=self.IntegratorChoiceBox.GetStringSelection(),
+            rtol=float(self.RtolControl.GetValue()),
+            atol=float(self.AtolControl.GetValue()))
+        
+        if config.trajectory != 'Burnout Angle':
+            #the others steer to Wheelon's burnout angle for this range
+            config.estrange = float(self.EstRangeControl.GetValue()) #in km
 
-            for i in range(1,sim.numstages+1):
-                sim.fuelmass.append(float(self.StageFuelMassCtrl[i].GetValue()))
-                sim.m0.append(float(self.StageDryMassCtrl[i].GetValue())+sim.fuelmass[i])
-                sim.fuelfraction.append(float(sim.fuelmass[i]/sim.m0[i]))
-                sim.Isp0.append(float(self.StageIspCtrl[i].GetValue()))
-                sim.thrust0.append(float(self.StageThrustCtrl[i].GetValue())*9.81) #convert from kgf to N
-                sim.dMdt.append(float(sim.thrust0[i]/(sim.Isp0[i]*9.81)))
-            
-            self.sim = sim #external reference for writing sim params to file
-            
-            app = wx.GetTopLevelParent(self)
-            
-            #run sim, saving results
-            trajectory = self.TrajectoryChoiceBox.GetStringSelection()
-            app.Results.data = sim.integrate(trajectory)
+        if config.trajectory == 'Thrust Vector':
+            config.TStartTurn = float(self.EtaTStartTurn.GetValue())
+            config.TEndTurn = float(self.EtaTEndTurn.GetValue())
+            config.TurnAngle = float(self.EtaTurnAngle.GetValue())
             
-            app.nb.AdvanceSelection(forward=True) #turn to results page
-            
-            
-            #show requested stages
-            other = app.Results #short ref for below calls
-            for i in range(1,sim.numstages+1):
-                other.StageResultSizer.Show(other.StageNumberText[i])
-                other.StageResultSizer.Show(other.StageVelocityResult[i])
-                other.StageResultSizer.Show(other.StageAngleResult[i])
-                other.StageResultSizer.Show(other.StageHeightResult[i])
-                other.StageResultSizer.Show(other.StageRangeResult[i])
-                other.StageResultSizer.Show(other.StageTimeResult[i])
-            #hide unused stages in Results panel
-            for i in range(sim.numstages+1,6):
-                other.StageResultSizer.Hide(app.Results.StageNumberText[i])
-                other.StageResultSizer.Hide(other.StageVelocityResult[i])
-                other.StageResultSizer.Hide(other.StageAngleResult[i])
-                other.StageResultSizer.Hide(other.StageHeightResult[i])
-                other.StageResultSizer.Hide(other.StageRangeResult[i])
-                other.StageResultSizer.Hide(other.StageTimeResult[i])
-            app.Results.Layout()
+        if config.trajectory == 'Burnout Angle':
+            config.burnout_angle = float(self.BurnoutAngleCtrl.GetValue())
             
+        if config.trajectory == 'Turn Angle':
+            config.TurnTimeStart = float(self.TurnTimeStart.GetValue())
+            config.TurnTimeEnd = float(self.TurnTimeEnd.GetValue())
+            config.TurnAngleStart = float(self.TurnAngleStart.GetValue())
+            config.TurnAngleEnd = float(self.TurnAngleEnd.GetValue())
+        config.result_cache = wx.GetTopLevelParent(self).result_cache
+        return config
         
+    def OnRun(self,event):
+        try:
+            config = self.GetConfig()
         except ValueError,e:    
             #Validator should take care of this, but just in case.
             dlg = wx.MessageDialog(self,"Please make sure all fields are filled in.","Entry error",wx.OK | wx.ICON_INFORMATION)
             dlg.ShowModal()
             dlg.Destroy()
+            return
+        
+        app = wx.GetTopLevelParent(self)
+        
+        #run sim, or find it in the result cache, saving results
+        result = simulate(config)
+        app.Results.data = result.data
+        app.Results.ShowResult(result,config)
+        
+        app.nb.AdvanceSelection(forward=True) #turn to results page
+
+    def OnMaximize(self,event):
+        "Searches for the burnout angle of longest range and sets the estimated range that gives it"
+        try:
+            config = self.GetConfig()
+        except ValueError,e:
+            dlg = wx.MessageDialog(self,"Please make sure all fields are filled in.","Entry error",wx.OK | wx.ICON_INFORMATION)
+            dlg.ShowModal()
+            dlg.Destroy()
+            return
+        
+        solution = maximize(config)
+        #invert Wheelon's burnout angle, opt = pi/2 - .25*(est_range/Rearth + pi)
+        est_range = Rearth*(pi - 4*solution.x*pi/180)/1000 #in km
+        if est_range > 0:
+            self.EstRangeControl.SetValue("%.1f" % est_range)
+        
+        app = wx.GetTopLevelParent(self)
+        if solution.converged:
+            app.SetStatusText("Burnout angle %.2f deg for range %.1f km, %i runs" % (solution.x,solution.range/1000,solution.evaluations))
+        else:
+            app.SetStatusText("Longest range %.1f km at the end of the search, burnout angle %.2f deg" % (solution.range/1000,solution.x))
+        app.Results.data = solution.result.data
+        app.Results.ShowResult(solution.result,solution.config)
+        app.nb.AdvanceSelection(forward=True) #turn to results page
 
 class PlotFrame(wx.Frame):
     def __init__(self, parent, id, title):
@@ -396,9 +457,11 @@ class ResultsPanel(wx.Panel):
     def __init__(self, parent, id):
         wx.Panel.__init__(self, parent, id)
         
-        #RESULTS DATA DICTIONARY
-        self.data = {'Time':[0],'Height':[0],'Velocity':[0],'Thrust':[0],'Drag':[0],'Gamma':[0],'Range':[0]}
-        #create empty data dictionary
+        #RESULTS DATA
+        self.data = Trajectory()
+        #create empty trajectory
+        self.result = None #SimResult shown, and the config it was run from
+        self.config = None
         
         app = wx.GetTopLevelParent(self)
         self.frame = PlotFrame(None,-1,"Results Plot")
@@ -515,6 +578,46 @@ class ResultsPanel(wx.Panel):
         self.SetAutoLayout(1)
         self.Layout()
         
+    def ShowResult(self,result,config=None):
+        "Puts a SimResult in the panel, showing only the stages flown"
+        self.result = result
+        self.config = config
+        self.ApogeeResult.SetValue("%4.2f" % float(result.apogee/1000))
+        self.ApogeeVelocityResult.SetValue("%4.3f" % float(result.velocity/1000))
+        self.RangeResult.SetValue("%4.3f" % float(result.range/1000))
+        self.FlightTimeResult.SetValue("%4.1f" % result.flight_time)
+        for event in result.stages:
+            nstage = event.stage
+            self.StageVelocityResult[nstage].SetValue("%4.2f" % float(event.v/1000))
+            self.StageAngleResult[nstage].SetValue("%4.2f" % float(event.gamma*180/pi))
+            self.StageHeightResult[nstage].SetValue("%4.2f" % float(event.h/1000))
+            self.StageRangeResult[nstage].SetValue("%4.2f" % float(event.range/1000))
+            self.StageTimeResult[nstage].SetValue("%4.2f" % event.t)
+        
+        #show requested stages
+        numstages = len(result.stages)
+        for i in range(1,numstages+1):
+            self.StageResultSizer.Show(self.StageNumberText[i])
+            self.StageResultSizer.Show(self.StageVelocityResult[i])
+            self.StageResultSizer.Show(self.StageAngleResult[i])
+            self.StageResultSizer.Show(self.StageHeightResult[i])
+            self.StageResultSizer.Show(self.StageRangeResult[i])
+            self.StageResultSizer.Show(self.StageTimeResult[i])
+        #hide unused stages in Results panel
+        for i in range(numstages+1,6):
+            self.StageResultSizer.Hide(self.StageNumberText[i])
+            self.StageResultSizer.Hide(self.StageVelocityResult[i])
+            self.StageResultSizer.Hide(self.StageAngleResult[i])
+            self.StageResultSizer.Hide(self.StageHeightResult[i])
+            self.StageResultSizer.Hide(self.StageRangeResult[i])
+            self.StageResultSizer.Hide(self.StageTimeResult[i])
+        self.Layout()
+        
+        if result.timed_out:
+            dlg = wx.MessageDialog(self,"Exceeded time limit, results are likely invalid.","Simulation error",wx.OK | wx.ICON_INFORMATION)
+            dlg.ShowModal()
+            dlg.Destroy()
+
     def OnPlot(self,event):
         plot = []
         x = self.XRadioBox.GetStringSelection()
@@ -531,24 +634,33 @@ class ResultsPanel(wx.Panel):
         #set plot title here before adding units to description string
         title = "%s vs %s" % (y,x)
 
-        #determine stage burnouts        
-        app = wx.GetTopLevelParent(self)
-        sim = app.Params.sim
-        for i in range(1,sim.numstages+1):
+        #determine stage burnouts, of the result shown
+        events = []
+        if self.result is not None:
+            events = self.result.events
+        for event in events:
+            if event.kind != BURNOUT:
+                continue
             if x == "Time":
-                x_stage = float(self.StageTimeResult[i].GetValue())
+                x_stage = event.t
             if x == "Range":
-                x_stage = float(self.StageRangeResult[i].GetValue())
-            #can't figure out y value
-            #list lookup fails because array is floats w/ arbitrary precision
+                x_stage = event.range/1000.0 #in km
+            #y value from the event state, where it has one
+            if y == "Height":
+                y_stage = event.h/1000.0
+            elif y == "Velocity":
+                y_stage = event.v
+            elif y == "Gamma":
+                y_stage = event.gamma*(180.0/pi)
+            else:
+                y_stage = 0
             #plot stage burnout    
-            plot.append(PolyMarker([(x_stage,0)],
-            
-                legend="Stage %d Burnout" % i,marker='cross',colour='red',size=1))
+            plot.append(PolyMarker([(x_stage,y_stage)],
+                legend="Stage %d Burnout" % event.stage,marker='cross',colour='red',size=1))
 
         #unit conversion
         if x == "Range":
-            x_data = [elem/1000.0 for elem in self.data[x]] #convert to km
+            x_data = self.data[x]/1000.0 #convert to km
             x = x + ' (km)'
         elif x == "Time":
             x_data = self.data[x] #in seconds
@@ -557,10 +669,10 @@ class ResultsPanel(wx.Panel):
             y_data = self.data[y] #in N
             y = y + ' (N)'
         elif y == "Gamma":
-            y_data = [elem*(180.0/pi) for elem in self.data[y]] #convert to degrees
+            y_data = self.data[y]*(180.0/pi) #convert to degrees
             y = y + ' (deg h)'
         elif y == "Height":
-            y_data = [elem/1000.0 for elem in self.data[y]] #convert to km
+            y_data = self.data[y]/1000.0 #convert to km
             y = y + ' (km)'
         elif y == "Velocity":
             y_data = self.data[y] #in m/s
@@ -580,44 +692,28 @@ class ResultsPanel(wx.Panel):
         
                 
     def OnWriteToFile(self,event):
+        if self.result is None:
+            #nothing run yet, neither file can be written
+            dlg = wx.MessageDialog(self,"There is no result to write, run the simulation first.","No data",wx.OK | wx.ICON_INFORMATION)
+            dlg.ShowModal()
+            dlg.Destroy()
+            return
     
         dlg = wx.FileDialog(self, message="Save file as ...", defaultDir=os.getcwd(), 
-            defaultFile="data", style=wx.SAVE)
-        if dlg.ShowModal() == wx.ID_OK:
+            defaultFile="data", wildcard="Text (*.txt)|*.txt|Binary archive (*.irbm)|*.irbm", style=wx.SAVE)
+        if dlg.ShowModal() == wx.ID_OK and dlg.GetPath().endswith('.irbm'):
+            #binary, with the stage parameters and events, see archive.py
             path = dlg.GetPath()
-            self.outfile = open(path,'w')
-            
-            app = wx.GetTopLevelParent(self) #get ref to AppFrame instance for printing stage params
-            sim = app.Params.sim
-            for i in range(1,sim.numstages+1):
-                self.outfile.write("STAGE %i Parameters:\n" % i)
-                self.outfile.write("Fuel mass (kg): " + str(sim.fuelmass[i]) + '\n')
-                self.outfile.write("Dry mass (kg): " + str(sim.m0[i] - sim.fuelmass[i]) + '\n')
-                self.outfile.write("Fuel fract: " + str(sim.fuelfraction[i]) + '\n')
-                self.outfile.write("Isp: " + str(sim.Isp0[i]) + '\n')
-                self.outfile.write("Burn time (sec): " + str(sim.burntime[i]) + '\n')
-                self.outfile.write("Thrust (N): " + str(sim.thrust0[i]) + '\n')
-                self.outfile.write("dM/dt: " + str(sim.dMdt[i]) + '\n')
-            
-            self.outfile.write("\nTIME,HEIGHT,VELOCITY,THRUST,DRAG,GAMMA,RANGE\n")
-            
-            flat = zip(self.data['Time'],
-                    self.data['Height'],
-                    self.data['Velocity'],
-                    self.data['Thrust'],
-                    self.data['Drag'],
-                    self.data['Gamma'],
-                    self.data['Range'])
-            #create flat list
-                    
-            for i in range(1,len(flat)):
-                for n in range(0,len(flat[i])):
-                    self.outfile.write('%.3f' % flat[i][n])
-                    self.outfile.write(',')
-                self.outfile.write('\n')
-
+            archive.write(path,[(self.result,self.config)])
+            print "Data written to '%s'" % path
+        elif dlg.GetReturnCode() == wx.ID_OK:
+            path = dlg.GetPath()
+            #stage parameters, then the samples, compressed if path ends in .gz
+            stages = None
+            if self.config is not None:
+                stages = Simulation(self.config)
+            write_csv(path,self.data,stages=stages)
             print "Data written to '%s'" % path
-            self.outfile.close()
         #clean up
         dlg.Destroy()
         
@@ -667,10 +763,13 @@ class AdvancedPanel(wx.Panel):
         ConstraintSizer.Add(self.DryMassCtrl)
         ConstraintSizer.Add(wx.StaticText(self,-1,"kg"),0,wx.ALIGN_LEFT)
         
-        MiddleSizer = wx.FlexGridSizer(2,2,hgap=25,vgap=10)
+        MiddleSizer = wx.FlexGridSizer(0,2,hgap=25,vgap=10)
         MiddleSizer.Add(wx.StaticText(self,-1,"Estimated Range"),0)
         self.AnsGuessControl = NumCtrl(self,-1,"Your guess for the missile range")
         MiddleSizer.Add(self.AnsGuessControl,0)
+        MiddleSizer.Add(wx.StaticText(self,-1,"Parallel"),0)
+        self.ParallelCheckBox = wx.CheckBox(self,-1,"Run trial values on all processors at once")
+        MiddleSizer.Add(self.ParallelCheckBox,0)
 
         SolveButton = wx.Button(self,-1,"Solve")
         self.Bind(wx.EVT_BUTTON,self.OnSolve, SolveButton)
@@ -751,115 +850,56 @@ class AdvancedPanel(wx.Panel):
             dlg.Destroy()
             return False
             
+        app = wx.GetTopLevelParent(self)
         try:
-            #get solver params
+            #get solver params, the guess for the variable goes to the Parameters panel
             ans_est = float(self.AnsGuessControl.GetValue())
-            var_est = float(self.var_control.GetValue())
+            self.CheckConstraints()
+            config = app.Params.GetConfig()
         except ValueError:
                 dlg = wx.MessageDialog(self,"Please fill in all fields.","Unable to solve",wx.OK | wx.ICON_INFORMATION)
                 dlg.ShowModal()
                 dlg.Destroy()
                 return False
 
-        #print "Solve for stage",int(self.StageChoiceBox.GetSelection()+1),self.var_string
-        
-        #init search variables, need two starting values
-        #f is sim range - ans_est, because secant method solves for roots
-        oldx = var_est*.99 #hopefully still a reasonable value
-        self.var_control.SetValue("%.2f" % oldx)
-        oldf = self.RunSim() - ans_est
-        
-        x = var_est
-        self.var_control.SetValue("%.2f" % var_est)
-        f =  self.RunSim() - ans_est
+        nstage = int(self.StageChoiceBox.GetSelection()+1)
+        if self.var_string == "Fuel Fraction":
+            variable = FuelFraction(nstage)
         
-        run = 0
-        tolerance = 1e-2
-
-        if (abs(f) > abs(oldf)):
-            # swap so that f(x) is closer to 0
-            #print "swap"
-            oldx, x = x, oldx
-            oldf, f = f, oldf
-
-        while True:
-            #secant method
-            try:
-                dx = f*(x - oldx)/(f - oldf)
-                if abs(dx)<tolerance:
-                    print "solved, tolerance"
-                    break
-            except ZeroDivisionError:
-                print "solved, ZDE"
-                break
-            (oldx, x) = (x, x - dx)
-            self.var_control.SetValue("%.2f" % x)
-            (oldf, f) = (f, self.RunSim()-ans_est)
-            run += 1 #increment run number
-            print "sec(%d): x=%s, f(x)=%s, oldx=%s, oldf=%s,\n" % (run,x,f,oldx,oldf)
-            self.Gauge.SetValue(run)
-            self.AnswerControl.SetValue("%.2f" % x)
-            self.RangeControl.SetValue("%.2f" % (f+ans_est))
+        def progress(run,x,range):
+            "Shows each trial run"
+            self.Gauge.SetValue(min(run,self.max_runs))
+            self.AnswerControl.SetValue("%.2f" % (x*100))
+            self.RangeControl.SetValue("%.2f" % (range/1000))
             wx.Yield() #allow GUI to update
-            if run > self.max_runs:
-                dlg = wx.MessageDialog(self,"Solver failed to converge.","Unable to solve",wx.OK | wx.ICON_INFORMATION)
-                dlg.ShowModal()
-                dlg.Destroy()
-                return
-        #end of loop
-        #print "solved=",oldx
-        self.var_control.SetValue("%.2f" % oldx)
-        self.AnswerControl.SetValue("%.2f" % oldx)
-        self.Gauge.SetValue(self.max_runs)
         
-        if self.var_string == "Fuel Fraction":
-            #sanity check
-            answer = float(self.AnswerControl.GetValue())
-            if answer > 100 or answer < 0:
-                dlg = wx.MessageDialog(self,"Solver converged on an invalid value. Try inputting a more reasonable starting value for the variable.","Unable to solve",wx.OK | wx.ICON_INFORMATION)
-                dlg.ShowModal()
-                dlg.Destroy()
-                
-    def RunSim(self):
-        self.CheckConstraints()
-    
-        sim = Simulation(self)
-        app = wx.GetTopLevelParent(self)
         try:
-            sim.payload = float(app.Params.PayloadWeightControl.GetValue())
-            sim.rvdiam = float(app.Params.RVControl.GetValue())
-            sim.missilediam = float(app.Params.DiameterControl.GetValue())
-            sim.numstages = int(app.Params.StageChoiceBox.GetSelection()+1)
-            for i in range(1,sim.numstages+1):
-                sim.fuelmass.append(float(app.Params.StageFuelMassCtrl[i].GetValue()))
-                sim.m0.append(float(app.Params.StageDryMassCtrl[i].GetValue())+sim.fuelmass[i])
-                sim.fuelfraction.append(float(sim.fuelmass[i]/sim.m0[i]))
-                sim.Isp0.append(float(app.Params.StageIspCtrl[i].GetValue()))
-                sim.thrust0.append(float(app.Params.StageThrustCtrl[i].GetValue())*9.81) #convert from kgf to N
-                sim.dMdt.append(float(sim.thrust0[i]/(sim.Isp0[i]*9.81)))
-            trajectory = app.Params.TrajectoryChoiceBox.GetStringSelection()
-            if trajectory == "Minimum Energy":
-                sim.est_range = float(app.Params.EstRangeControl.GetValue())*1000 #convert to m
-            if trajectory == 'Thrust Vector':
-                sim.TStartTurn = float(self.EtaTStartTurn.GetValue())
-                sim.TEndTurn = float(self.EtaTEndTurn.GetValue())
-                sim.TurnAngle = float(self.EtaTurnAngle.GetValue())
-            if trajectory == 'Burnout Angle':
-                sim.burnout_angle = float(self.BurnoutAngleCtrl.GetValue())
-                
-        except ValueError:
-                dlg = wx.MessageDialog(self,"Please fill in all fields in Parameters panel.","Unable to solve",wx.OK | wx.ICON_INFORMATION)
-                dlg.ShowModal()
-                dlg.Destroy()
-                #advance to params panel
-        #run sim
-        data = sim.integrate(trajectory)
-        answer = float(app.Results.RangeResult.GetValue()) 
-        #subtract from ans_est because method works to find zero
-        del(sim) #delete last run
-        del(data)
-        return answer
+            if self.ParallelCheckBox.GetValue():
+                solution = solve_parallel(config,variable,ans_est*1000,maxiter=self.max_runs,callback=progress)
+            else:
+                solution = solve(config,variable,ans_est*1000,maxiter=self.max_runs,callback=progress)
+        except SolverError,e:
+            dlg = wx.MessageDialog(self,"Solver failed to converge: %s. Try a more reasonable starting value for the variable." % e,"Unable to solve",wx.OK | wx.ICON_INFORMATION)
+            dlg.ShowModal()
+            dlg.Destroy()
+            return
+        self.Gauge.SetValue(self.max_runs)
         
+        if not solution.converged:
+            #the range jumps across the target, leave the Parameters panel as it was
+            dlg = wx.MessageDialog(self,"No value gives a range of %.1f km. The nearest, %.2f%%, gives %.1f km. "
+                "The RK2 range jumps where a burnout crosses a time step; the DOPRI5 integrator can reach the target." %
+                (ans_est,solution.x*100,solution.range/1000),"Not converged",wx.OK | wx.ICON_INFORMATION)
+            dlg.ShowModal()
+            dlg.Destroy()
+        elif self.var_string == "Fuel Fraction":
+            self.FuelFractionCtrl.SetValue("%.2f" % (solution.x*100))
+            self.CheckConstraints() #writes stage masses to the Parameters panel
+        self.AnswerControl.SetValue("%.2f" % (solution.x*100))
+        self.RangeControl.SetValue("%.2f" % (solution.range/1000))
+        app.Results.data = solution.result.data
+        app.Results.ShowResult(solution.result,solution.config)
+        app.SetStatusText("Solved in %i iterations, %i runs" % (solution.iterations,solution.evaluations))
         
 class AppFrame(wx.Frame):
 
@@ -930,15 +970,28 @@ class AppFrame(wx.Frame):
         self.SetStatusText("")
         
         #load presets
+        #parsed safely, through an index that is rebuilt when the file changes
         try:
             preset_path = os.path.join(self.get_main_dir(), "presets.txt")
-            presets_file = open(preset_path,'r')
-            presets = eval(presets_file.read())
-        except SyntaxError:
-            dlg = wx.MessageDialog(self,"Syntax error in presets.txt. Make sure there are no empty lines or statements.","Parse error",wx.OK | wx.ICON_INFORMATION)
+            presets = Presets(preset_path)
+            if presets.errors:
+                message = '\n'.join([str(error) for error in presets.errors[:20]])
+                if len(presets.errors) > 20:
+                    message += '\n...'
+                dlg = wx.MessageDialog(self,"These presets in presets.txt could not be read and were left out:\n\n" + message,"Parse error",wx.OK | wx.ICON_INFORMATION)
+                dlg.ShowModal()
+                dlg.Destroy()
+        except (IOError,OSError):
+            dlg = wx.MessageDialog(self,"Could not read presets.txt.","Read error",wx.OK | wx.ICON_INFORMATION)
             dlg.ShowModal()
             dlg.Destroy()
-            presets = {'Error reading presets.txt':{}}
+            presets = {}
+        
+        #results of earlier runs, in memory for this session and on disk across sessions
+        try:
+            self.result_cache = Memo(backing=ResultCache(os.path.join(self.get_main_dir(),"cache")))
+        except OSError:
+            self.result_cache = Memo() #no writable place for the disk cache
         
         #create tabs
         self.nb = wx.Notebook(self,-1)
@@ -0,0 +1,44 @@
+"""Generic ODE steppers used by the simulation. States are plain lists of floats,
+which is faster than NumPy for the handful of variables in one trajectory."""
+
+#Dormand-Prince 5(4) coefficients
+#from Hairer, Norsett and Wanner, "Solving Ordinary Differential Equations I", p178
+C2,C3,C4,C5 = 1/5.,3/10.,4/5.,8/9.
+A21 = 1/5.
+A31,A32 = 3/40.,9/40.
+A41,A42,A43 = 44/45.,-56/15.,32/9.
+A51,A52,A53,A54 = 19372/6561.,-25360/2187.,64448/6561.,-212/729.
+A61,A62,A63,A64,A65 = 9017/3168.,-355/33.,46732/5247.,49/176.,-5103/18656.
+B1,B3,B4,B5,B6 = 35/384.,500/1113.,125/192.,-2187/6784.,11/84.
+#difference between 5th and embedded 4th order weights
+E1,E3,E4,E5,E6,E7 = 71/57600.,-71/16695.,71/1920.,-17253/339200.,22/525.,-1/40.
+
+def dopri5_step(f,t,y,k1,dt):
+    """Takes one Dormand-Prince step of size dt from (t,y), where k1 = f(t,y).
+    Returns the 5th order solution, its derivative (k1 of the next step, since
+    the method is first-same-as-last) and the local error estimate."""
+    n = range(len(y))
+    k2 = f(t + C2*dt,[y[i] + dt*A21*k1[i] for i in n])
+    k3 = f(t + C3*dt,[y[i] + dt*(A31*k1[i] + A32*k2[i]) for i in n])
+    k4 = f(t + C4*dt,[y[i] + dt*(A41*k1[i] + A42*k2[i] + A43*k3[i]) for i in n])
+    k5 = f(t + C5*dt,[y[i] + dt*(A51*k1[i] + A52*k2[i] + A53*k3[i] + A54*k4[i]) for i in n])
+    k6 = f(t + dt,[y[i] + dt*(A61*k1[i] + A62*k2[i] + A63*k3[i] + A64*k4[i] + A65*k5[i]) for i in n])
+    ynew = [y[i] + dt*(B1*k1[i] + B3*k3[i] + B4*k4[i] + B5*k5[i] + B6*k6[i]) for i in n]
+    k7 = f(t + dt,ynew)
+    err = [dt*(E1*k1[i] + E3*k3[i] + E4*k4[i] + E5*k5[i] + E6*k6[i] + E7*k7[i]) for i in n]
+    return ynew,k7,err
+
+def error_norm(err,y,ynew,rtol,atol):
+    """RMS of the error relative to the tolerance, accept the step if <= 1.
+    atol is a sequence with one absolute tolerance per variable."""
+    total = 0.0
+    for i in range(len(y)):
+        scale = atol[i] + rtol*max(abs(y[i]),abs(ynew[i]))
+        total += (err[i]/scale)**2
+    return (total/len(y))**0.5
+
+def next_step(dt,err):
+    "Step size for the next attempt, from the error norm of the last one"
+    if err == 0:
+        return dt*10
+    return dt*min(10,max(0.2,0.9*err**-0.2))
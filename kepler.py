@@ -0,0 +1,95 @@
+"""Two-body motion for the coast above the atmosphere.
+
+Once thrust is off and the missile is above 47 km, where the density model is
+zero, the only force left is gravity, g0*(Rearth/r)**2 toward the centre of the
+earth. The equations of motion in sim.py then describe a Kepler ellipse, which
+can be followed in closed form instead of step by step.
+
+Angles follow sim.py: gamma is the flight path angle from the local horizontal
+and psi the range angle, both in radians. Sample functions take a number or an
+array of times."""
+
+import numpy
+from math import sqrt,cos,sin,atan2,acos,pi
+
+class Conic(object):
+    """The ellipse through a state v,h,psi,gamma of the missile at time t,
+    for gravity with parameter mu = g0*Rearth**2 around a sphere of radius Rearth.
+    Time along it is measured by the mean anomaly M, unwrapped so that M grows
+    from the state given; apogee is at M = pi, perigee at 0 and 2*pi."""
+    def __init__(self,t,v,h,psi,gamma,mu,Rearth):
+        self.mu = mu
+        self.Rearth = Rearth
+        r = Rearth + h
+        self.ang = r*v*cos(gamma) #angular momentum per unit mass
+        self.p = self.ang**2/mu #semi-latus rectum
+        energy = v**2/2 - mu/r
+        self.a = -mu/(2*energy) if energy < 0 else None #semi-major axis, None if unbound
+        if self.a is not None:
+            self.e = sqrt(max(0.0,1 - self.p/self.a))
+            self.n = sqrt(mu/self.a**3) #mean motion
+            #true anomaly from e*cos(nu) and e*sin(nu)
+            nu = atan2(v*sin(gamma)*sqrt(self.p/mu),self.p/r - 1)
+            E = 2*atan2(sqrt(1 - self.e)*sin(nu/2),sqrt(1 + self.e)*cos(nu/2))
+            M = E - self.e*sin(E)
+            if M < 0:
+                M += 2*pi
+            self.t0 = t
+            self.M0 = M
+            self.omega = psi - self.anomaly(self.eccentric(M)) #range angle of perigee
+
+    def bound(self):
+        "True if the state is on an ellipse around the earth, moving forward"
+        return self.a is not None and self.ang > 0 and self.e > 1e-9
+
+    def time_at_radius(self,r):
+        """Time the missile next descends through radius r, None if it never does,
+        that is if r is outside the ellipse or below its perigee."""
+        cos_nu = (self.p/r - 1)/self.e
+        if not -1 <= cos_nu <= 1:
+            return None
+        nu = acos(cos_nu) #ascending crossing, 0..pi
+        E = 2*atan2(sqrt(1 - self.e)*sin(nu/2),sqrt(1 + self.e)*cos(nu/2))
+        M = 2*pi - (E - self.e*sin(E)) #the descending one
+        if M < self.M0:
+            return None
+        return self.time(M)
+
+    def time_of_apogee(self):
+        "Time of the next apogee, None if the missile is past it"
+        if self.M0 >= pi:
+            return None
+        return self.time(pi)
+
+    def time(self,M):
+        "Time at mean anomaly M"
+        return self.t0 + (M - self.M0)/self.n
+
+    def eccentric(self,M,iterations=50):
+        "Eccentric anomaly at mean anomaly M, by Newton's method on Kepler's equation"
+        e = self.e
+        E = M + e*numpy.sin(M)
+        for i in range(iterations):
+            dE = (E - e*numpy.sin(E) - M)/(1 - e*numpy.cos(E))
+            E = E - dE
+            if numpy.all(abs(dE) < 1e-13):
+                break
+        return E
+
+    def anomaly(self,E):
+        "True anomaly at eccentric anomaly E, continuous for 0 <= E < 2*pi"
+        e = self.e
+        return 2*numpy.arctan2(sqrt(1 + e)*numpy.sin(E/2),sqrt(1 - e)*numpy.cos(E/2))
+
+    def state(self,t):
+        "Speed, height, range angle and flight path angle at time t, each a float or an array"
+        e = self.e
+        E = self.eccentric(self.M0 + self.n*(numpy.asarray(t,dtype=float) - self.t0))
+        nu = self.anomaly(E)
+        r = self.a*(1 - e*numpy.cos(E))
+        v = numpy.sqrt(self.mu*(2/r - 1/self.a))
+        gamma = numpy.arctan2(e*numpy.sin(nu),1 + e*numpy.cos(nu))
+        psi = self.omega + nu
+        if numpy.ndim(t) == 0:
+            return float(v),float(r - self.Rearth),float(psi),float(gamma)
+        return v,r - self.Rearth,psi,gamma
@@ -0,0 +1,70 @@
+"""Memoization of simulation results in memory, for the length of a session.
+
+Solvers, sweeps and scripts often run the same config more than once. A Memo,
+passed as result_cache in the config like a ResultCache, keeps the most recent
+results keyed on the inputs of their configs, so a repeated run costs a lookup.
+
+Keys may be rounded to a number of significant digits, so that configs that
+differ by less than that share a result, as trial values do that agree to the
+digits shown. Misses can be passed on to a ResultCache on disk, so a Memo in
+front of one keeps the session's results in memory and every session's on disk."""
+
+from collections import OrderedDict
+from resultcache import canonical
+
+class Memo(object):
+    """Least recently used store of at most size SimResults, keyed on their configs' inputs,
+    rounded to digits significant digits if given. Misses are run by backing, a ResultCache,
+    if given. Results are shared by every run that finds them, and are not to be changed.
+    Counts its hits and misses. Each process has its own: a copy sent to a worker
+    process starts empty."""
+    def __init__(self,size=1024,digits=None,backing=None):
+        self.size = size
+        self.digits = digits
+        self.backing = backing
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+    def key(self,config):
+        "Inputs of config, rounded as the memo rounds them"
+        return canonical(config,self.digits)
+
+    def simulate(self,config):
+        "SimResult of config from the memo, or from running it and keeping the result"
+        from sim import Simulation
+        key = self.key(config)
+        result = self.results.get(key)
+        if result is not None:
+            self.hits += 1
+            self.results[key] = self.results.pop(key) #most recently used
+            return result
+        self.misses += 1
+        if self.backing is not None:
+            result = self.backing.simulate(config)
+        else:
+            result = Simulation(config).integrate()
+        self.results[key] = result
+        while len(self.results) > self.size:
+            self.results.popitem(last=False)
+        return result
+
+    def invalidate(self,config):
+        "Drops the result of config, True if there was one"
+        return self.results.pop(self.key(config),None) is not None
+
+    def clear(self):
+        "Drops every result, the counters are kept"
+        self.results = OrderedDict() #from least to most recently used
+
+    def __len__(self):
+        return len(self.results)
+
+    def __contains__(self,config):
+        return self.key(config) in self.results
+
+    def __getstate__(self):
+        #results stay in their process
+        state = self.__dict__.copy()
+        state['results'] = OrderedDict()
+        return state
@@ -0,0 +1,220 @@
+"""Monte Carlo dispersion of range, apogee and flight time.
+
+Each sample perturbs a baseline SimConfig: thrust, Isp, fuel and dry mass of each
+stage, burn time, and the steering, taken as the burnout angle. The samples are
+run in chunks, across a process pool or in the vectorized batch engine. Chunk i
+draws from its own random stream, seeded from (seed, i), so the results depend on
+the seed alone, not on the number of processes.
+
+The outcomes stream into running aggregates as chunks finish: mean, standard
+deviation and extremes, and quantiles of the miss by the P-square estimator, so
+no sample or trajectory is kept however many are run.
+
+The simulation flies in a plane, so the miss is the downrange distance between
+an impact and the impact of the unperturbed baseline, in m. Its median absolute
+value is the one-dimensional counterpart of the CEP."""
+
+import multiprocessing
+import numpy
+from sim import simulate
+from trajectory import RECORD_SUMMARY
+from batch import BatchSimulation
+from solver import BurnoutAngle
+
+class Dispersion(object):
+    """Standard deviations of the perturbations, drawn independently per stage from
+    normal distributions. thrust, Isp, fuelmass and drymass are fractions of the
+    baseline value. burntime is the fraction of the fuel left unburnt at an early
+    cutoff, taken as the absolute value of its draw, with the unburnt fuel carried
+    as dry mass. burnout_angle is in degrees, and flies a 'Burnout Angle' trajectory
+    steered to the baseline's angle plus the perturbation."""
+    def __init__(self,thrust=0.0,Isp=0.0,fuelmass=0.0,drymass=0.0,burntime=0.0,burnout_angle=0.0):
+        self.thrust = thrust
+        self.Isp = Isp
+        self.fuelmass = fuelmass
+        self.drymass = drymass
+        self.burntime = burntime
+        self.burnout_angle = burnout_angle
+
+    def sample(self,config,random):
+        """Perturbed copy of config, drawing from random, a numpy RandomState.
+        Every draw is made even for a zero deviation, so the stream is used alike
+        whatever the deviations are."""
+        config = config.copy()
+        for i in range(1,config.numstages+1):
+            d_thrust,d_Isp,d_fuel,d_dry,d_burn = random.standard_normal(5)
+            config.thrust0[i] = float(config.thrust0[i])*(1 + self.thrust*d_thrust)
+            config.Isp0[i] = float(config.Isp0[i])*(1 + self.Isp*d_Isp)
+            fuel = float(config.fuelmass[i])*(1 + self.fuelmass*d_fuel)
+            dry = float(config.drymass[i])*(1 + self.drymass*d_dry)
+            unburnt = fuel*min(abs(self.burntime*d_burn),1.0)
+            config.fuelmass[i] = fuel - unburnt
+            config.drymass[i] = dry + unburnt
+        d_angle = random.standard_normal()
+        if self.burnout_angle:
+            angle = BurnoutAngle().get(config) + self.burnout_angle*d_angle
+            config.trajectory = 'Burnout Angle'
+            config.burnout_angle = angle
+        return config
+
+class RunningStats(object):
+    "Count, mean, standard deviation and extremes of a stream of numbers, by Welford's method"
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0 #sum of squared deviations from the mean
+        self.min = None
+        self.max = None
+
+    def add(self,x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta/self.count
+        self.m2 += delta*(x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+    def std(self):
+        "Sample standard deviation"
+        if self.count < 2:
+            return 0.0
+        return (self.m2/(self.count - 1))**0.5
+
+    def __repr__(self):
+        return "<mean %g std %g min %s max %s of %i>" % (self.mean,self.std(),self.min,self.max,self.count)
+
+class Quantile(object):
+    """Estimate of the p quantile of a stream of numbers in constant memory, by the P-square
+    algorithm of Jain and Chlamtac, "The P2 Algorithm for Dynamic Calculation of Quantiles
+    and Histograms Without Storing Observations", CACM 28 (1985), p1076-1085."""
+    def __init__(self,p):
+        self.p = p
+        self.heights = [] #marker heights, the first five samples until there are five
+        self.positions = [1,2,3,4,5]
+        self.desired = [1,1 + 2*p,1 + 4*p,3 + 2*p,5]
+        self.increments = [0,p/2,p,(1 + p)/2,1]
+
+    def add(self,x):
+        q = self.heights
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+        n = self.positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k+1]:
+                k += 1
+        for i in range(k+1,5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        #adjust the middle markers toward their desired positions
+        for i in (1,2,3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i+1] - n[i] > 1) or (d <= -1 and n[i-1] - n[i] < -1):
+                d = d > 0 and 1 or -1
+                height = q[i] + d/float(n[i+1] - n[i-1])*((n[i] - n[i-1] + d)*(q[i+1] - q[i])/(n[i+1] - n[i])
+                    + (n[i+1] - n[i] - d)*(q[i] - q[i-1])/(n[i] - n[i-1]))
+                if not q[i-1] < height < q[i+1]:
+                    #parabola overshoots, interpolate linearly
+                    height = q[i] + d*(q[i+d] - q[i])/float(n[i+d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def value(self):
+        "The estimate, exact while there are five samples or fewer"
+        q = self.heights
+        if not q:
+            return None
+        if len(q) < 5 or self.positions[4] == 5:
+            return float(numpy.percentile(q,self.p*100))
+        return q[2]
+
+class Statistics(object):
+    """Aggregates of a Monte Carlo run. nominal is the SimResult of the baseline config.
+    range, apogee and flight_time are RunningStats over the samples that landed, in m and
+    sec, and miss is their impact minus the nominal one. rep and rep90 estimate the median
+    and 90th percentile of the absolute miss, the range error probable. timed_out counts
+    samples that exceeded the time limit, which are left out of the rest."""
+    def __init__(self,nominal):
+        self.nominal = nominal
+        self.samples = 0
+        self.timed_out = 0
+        self.range = RunningStats()
+        self.apogee = RunningStats()
+        self.flight_time = RunningStats()
+        self.miss = RunningStats()
+        self.rep = Quantile(.5)
+        self.rep90 = Quantile(.9)
+
+    def add(self,range,apogee,flight_time,timed_out):
+        "Adds the outcome of one sample"
+        range,apogee,flight_time = float(range),float(apogee),float(flight_time)
+        self.samples += 1
+        if timed_out:
+            self.timed_out += 1
+            return
+        self.range.add(range)
+        self.apogee.add(apogee)
+        self.flight_time.add(flight_time)
+        miss = range - self.nominal.range
+        self.miss.add(miss)
+        self.rep.add(abs(miss))
+        self.rep90.add(abs(miss))
+
+def run(config,dispersion,samples,seed=0,engine='pool',processes=None,chunk=256,callback=None):
+    """Runs samples perturbations of config by a Dispersion, returns Statistics.
+    engine is 'pool' to run chunks of samples in a multiprocessing pool of processes
+    (by default one per processor, 1 runs in this process), or 'batch' to run each chunk
+    together in a BatchSimulation, for RK2 configs. callback, if given, is called as
+    callback(statistics) after each chunk."""
+    if engine not in ('pool','batch'):
+        raise ValueError("unknown Monte Carlo engine %r" % engine)
+    if engine == 'batch' and config.integrator != 'RK2':
+        raise ValueError("the batch engine integrates with RK2 only")
+    #every sample flies its own boost, so there is nothing for the boost cache to reuse
+    config = config.copy(record=RECORD_SUMMARY,boost_cache=False)
+    statistics = Statistics(simulate(config))
+    jobs = [(config,dispersion,seed,i,min(chunk,samples - i*chunk),engine)
+        for i in range((samples + chunk - 1)//chunk)]
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = None
+    if engine == 'pool' and processes > 1:
+        pool = multiprocessing.Pool(processes)
+        outcomes = pool.imap(run_chunk,jobs) #in order, as they finish
+    else:
+        outcomes = (run_chunk(job) for job in jobs)
+    try:
+        for outcome in outcomes:
+            for values in zip(*outcome):
+                statistics.add(*values)
+            if callback is not None:
+                callback(statistics)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return statistics
+
+def run_chunk(job):
+    """Runs one chunk of samples, for worker processes.
+    Returns arrays of range, apogee, flight time and timed out flags."""
+    config,dispersion,seed,index,count,engine = job
+    random = numpy.random.RandomState([seed,index])
+    configs = [dispersion.sample(config,random) for i in range(count)]
+    if engine == 'batch':
+        results = BatchSimulation.from_configs(configs).integrate(configs[0].trajectory)
+        return results['Range'],results['Apogee'],results['FlightTime'],results['TimedOut']
+    results = [simulate(sample) for sample in configs]
+    return ([result.range for result in results],[result.apogee for result in results],
+        [result.flight_time for result in results],[result.timed_out for result in results])
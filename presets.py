@@ -0,0 +1,322 @@
+"""Reads the preset library, presets.txt, safely, and keeps a compiled index of it.
+
+The file stays a dict of dicts in Python syntax, but it is no longer run. It is split
+into entries by tokens, and each entry is read with ast.literal_eval, so only
+literals are accepted. Each entry is then checked, and one with a mistake, or with
+the name of an entry before it, is left out and reported with its line, without
+losing the others.
+
+Parsing is done only when the file changes. The presets are compiled into an index
+file next to it: each entry as JSON, read only when that preset is asked for, then
+binary columns of the stage count, payload and estimated range for queries. A JSON
+index with the names, errors and the size and time of the source it was built from
+comes last, ending with its offset and the magic string as in archive.py. Opening
+the library reads the index, so startup does not depend on the size of the entries."""
+
+import os
+import ast
+import json
+import struct
+import tempfile
+import tokenize
+import numpy
+from StringIO import StringIO
+
+MAGIC = 'IRBMPRE1'
+VERSION = 2 #2 leaves out repeated names
+TRAILER = struct.Struct('<Q8s') #offset of the index, magic
+SUFFIX = '.idx'
+
+#binary columns of the index, for queries
+COLUMNS = numpy.dtype([('numstages','<i4'),('payload','<f8'),('estrange','<f8'),('offset','<u8'),('length','<u4')])
+
+NUMBERS = ('payload','missilediam','rvdiam','estrange')
+STAGES = ('fuelmass','drymass','Isp0','thrust0')
+MAX_STAGES = 5
+
+class PresetError(object):
+    "A mistake in the presets file, in the entry name if known, at line"
+    def __init__(self,name,line,message):
+        self.name = name
+        self.line = line
+        self.message = message
+
+    def __str__(self):
+        if self.name is None:
+            return "line %i: %s" % (self.line,self.message)
+        return "line %i, %s: %s" % (self.line,self.name,self.message)
+
+def country_of(name):
+    "Country of a preset, the part of its name before ' - '"
+    return name.split(' - ',1)[0].strip()
+
+def parse(text):
+    """Entries of presets file text, as a list of (name, entry, line), and a list of
+    PresetErrors for the entries that cannot be read or are not valid. Of entries with
+    the same name the first is kept and the rest are errors."""
+    entries = []
+    errors = []
+    seen = {} #line of each name kept
+    lines = text.splitlines(True)
+    starts = [0] #offset of each line in text
+    for line in lines:
+        starts.append(starts[-1] + len(line))
+    def offset(position):
+        row,col = position
+        return starts[row-1] + col
+    items = [] #(start, end, line) of each entry in text
+    depth = 0
+    start = None
+    try:
+        for kind,token,begin,end,line in tokenize.generate_tokens(StringIO(text).readline):
+            if kind in (tokenize.COMMENT,tokenize.NL,tokenize.NEWLINE,tokenize.INDENT,tokenize.DEDENT,tokenize.ENDMARKER):
+                continue
+            if depth == 1 and token in (',','}'):
+                if start is not None:
+                    items.append((start[0],last,start[1]))
+                    start = None
+            elif depth >= 1 and start is None:
+                start = (offset(begin),begin[0])
+            elif depth == 0 and token != '{':
+                errors.append(PresetError(None,begin[0],"%r outside the presets dict" % token))
+            if token in '{[(':
+                depth += 1
+            elif token in '}])':
+                depth -= 1
+            last = offset(end)
+    except tokenize.TokenError,e:
+        #a bracket or quote left open, the entries before it are kept
+        message,(row,col) = e.args
+        if start is not None:
+            row = start[1] #where the entry left open starts
+        errors.append(PresetError(None,row,"bracket or quote not closed, the rest of the file is not read"))
+    for begin,end,line in items:
+        try:
+            item = ast.literal_eval('{' + text[begin:end] + '}')
+        except (SyntaxError,ValueError),e:
+            errors.append(PresetError(entry_name(text[begin:end]),line,"not a preset, %s" % e.args[0]))
+            continue
+        name,entry = item.items()[0]
+        problems = validate(name,entry)
+        if problems:
+            errors.extend([PresetError(name,line,problem) for problem in problems])
+        elif name in seen:
+            errors.append(PresetError(name,line,"name already used at line %i, left out" % seen[name]))
+        else:
+            seen[name] = line
+            entries.append((name,entry,line))
+    return entries,errors
+
+def entry_name(text):
+    "Name of an entry that cannot be read, if its name can be, otherwise None"
+    try:
+        name = ast.literal_eval(text.split(':',1)[0].strip())
+    except (SyntaxError,ValueError):
+        return None
+    if isinstance(name,basestring):
+        return name
+    return None
+
+def validate(name,entry):
+    "List of what is wrong with a preset, empty if it is valid"
+    def number(x):
+        return isinstance(x,(int,long,float)) and not isinstance(x,bool)
+    if not isinstance(name,basestring) or not name.strip():
+        return ["name %r is not a string" % (name,)]
+    if not isinstance(entry,dict):
+        return ["not a dict of parameters"]
+    problems = []
+    for key in NUMBERS:
+        if key not in entry:
+            problems.append("no %s" % key)
+        elif not number(entry[key]) or entry[key] < 0:
+            problems.append("%s %r is not a number >= 0" % (key,entry[key]))
+    if 'missilediam' in entry and entry['missilediam'] == 0:
+        problems.append("missilediam is 0")
+    n = entry.get('numstages')
+    if not isinstance(n,int) or not 1 <= n <= MAX_STAGES:
+        problems.append("numstages %r is not 1 to %i" % (n,MAX_STAGES))
+        return problems
+    for key in STAGES:
+        values = entry.get(key)
+        if not isinstance(values,list) or len(values) < n + 1:
+            problems.append("%s is not a list of %i values after the leading 0" % (key,n))
+        elif [value for value in values[1:n+1] if not number(value) or value < 0]:
+            problems.append("%s %r has values that are not numbers >= 0" % (key,values))
+        elif key != 'drymass' and 0 in values[1:n+1]:
+            problems.append("%s %r has a stage of 0" % (key,values))
+    return problems
+
+def index_path(path):
+    "The index file of a presets file"
+    return os.path.splitext(path)[0] + SUFFIX
+
+def source(path):
+    "Size and modification time of a presets file, that its index was built from"
+    stat = os.stat(path)
+    return [stat.st_size,repr(stat.st_mtime)]
+
+def build_index(path,index=None):
+    """Parses the presets file at path and writes its index, by default next to it.
+    Returns the PresetErrors."""
+    if index is None:
+        index = index_path(path)
+    built = source(path)
+    entries,errors = parse(open(path).read())
+    directory = os.path.dirname(os.path.abspath(index))
+    handle,temporary = tempfile.mkstemp(suffix='.tmp',dir=directory)
+    try:
+        stream = os.fdopen(handle,'wb')
+        try:
+            stream.write(MAGIC)
+            table = numpy.zeros(len(entries),dtype=COLUMNS)
+            for row,(name,entry,line) in zip(table,entries):
+                blob = json.dumps(entry)
+                row['numstages'] = entry['numstages']
+                row['payload'] = entry['payload']
+                row['estrange'] = entry['estrange']
+                row['offset'] = stream.tell()
+                row['length'] = len(blob)
+                stream.write(blob)
+            columns = stream.tell()
+            stream.write('\0'*(-columns % 8))
+            columns = stream.tell()
+            stream.write(table.tostring())
+            offset = stream.tell()
+            stream.write(json.dumps({'version':VERSION,'source':built,'count':len(entries),'columns':columns,
+                'names':[name for name,entry,line in entries],
+                'errors':[[error.name,error.line,error.message] for error in errors]}))
+            stream.write(TRAILER.pack(offset,MAGIC))
+        finally:
+            stream.close()
+        #written whole and renamed, so another process sees the old index or the new one
+        if os.name == 'nt' and os.path.exists(index):
+            os.remove(index)
+        os.rename(temporary,index)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return errors
+
+class Presets(object):
+    """The preset library in the presets file at path, read through its index, which is
+    rebuilt when the file has changed. Reads like a dict of preset entries by name, each
+    read from the index when first asked for. errors holds the PresetErrors of the
+    entries left out. If the index cannot be written, the file is parsed every time."""
+    def __init__(self,path,index=None):
+        self.path = path
+        self.index = index or index_path(path)
+        self.entries = {}
+        try:
+            header = self.read_index()
+            if header is None or header['source'] != source(path):
+                build_index(path,self.index)
+                header = self.read_index()
+        except (IOError,OSError):
+            header = None
+        if header is None:
+            #no index to be had, keep every entry in memory
+            self.index = None
+            entries,self.errors = parse(open(path).read())
+            self.names = [name for name,entry,line in entries]
+            self.entries = dict([(name,entry) for name,entry,line in entries])
+            self.table = numpy.zeros(len(entries),dtype=COLUMNS)
+            for row,(name,entry,line) in zip(self.table,entries):
+                row['numstages'],row['payload'],row['estrange'] = entry['numstages'],entry['payload'],entry['estrange']
+        else:
+            self.names = [str(name) for name in header['names']]
+            self.errors = [PresetError(name is not None and str(name) or None,line,str(message))
+                for name,line,message in header['errors']]
+            self.table = self.read_table(header)
+        self.rows = dict([(name,i) for i,name in enumerate(self.names)])
+
+    def read_index(self):
+        "The JSON index of the index file, None if it is missing, not an index or from another version"
+        try:
+            stream = open(self.index,'rb')
+        except IOError:
+            return None
+        try:
+            stream.seek(0,2)
+            if stream.tell() < len(MAGIC) + TRAILER.size:
+                return None
+            stream.seek(-TRAILER.size,2)
+            end = stream.tell()
+            offset,magic = TRAILER.unpack(stream.read(TRAILER.size))
+            if magic != MAGIC or offset > end:
+                return None
+            stream.seek(offset)
+            try:
+                header = json.loads(stream.read(end - offset))
+            except ValueError:
+                return None
+        finally:
+            stream.close()
+        if header.get('version') != VERSION:
+            return None
+        return header
+
+    def read_table(self,header):
+        stream = open(self.index,'rb')
+        try:
+            stream.seek(header['columns'])
+            return numpy.frombuffer(stream.read(header['count']*COLUMNS.itemsize),dtype=COLUMNS)
+        finally:
+            stream.close()
+
+    def __getitem__(self,name):
+        entry = self.entries.get(name)
+        if entry is None:
+            row = self.table[self.rows[name]] #KeyError for an unknown preset
+            stream = open(self.index,'rb')
+            try:
+                stream.seek(int(row['offset']))
+                entry = json.loads(stream.read(int(row['length'])))
+            finally:
+                stream.close()
+            entry = dict([(str(key),value) for key,value in entry.items()])
+            self.entries[name] = entry
+        return entry
+
+    def get(self,name,default=None):
+        if name in self.rows:
+            return self[name]
+        return default
+
+    def keys(self):
+        return list(self.names)
+
+    def items(self):
+        return [(name,self[name]) for name in self.names]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self,name):
+        return name in self.rows
+
+    def query(self,country=None,numstages=None,payload=None,estrange=None):
+        """Names of the presets of a country, with a number of stages, and with payload
+        and estrange within (low, high) ranges, either of which may be None"""
+        mask = numpy.ones(len(self.names),dtype=bool)
+        if numstages is not None:
+            mask &= self.table['numstages'] == numstages
+        for column,bounds in (('payload',payload),('estrange',estrange)):
+            if bounds is not None:
+                low,high = bounds
+                if low is not None:
+                    mask &= self.table[column] >= low
+                if high is not None:
+                    mask &= self.table[column] <= high
+        names = [self.names[i] for i in numpy.flatnonzero(mask)]
+        if country is not None:
+            names = [name for name in names if country_of(name) == country]
+        return names
+
+def load(path):
+    "Dict of the valid presets in the presets file at path, parsed without an index"
+    entries,errors = parse(open(path).read())
+    return dict([(name,entry) for name,entry,line in entries])
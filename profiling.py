@@ -0,0 +1,139 @@
+"""Profile of where a simulation run spends its steps and time, phase by phase.
+
+With profile=True in its SimConfig, a run splits its flight into phases: the boost
+of each stage, the coast from the end of boost to reentry at the top of the
+atmosphere, and the reentry down to impact. A missile that never leaves the
+atmosphere coasts all the way down. For each phase the profile has the
+integration steps, the simulated and wall clock time, and the number of calls to
+the density and drag lookups, the steering and thrust functions, and the
+equations of motion of the adaptive integrator.
+
+The counts are kept by wrapping those functions for the one run, and the phases
+are split where burnout and reentry events are added, so a run without a profile
+does no more work than before. A run that resumes from the boost cache has one
+phase for the whole boost, with the steps of the run that flew it, and the wall
+time of restoring it."""
+
+import time
+
+#functions of the simulation whose calls are counted
+COUNTED = ('density','Cdrag','eta','thrust_increase','derivs')
+
+class Phase(object):
+    """Steps, simulated time and wall time in sec, and calls of the counted functions,
+    by name in calls, in one phase of a run, or summed over many"""
+    def __init__(self,name,start=0.0):
+        self.name = name
+        self.start = start #simulated time the phase began
+        self.steps = 0
+        self.time = 0.0
+        self.wall = 0.0
+        self.calls = dict.fromkeys(COUNTED,0)
+
+    def add(self,other):
+        "Adds the counts of another phase to this one"
+        self.steps += other.steps
+        self.time += other.time
+        self.wall += other.wall
+        for name in COUNTED:
+            self.calls[name] += other.calls[name]
+
+    def to_dict(self):
+        phase = {'name':self.name,'start':self.start,'steps':self.steps,'time':self.time,'wall':self.wall}
+        phase.update(self.calls)
+        return phase
+
+class Counter(object):
+    "Stand-in for the atmosphere of a run, counting its lookups"
+    pass
+
+class Profile(object):
+    """Phases of a run, in order of flight, or summed phases of many runs by name;
+    see aggregate"""
+    def __init__(self):
+        self.phases = []
+        self.counts = dict.fromkeys(COUNTED,0) #calls so far
+        self.phase = None #the phase being flown
+        self.sim = None
+
+    def counted(self,function,name):
+        "function, counting its calls under name"
+        counts = self.counts
+        def call(*args):
+            counts[name] += 1
+            return function(*args)
+        return call
+
+    def start(self,sim,name):
+        "Counts calls of the functions of sim, a Simulation, and starts its first phase"
+        self.sim = sim
+        self.air = sim.air
+        for function in ('eta','thrust_increase','derivs'):
+            object.__setattr__(sim,function,self.counted(getattr(sim,function),function))
+        air = Counter()
+        air.density = self.counted(sim.air.density,'density')
+        air.Cdrag = self.counted(sim.air.Cdrag,'Cdrag')
+        object.__setattr__(sim,'air',air)
+        self.enter(name,0.0)
+
+    def enter(self,name,t):
+        "Ends the current phase at simulated time t and starts the next"
+        now = time.time()
+        if self.phase is not None:
+            self.close(t,now)
+        self.phase = Phase(name,t)
+        self.mark = (self.sim.steps,now,dict(self.counts))
+
+    def close(self,t,now):
+        phase = self.phase
+        steps,wall,counts = self.mark
+        phase.steps = self.sim.steps - steps
+        phase.time = t - phase.start
+        phase.wall = now - wall
+        for name in COUNTED:
+            phase.calls[name] = self.counts[name] - counts[name]
+        self.phases.append(phase)
+        self.phase = None
+
+    def finish(self,t):
+        "Ends the last phase at simulated time t and stops counting calls"
+        self.close(t,time.time())
+        sim = self.sim
+        for function in ('eta','thrust_increase','derivs'):
+            del sim.__dict__[function]
+        object.__setattr__(sim,'air',self.air)
+        self.sim = self.air = None
+
+    def total(self):
+        "Phase with the sum of every phase"
+        total = Phase('total')
+        for phase in self.phases:
+            total.add(phase)
+        return total
+
+    def to_dict(self):
+        "The phases, as a list of dicts, for JSON"
+        return [phase.to_dict() for phase in self.phases]
+
+    def table(self):
+        "Phases and their total as comma separated text"
+        lines = [','.join(['PHASE','STEPS','TIME (sec)','WALL (sec)'] + [name.upper() for name in COUNTED])]
+        for phase in self.phases + [self.total()]:
+            lines.append(','.join([phase.name,str(phase.steps),'%.3f' % phase.time,'%.6f' % phase.wall] +
+                [str(phase.calls[name]) for name in COUNTED]))
+        return '\n'.join(lines)
+
+def aggregate(profiles):
+    """Profile summing the phases of the same name over profiles, as of the runs of
+    a sweep; None entries, for runs without a profile, are left out"""
+    total = Profile()
+    phases = {}
+    for profile in profiles:
+        if profile is None:
+            continue
+        for phase in profile.phases:
+            if phase.name not in phases:
+                phases[phase.name] = Phase(phase.name)
+                total.phases.append(phases[phase.name])
+            phases[phase.name].add(phase)
+    return total
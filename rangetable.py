@@ -0,0 +1,134 @@
+"""Lookup tables of the value of one missile parameter needed for each of many ranges.
+
+The targets are solved in order of range, each starting from what the ones before
+it learned. Every run made so far is kept with its range, which does not depend
+on the target, so two neighbouring runs that the next target falls between already
+bracket it. Otherwise the bracket is searched for from a prediction, extrapolated
+along the line through the last two solutions, in small steps.
+
+The sorted targets are split into contiguous segments, solved side by side in a
+process pool, each by continuation from its own first target."""
+
+import multiprocessing
+import numpy
+from sim import simulate
+from trajectory import RECORD_SUMMARY
+from solver import SolverError,bracket,brent,illinois,narrowest
+
+class RangeTable(object):
+    """Solutions for a list of target ranges [m], in order of range: arrays of the target,
+    the value x of the variable (nan where it failed), the range [m] run with it, solver
+    iterations and simulation runs for each target, and converged flags, and the errors,
+    the message of the SolverError for each target that failed and None for the rest."""
+    def __init__(self,variable,target,x,range,iterations,evaluations,converged,errors):
+        self.variable = variable
+        self.target = target
+        self.x = x
+        self.range = range
+        self.iterations = iterations
+        self.evaluations = evaluations
+        self.converged = converged
+        self.errors = errors
+
+    def __len__(self):
+        return len(self.target)
+
+    def residual(self):
+        "Range minus target for each target [m]"
+        return self.range - self.target
+
+    def lookup(self,range):
+        "Value of the variable for range [m], a number or an array, interpolated between converged targets"
+        ok = self.converged
+        return numpy.interp(range,self.target[ok],self.x[ok])
+
+    def table(self):
+        "Text table of the solutions with their diagnostics, one target per line"
+        lines = ["TARGET (km),%s,RANGE (km),ITERATIONS,RUNS,CONVERGED" % self.variable.name.upper()]
+        for i in range(len(self.target)):
+            if self.errors[i] is not None:
+                lines.append("%.3f,,,%i,%i,%s" % (self.target[i]/1000,self.iterations[i],self.evaluations[i],self.errors[i]))
+                continue
+            lines.append("%.3f,%.6g,%.3f,%i,%i,%s" % (self.target[i]/1000,self.x[i],self.range[i]/1000,
+                self.iterations[i],self.evaluations[i],self.converged[i]))
+        return '\n'.join(lines) + '\n'
+
+def solve_table(config,variable,targets,method='brent',processes=None,segments=None,
+        tolerance=1.0,xtol=1e-9,maxiter=50):
+    """Value of variable in config that gives each of targets [m], within tolerance [m],
+    or xtol relative or the variable's resolution, by continuation along the targets in order of range. method is
+    'brent' or 'illinois'. The targets are split into segments, by default one per
+    process, run in a multiprocessing pool of processes, by default one per processor,
+    or in this process if processes is 1. Targets that cannot be solved are reported
+    in the table rather than raised. Returns a RangeTable."""
+    if method not in ('brent','illinois'):
+        raise ValueError("unknown solver method %r" % method)
+    targets = sorted(float(target) for target in targets)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if segments is None:
+        segments = processes
+    segments = max(1,min(segments,len(targets)))
+    size = (len(targets) + segments - 1)//segments
+    trial_config = config.copy(record=RECORD_SUMMARY)
+    jobs = [(trial_config,variable,targets[i:i+size],method,tolerance,xtol,maxiter)
+        for i in range(0,len(targets),size)]
+    if processes > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(processes,len(jobs)))
+        try:
+            rows = sum(pool.map(solve_segment,jobs),[])
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        rows = sum([solve_segment(job) for job in jobs],[])
+
+    columns = zip(*rows)
+    return RangeTable(variable,numpy.array(targets),numpy.array(columns[0],dtype=float),numpy.array(columns[1],dtype=float),
+        numpy.array(columns[2],dtype=int),numpy.array(columns[3],dtype=int),numpy.array(columns[4],dtype=bool),list(columns[5]))
+
+def solve_segment(job):
+    """Solves a segment of targets, in order, by continuation, for worker processes.
+    Returns a list of x, range, iterations, runs, converged and error for each target."""
+    config,variable,targets,method,tolerance,xtol,maxiter = job
+    ranges = {} #range of each x run so far, whatever the target
+    solved = [] #x of the targets solved so far
+    rows = []
+    for target in targets:
+        runs = len(ranges)
+        def f(x):
+            if x not in ranges:
+                ranges[x] = simulate(variable.set(config,x)).range
+            return ranges[x] - target
+
+        #predict x from the solutions so far
+        if len(solved) >= 2 and solved[-1][1] != solved[-2][1]:
+            (x1,t1),(x2,t2) = solved[-2:]
+            guess = x2 + (x2 - x1)*(target - t2)/(t2 - t1)
+            lo,hi = variable.bounds
+            if (lo is not None and guess < lo) or (hi is not None and guess > hi):
+                guess = x2
+        elif solved:
+            guess = solved[-1][0]
+        else:
+            guess = variable.get(config)
+        try:
+            #the pair of neighbouring runs the target falls between nearest the guess, if any
+            xs = sorted(ranges)
+            pairs = [(a,b) for a,b in zip(xs,xs[1:]) if f(a)*f(b) <= 0]
+            if pairs:
+                a,b = min(pairs,key=lambda pair: abs((pair[0] + pair[1])/2 - guess))
+                fa,fb = f(a),f(b)
+            else:
+                a,fa,b,fb = bracket(f,guess,variable.bounds,step=.01)
+            if method == 'brent':
+                x,iterations = brent(f,a,fa,b,fb,narrowest(variable,xtol,a,b),tolerance,maxiter)
+            else:
+                x,iterations = illinois(f,a,fa,b,fb,narrowest(variable,xtol,a,b),tolerance,maxiter)
+        except SolverError,e:
+            rows.append((numpy.nan,numpy.nan,0,len(ranges) - runs,False,str(e)))
+            continue
+        converged = abs(f(x)) <= tolerance
+        solved.append((x,target))
+        rows.append((x,ranges[x],iterations,len(ranges) - runs,converged,None))
+    return rows
@@ -0,0 +1,211 @@
+"""Persistent cache of simulation results on disk.
+
+Each result is stored in its own file, named by a hash of everything the run
+depends on: the stages, payload, diameters, trajectory and its steering
+parameters, integrator, atmosphere, coast and recording settings, the names of
+the settings of SimConfig, so that adding one changes every key, and the engine
+revision below, which is to be raised whenever a change to the simulation
+changes its results. Equal inputs give equal files, so the cache can be shared
+by any number of processes and sessions without locks. Files are written under
+a temporary name and renamed into place, so a reader sees a whole file or none.
+
+Files are NumPy .npz archives of the summary, the events and, optionally, the
+trajectory samples. The total size is bounded: when a store takes it over the
+limit, the least recently used files are deleted, by their modification time,
+which a hit updates."""
+
+import os
+import tempfile
+import hashlib
+import zipfile
+import numpy
+from events import Event
+from trajectory import Trajectory,RECORD_ALL,RECORD_SUMMARY
+
+#to be raised along with any change to the simulation that changes its results: 2, Thrust
+#Vector and Turn Angle steer by estrange; 3, the RK2 step is a setting; 4, runs that record
+#a summary keep no boost samples
+ENGINE_REVISION = 4
+ENGINE_VERSION = 'irbm-sim %i' % ENGINE_REVISION
+
+SUFFIX = '.npz'
+
+class ResultCache(object):
+    """Cache of SimResults in the directory path, holding at most max_bytes. trajectories
+    is False to keep only summaries and events, in which case runs that record samples
+    are not cached. Counts its hits, misses, stores and evictions in this process."""
+    def __init__(self,path,max_bytes=256*2**20,trajectories=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.trajectories = trajectories
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.bytes = self.size() #estimate, others may add files too
+
+    def key(self,config):
+        "Hash of the inputs of config, the file name of its result"
+        return hashlib.sha1(canonical(config)).hexdigest()
+
+    def filename(self,config):
+        return os.path.join(self.path,self.key(config) + SUFFIX)
+
+    def cacheable(self,config):
+        "False for runs whose samples are not to be kept"
+        return self.trajectories or config.record == RECORD_SUMMARY
+
+    def simulate(self,config):
+        "SimResult of config from the cache, or from running it and storing the result"
+        from sim import Simulation
+        result = self.get(config)
+        if result is None:
+            result = Simulation(config).integrate()
+            self.put(config,result)
+        return result
+
+    def get(self,config):
+        "Stored SimResult of config, or None, counting a hit or a miss"
+        if not self.cacheable(config):
+            return None
+        filename = self.filename(config)
+        try:
+            data = numpy.load(filename)
+            try:
+                result = unpack(data,config)
+            finally:
+                data.close()
+            os.utime(filename,None) #most recently used
+        except (IOError,OSError,KeyError,ValueError,zipfile.BadZipfile):
+            #not stored, evicted meanwhile, or unreadable
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self,config,result):
+        "Stores the result of config, evicting the least recently used results if over the size limit"
+        if not self.cacheable(config):
+            return
+        filename = self.filename(config)
+        handle,temporary = tempfile.mkstemp(suffix='.tmp',dir=self.path)
+        try:
+            stream = os.fdopen(handle,'wb')
+            try:
+                numpy.savez(stream,**pack(result))
+            finally:
+                stream.close()
+            nbytes = os.path.getsize(temporary)
+            os.rename(temporary,filename)
+        except OSError:
+            #on Windows rename does not replace, another process stored the same result
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return
+        self.stores += 1
+        self.bytes += nbytes
+        if self.bytes > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        "Modification time, size and name of each stored result, least recently used first"
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path,name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime,stat.st_size,name))
+        entries.sort()
+        return entries
+
+    def size(self):
+        "Bytes held by stored results"
+        return sum([entry[1] for entry in self.entries()])
+
+    def evict(self):
+        "Deletes least recently used results until the cache is within its size limit"
+        entries = self.entries()
+        self.bytes = sum([entry[1] for entry in entries])
+        for mtime,nbytes,name in entries:
+            if self.bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.path,name))
+                self.evictions += 1
+            except OSError:
+                pass #evicted by another process
+            self.bytes -= nbytes
+
+    def clear(self):
+        "Deletes every stored result, the counters are kept"
+        for mtime,nbytes,name in self.entries():
+            try:
+                os.remove(os.path.join(self.path,name))
+            except OSError:
+                pass
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self.entries())
+
+    def __contains__(self,config):
+        return os.path.exists(self.filename(config))
+
+def canonical(config,digits=None):
+    """The inputs of a config that its result depends on, as a string, with numbers as
+    floats so that 1300 and 1300.0 are the same, or rounded to digits significant digits"""
+    def number(x):
+        if x is None:
+            return None
+        if digits is not None:
+            return '%.*g' % (digits,float(x))
+        return repr(float(x))
+    stages = [[number(getattr(config,name)[i]) for name in ('fuelmass','drymass','Isp0','thrust0')]
+        for i in range(1,config.numstages+1)]
+    inputs = [ENGINE_VERSION,sorted(vars(config)),stages,number(config.payload),number(config.missilediam),number(config.rvdiam),
+        config.trajectory,config.integrator,config.atmosphere,config.coast,config.record,str(numpy.dtype(config.dtype))]
+    if config.record not in (RECORD_ALL,RECORD_SUMMARY):
+        inputs.append(number(config.record_every))
+    if config.integrator == 'DOPRI5':
+        inputs += [number(config.rtol),number(config.atol)]
+    else:
+        inputs.append(number(config.step))
+    if config.trajectory != 'Burnout Angle':
+        inputs.append(number(config.estrange))
+    if config.trajectory == 'Burnout Angle':
+        inputs.append(number(config.burnout_angle))
+    elif config.trajectory == 'Thrust Vector':
+        inputs += [number(config.TStartTurn),number(config.TEndTurn),number(config.TurnAngle)]
+    elif config.trajectory == 'Turn Angle':
+        inputs += [number(config.TurnTimeStart),number(config.TurnTimeEnd),number(config.TurnAngleStart),number(config.TurnAngleEnd)]
+    return repr(inputs)
+
+def pack(result):
+    "Arrays to store a SimResult as"
+    events = result.events
+    stages = [event.stage for event in events]
+    return dict(
+        summary=numpy.array([result.range,result.apogee,result.velocity,result.flight_time,result.timed_out,result.steps],dtype=float),
+        kinds=numpy.array([event.kind for event in events] or [''])[:len(events)],
+        events=numpy.array([[event.t,event.h,event.v,event.gamma,event.range,event.m] for event in events],dtype=float).reshape(-1,6),
+        stages=numpy.array([stage is None and -1 or stage for stage in stages],dtype=int),
+        samples=result.data.buffer[:,:result.data.size])
+
+def unpack(data,config):
+    "SimResult from the arrays of pack, with the trajectory recorded as config asks"
+    from sim import SimResult
+    range,apogee,velocity,flight_time,timed_out,steps = data['summary']
+    events = []
+    for kind,(t,h,v,gamma,distance,m),stage in zip(data['kinds'],data['events'],data['stages']):
+        events.append(Event(str(kind),float(t),float(h),float(v),float(gamma),float(distance),float(m),
+            stage >= 0 and int(stage) or None))
+    trajectory = Trajectory(numpy.dtype(config.dtype),record=config.record,every=config.record_every)
+    samples = data['samples']
+    if samples.shape[1]:
+        trajectory.extend(*samples)
+    return SimResult(trajectory,events,float(range),float(apogee),float(velocity),float(flight_time),bool(timed_out),int(steps))
@@ -1,6 +1,117 @@
-"""The numerical simulation. Basic text interface provided when run as main. Real interface in gui.pyw"""
+"""The numerical simulation. Basic text interface provided when run as main. Real interface in gui.pyw
+
+The engine does no input or output of its own: build a SimConfig, pass it to
+simulate() or Simulation, and read the SimResult it returns."""
 
 from math import *
+import numpy
+from copy import copy
+from trajectory import *
+import atmosphere
+import boostcache
+from integrators import dopri5_step,error_norm,next_step
+from events import *
+from kepler import Conic
+from profiling import Profile
+
+##### SET CONSTANTS
+Rearth = 6370000 #[m]
+g0 = 9.8066 #[m/s^2]
+h_vacuum = 160934 #~100 miles, thrust stops increasing with height
+vertical_flight_period = 5 #[sec] gamma held at launch angle
+
+class SimConfig(object):
+    """Parameters of one simulation run, in the format of presets.txt.
+    Stage lists start with a 0 entry so stage i is at index i.
+    Units: kg, sec (Isp0), kgf (thrust0), m (diameters), km (estrange).
+    The turn parameters are only used by the trajectories that need them."""
+    def __init__(self,payload,missilediam,rvdiam,fuelmass,drymass,Isp0,thrust0,estrange=0.0,
+            trajectory='Minimum Energy',integrator='RK2',step=.1,rtol=1e-7,atol=1e-3,
+            dtype='float64',record=RECORD_ALL,record_every=1,atmosphere='exact',coast='integrate',
+            boost_cache=True,result_cache=None,profile=False,
+            TStartTurn=None,TEndTurn=None,TurnAngle=None,burnout_angle=None,
+            TurnTimeStart=None,TurnTimeEnd=None,TurnAngleStart=None,TurnAngleEnd=None):
+        self.payload = payload
+        self.missilediam = missilediam
+        self.rvdiam = rvdiam
+        self.fuelmass = list(fuelmass)
+        self.drymass = list(drymass)
+        self.Isp0 = list(Isp0)
+        self.thrust0 = list(thrust0)
+        self.numstages = len(self.fuelmass) - 1
+        self.estrange = estrange
+        self.trajectory = trajectory
+        self.integrator = integrator
+        self.step = step #of RK2 after the first second [sec]
+        self.rtol = rtol
+        self.atol = atol
+        self.dtype = dtype #of trajectory samples, 'float32' halves their memory
+        #which steps to save, see trajectory.py; record_every is k steps or N seconds
+        self.record = record
+        self.record_every = record_every
+        #'exact' model, or tables of it at 'fine', 'medium' or 'coarse' spacing, see atmosphere.py
+        self.atmosphere = atmosphere
+        #'integrate' the coast above the atmosphere step by step, or follow it as a 'kepler' ellipse
+        self.coast = coast
+        #resume from the state at end of boost saved by an earlier run with the same boost, see boostcache.py
+        #True for the cache shared by the process, False for none, or a BoostCache
+        self.boost_cache = boost_cache
+        #look the result up in, and store it to, a ResultCache on disk or a Memo in memory,
+        #see resultcache.py and memo.py; None for none
+        self.result_cache = result_cache
+        #count steps, time and calls in each phase of flight into the result's profile, see profiling.py
+        self.profile = profile
+        #Thrust Vector
+        self.TStartTurn = TStartTurn
+        self.TEndTurn = TEndTurn
+        self.TurnAngle = TurnAngle
+        #Burnout Angle
+        self.burnout_angle = burnout_angle
+        #Turn Angle
+        self.TurnTimeStart = TurnTimeStart
+        self.TurnTimeEnd = TurnTimeEnd
+        self.TurnAngleStart = TurnAngleStart
+        self.TurnAngleEnd = TurnAngleEnd
+
+    def copy(self,**changes):
+        "Copy with its own stage lists, keyword arguments change attributes of the copy"
+        config = copy(self)
+        for name in ('fuelmass','drymass','Isp0','thrust0'):
+            setattr(config,name,list(getattr(self,name)))
+        for name,value in changes.items():
+            setattr(config,name,value)
+        return config
+    
+    def from_preset(cls,preset,**kwargs):
+        "Config from an entry of presets.txt, keyword arguments set the rest"
+        n = preset['numstages']
+        return cls(preset['payload'],preset['missilediam'],preset['rvdiam'],
+            preset['fuelmass'][:n+1],preset['drymass'][:n+1],preset['Isp0'][:n+1],preset['thrust0'][:n+1],
+            estrange=preset['estrange'],**kwargs)
+    from_preset = classmethod(from_preset)
+
+class SimResult(object):
+    """Outcome of one simulation run. Units are as in the results dict:
+    sec, m, m/s, radians from horizontal, kg."""
+    def __init__(self,data,events,range,apogee,velocity,flight_time,timed_out,steps,profile=None):
+        self.data = data #Trajectory, arrays keyed by quantity
+        self.events = events #burnouts, apogee etc. in order of time
+        self.stages = [event for event in events if event.kind == BURNOUT] #one per stage
+        self.range = range
+        self.apogee = apogee
+        self.velocity = velocity #at end of flight
+        self.flight_time = flight_time
+        self.timed_out = timed_out #flight exceeded the time limit, results are likely invalid
+        self.landed = find(events,IMPACT) is not None
+        self.steps = steps #integration steps taken
+        self.profile = profile #Profile of the phases of flight, if asked for
+
+def simulate(config):
+    """Runs the simulation for a SimConfig, or finds it in its result cache, returns a SimResult.
+    Runs with a profile are always integrated."""
+    if config.result_cache is not None and not config.profile:
+        return config.result_cache.simulate(config)
+    return Simulation(config).integrate()
 
 class Simulation(object):
     """The numerical simulation"""
@@ -8,8 +119,7 @@ class Simulation(object):
         object.__setattr__(self, name, value)
         #used to allow attribute write access by other methods
     
-    def __init__(self,parent):
-        self.parent = parent #for reference to gui appframe
+    def __init__(self,config=None):
         #stage parameter lists
         self.burntime = ['']
         self.thrust0 = ['']
@@ -18,86 +128,256 @@ class Simulation(object):
         self.fuelfraction = ['']
         self.fuelmass = ['']
         self.dMdt = ['']
-        #results dict
-        self.data = {'Time':[0],'Height':[0],'Mass':[0],'Velocity':[0],'Thrust':[0],'Drag':[0],'Gamma':[pi/2],'Range':[0]}
+        #trajectory samples, made by integrate
+        self.data = None
+        self.dtype = numpy.float64
+        self.record_policy = RECORD_ALL
+        self.record_every = 1
+        self.atmosphere = 'exact' #accuracy of density and drag lookups
+        self.coast = 'integrate' #or 'kepler' to skip the coast above the atmosphere analytically
+        self.boost_cache = None #BoostCache of states at end of boost, or None
+        self.boost_key = None #key of this run's boost in it, while the boost samples are kept
+        #integration method, 'RK2' with fixed steps or 'DOPRI5' with adaptive steps
+        self.integrator = 'RK2'
+        self.step = .1 #fixed step after the first second [sec]
+        self.rtol = 1e-7 #relative tolerance for adaptive steps
+        self.atol = 1e-3 #absolute tolerance [m, m/s, kg], angles as arc length on the earth
+        self.steps = 0 #integration steps taken
+        self.events = [] #burnouts, apogee etc. in order of time
+        self.profiling = False #keep a Profile of the phases of flight
+        self.profile = None #of the last run, if profiling
+        if config is not None:
+            self.configure(config)
+    
+    def configure(self,config):
+        "Sets missile, trajectory and integrator parameters from a SimConfig"
+        self.payload = float(config.payload)
+        self.rvdiam = float(config.rvdiam)
+        self.missilediam = float(config.missilediam)
+        self.numstages = config.numstages
+        for i in range(1,self.numstages+1):
+            self.fuelmass.append(float(config.fuelmass[i]))
+            self.m0.append(float(config.drymass[i])+self.fuelmass[i])
+            self.fuelfraction.append(self.fuelmass[i]/self.m0[i])
+            self.Isp0.append(float(config.Isp0[i]))
+            self.thrust0.append(float(config.thrust0[i])*9.81) #convert from kgf to N
+            self.dMdt.append(self.thrust0[i]/(self.Isp0[i]*9.81))
+        self.trajectory = config.trajectory
+        if self.trajectory != 'Burnout Angle':
+            #the others steer to Wheelon's burnout angle for this range
+            self.est_range = float(config.estrange)*1000 #convert to m
+        if self.trajectory == 'Thrust Vector':
+            self.TStartTurn = config.TStartTurn
+            self.TEndTurn = config.TEndTurn
+            self.TurnAngle = config.TurnAngle
+        if self.trajectory == 'Burnout Angle':
+            self.burnout_angle = config.burnout_angle
+        if self.trajectory == 'Turn Angle':
+            self.TurnTimeStart = config.TurnTimeStart
+            self.TurnTimeEnd = config.TurnTimeEnd
+            self.TurnAngleStart = config.TurnAngleStart
+            self.TurnAngleEnd = config.TurnAngleEnd
+        self.integrator = config.integrator
+        self.step = float(config.step)
+        self.rtol = config.rtol
+        self.atol = config.atol
+        self.dtype = numpy.dtype(config.dtype)
+        self.record_policy = config.record
+        self.record_every = config.record_every
+        self.atmosphere = config.atmosphere
+        self.coast = config.coast
+        self.profiling = config.profile
+        if config.boost_cache is True:
+            self.boost_cache = boostcache.cache
+        elif config.boost_cache is False:
+            self.boost_cache = None
+        else:
+            self.boost_cache = config.boost_cache #an empty BoostCache is false, but is used
     
-    def integrate(self,trajectory):
+    def integrate(self,trajectory=None):
+        "Runs the simulation, returns a SimResult"
+        if trajectory is not None:
+            self.trajectory = trajectory #make ref for eta function
+        ##### SET INTEGRATION PARAMETERS
+        tEND = 20000        #timeout value
+        self.tEND = tEND
+        self.steps = 0
+        self.events = []
+        self.data = Trajectory(self.dtype,record=self.record_policy,every=self.record_every)
+        #density and drag from the model itself, or from tables of it
+        self.air = atmosphere.table(self.atmosphere,self) or self
+        self.profile = None
+        if self.profiling:
+            self.profile = Profile()
+            self.profile.start(self,'boost 1')
+        ##### INITIALIZE ROCKET MODEL
+        self.mtot = 0.0
+        self.burntimetot = 0.0
+        for i in range(1,self.numstages+1):
+            self.mtot += self.m0[i] #sum total mass
+            self.burntime.append(self.Isp0[i]*9.81*self.fuelmass[i]/self.thrust0[i])
+            self.burntimetot += self.burntime[i] #sum total burn time
+        self.mtot += self.payload
+        
+        self.area_missile = (self.missilediam/2)**2 * pi #[m^2]
+        self.area_rv = self.rvdiam/2**2 * pi #[m^2]
+        
+        if self.trajectory == 'Burnout Angle':
+            #burnout angle given, in degrees from horizontal
+            self.opt_burnout_angle = self.to_radians(self.burnout_angle)
+        else:
+            #set burnout angle to optimum for MET
+            #uses Wheelon's form of the equations
+            self.opt_burnout_angle = pi/2 - .25*(self.est_range/Rearth + pi)
+        #use this optimum burnout angle to linearize turn angle, from horizontal
+        self.pitch_rate = (self.opt_burnout_angle - pi/2)/(self.burntimetot - vertical_flight_period)
+        #####
+        
+        ##### RESUME AFTER BOOST, if an earlier run flew the same one
+        resume = None
+        self.boost_key = None
+        if self.boost_cache is not None:
+            key = self.boost_parameters()
+            summary = self.record_policy == RECORD_SUMMARY
+            boost = self.boost_cache.get(key,samples=not summary)
+            if boost is None:
+                self.boost_key = key
+                if not summary:
+                    #keep every boost step, for runs with other recording policies
+                    self.data = Trajectory(record=RECORD_ALL)
+            else:
+                self.events = list(boost.events)
+                self.steps = boost.steps
+                if boost.samples is not None:
+                    self.replay(boost.samples)
+                resume = boost.state
+                if self.profile is not None:
+                    self.profile.phase.name = 'boost, cached'
+                    self.profile.enter('coast',find(self.events,BOOST_END).t)
+        
+        ##### INTEGRATE
+        if self.integrator == 'DOPRI5':
+            t,h,v,psi,apogee = self.integrate_dopri5(resume)
+        else:
+            t,h,v,psi,apogee = self.integrate_rk2(resume)
+        if self.boost_key is not None:
+            #boost did not end, keep its samples by the run's own policy
+            self.end_boost(None)
+        self.events.sort(key=lambda event: event.t)
+        #events are located inside steps, so are more exact than the last step
+        event = find(self.events,APOGEE)
+        if event:
+            apogee = event.h
+        event = find(self.events,IMPACT)
+        if event:
+            t,h,v,psi = event.t,event.h,event.v,event.range/Rearth
+        if self.profile is not None:
+            self.profile.finish(t)
+    
+        return SimResult(self.data,self.events,Rearth*psi,apogee,v,t,t >= tEND,self.steps,self.profile)
+    
+    def boost_parameters(self):
+        "Key of everything the boost phase depends on, for the boost cache"
+        key = [self.integrator,self.atmosphere,self.trajectory,self.payload,self.missilediam,
+            tuple(self.m0[1:self.numstages+1]),tuple(self.fuelmass[1:self.numstages+1]),
+            tuple(self.Isp0[1:self.numstages+1]),tuple(self.thrust0[1:self.numstages+1]),
+            getattr(self,'est_range',None)]
+        if self.integrator == 'DOPRI5':
+            key.extend([self.rtol,self.atol])
+        else:
+            key.append(self.step)
+        if self.trajectory == 'Thrust Vector':
+            key.extend([self.TStartTurn,self.TEndTurn,self.TurnAngle])
+        if self.trajectory == 'Burnout Angle':
+            key.append(self.burnout_angle)
+        return tuple(key)
+    
+    def end_boost(self,state):
+        """Saves the integrator state at the end of boost to the boost cache, with the
+        events and every boost step so far, then keeps only the samples the recording
+        policy wants. With state None only does the latter. A run that records no
+        samples saves the state without them."""
+        self.boost_key,key = None,self.boost_key
+        if self.record_policy == RECORD_SUMMARY:
+            if state is not None:
+                self.boost_cache.put(key,boostcache.BoostState(state,list(self.events),self.steps,None))
+            return
+        samples = self.data.buffer[:,:self.data.size]
+        if state is not None:
+            self.boost_cache.put(key,boostcache.BoostState(state,list(self.events),self.steps,samples.copy()))
+        self.replay(samples)
+    
+    def replay(self,samples):
+        "Starts the trajectory from samples at every step, keeping those the recording policy wants"
+        self.data = Trajectory(self.dtype,record=self.record_policy,every=self.record_every)
+        keep = self.data.due_times(samples[0])
+        if keep.any():
+            self.data.extend(*samples[:,keep])
+    
+    def integrate_rk2(self,resume=None):
+        """Fixed step integration, a variant of Runge-Kutta-2. Returns final t,h,v,psi and apogee.
+        resume is the state saved at end of boost by an earlier run, to carry on from."""
         t = 0.0     # time
         v = 0       # initial v
         h = 0.001   # initial h must be small but non-zero
         psi = 0     # range angle: range = psi * Rearth
         rho = 0.0   # air density at current altitude
-        p_height = 0.0 # air pressure at current altitude
         gamma = self.to_radians(90) #launch angle, from horizontal
         
-        
-        #print "Start Simulation"
-        # ref for printing results in GUI mode
-        try:
-            app = wx.GetTopLevelParent(self.parent)
-        except NameError:
-            pass
-        self.trajectory = trajectory #make ref for eta function
         ##### SET INTEGRATION PARAMETERS
-        tEND = 20000        #timeout value
-        dtprint = 1         #time interval between printing output
+        tEND = self.tEND
         Htrans = 20000  #height [m] at which transition from laminar to turbulent heating occurs
-        deltaend = .1       #time increment used for integration
-        deltatinit = .01    #time increment for t < tinit + 1 sec
-        mtot = 0.0
-        burntimetot = 0.0
-        tinit = burntimetot + 1 # integrate more carefully during burn
+        deltaend = self.step    #time increment used for integration
+        deltatinit = min(.01,deltaend)   #time increment for t < tinit + 1 sec
+        tinit = 1 # integrate more carefully during first second
         #####
         apogee = 0.0
         Thrust = 0.0
         drag = 0.0
-        ##### SET CONSTANTS
-        Rearth = 6370000 #[m]
-        g0 = 9.8066 #[m/s^2]
-        #
-        ##### INITIALIZE ROCKET MODEL
+        burntimetot = self.burntimetot
+        opt_burnout_angle = self.opt_burnout_angle
+        area_missile = self.area_missile
+        area_rv = self.area_rv
         
-        for i in range(1,self.numstages+1):
-            mtot += self.m0[i] #sum total mass
-            self.burntime.append(self.Isp0[i]*9.81*self.fuelmass[i]/self.thrust0[i])
-            burntimetot += self.burntime[i] #sum total burn time
-        mtot += self.payload
-        
-        area_missile = (self.missilediam/2)**2 * pi #[m^2]
-        area_rv = self.rvdiam/2**2 * pi #[m^2]
-        #####
-        
-        ##### INTEGRATE
-        #   
         #Initialize variables
         deltat = deltatinit
         flagdeltat = True
-        m = mtot
+        m = self.mtot
         #
         dMdt0 = self.dMdt[1]
-        tprint = dtprint #tprint is time at which printing of output will next occur
         flag = True # controls printing parameters at burnout of stages
         tlimit = self.burntime[1] # ditto
         nstage = 1  # used at burnout of stages
         gamma_half = gamma # angle of missile or RV w/ local horizon
-        
-        #set burnout angle to optimum for MET
-        #uses Wheelon's form of the equations
-        opt_burnout_angle = pi/2 - .25*(self.est_range/Rearth + pi)
-        #use this optimum burnout angle to linearize turn angle, from horizontal
-
+        vz = 0.0 # vertical speed, for finding apogee
+        m_half = m
+        if resume is not None:
+            (t,v,h,psi,gamma,m,m_half,deltat,flagdeltat,apogee,Thrust,drag,
+                dMdt0,flag,tlimit,nstage,vz) = resume
+        due = self.data.due #recording policy
+        kepler = self.coast == 'kepler' #coast not yet tried analytically
         
         #Integrate
         while t < tEND and h > 0: # big loop
-            #save data to Results dict
-            self.data['Time'].append(t) #in tenths seconds
-            self.data['Height'].append(h) #in meters
-            self.data['Mass'].append(m) #in kg
-            self.data['Velocity'].append(v) #in meters/second
-            self.data['Thrust'].append(Thrust) #in in kgf
-            self.data['Drag'].append(drag) #in N
-            self.data['Gamma'].append(gamma) #in degrees from horizontal
-            self.data['Range'].append(Rearth*psi) #in meters
+            #end of boost, save the state for runs that differ only after it
+            if self.boost_key is not None and flag == False and (t + deltat/5) > burntimetot:
+                self.end_boost((t,v,h,psi,gamma,m,m_half,deltat,flagdeltat,apogee,Thrust,drag,
+                    dMdt0,flag,tlimit,nstage,vz))
+                due = self.data.due
+            
+            #save data to trajectory
+            if due(t):
+                self.data.append(t,h,m,v,Thrust,drag,gamma,Rearth*psi)
+            
+            #above the atmosphere with thrust off, jump along the ellipse to reentry
+            if kepler and flag == False and (t + deltat/5) > burntimetot and h >= h_atmosphere:
+                kepler = False
+                jump = self.kepler_coast(t,[v,h,psi,gamma,m],deltat)
+                if jump:
+                    t,(v,h,psi,gamma,m) = jump
+                    vz = v*sin(gamma)
+                    Thrust = drag = 0.0
+                    continue
             
             if (t + deltat/5) >= tinit and flagdeltat == True:
                 deltat = deltaend
@@ -118,45 +398,25 @@ class Simulation(object):
             else:
                 area = area_rv
             #calculate drag
-            rho = self.density(h)
-            cd = self.Cdrag(v_old,h)
-            drag = cd*area*rho*(v_old**2)/2
+            rho = self.air.density(h)
+            if rho and area:
+                cd = self.air.Cdrag(v_old,h)
+                drag = cd*area*rho*(v_old**2)/2
+            else:
+                #above the atmosphere, or no drag area
+                drag = 0.0
             
             # calculate thrust as function of altitude
-            #NEW EQUATIONS, from Charles Vick
-            h_vacuum = 160934 #~100 miles
             Thrust_ideal = self.Isp0[nstage]*self.dMdt[nstage]*9.81
             if (t + deltat/5) > burntimetot:
                 Thrust_pct_increase = 0
                 #out of fuel, no thrust
-            elif h < h_vacuum:
-                h_norm = h / h_vacuum
-                Thrust_pct_increase = -.4339*(h_norm)**3+.6233*(h_norm)**2-.01*(h_norm)+1.004
-                #3rd order polynomial line fit from Saturn-V data on thrust vs. height
-                
-            elif h > h_vacuum and nstage == 1:
-                Thrust_pct_increase = 1.19
-                Thrust = Thrust_ideal*Thrust_pct_increase
-            elif nstage > 1:
-                Thrust_pct_increase = 1
-                #assuming that stage Isp is correct for vacuum
+            else:
+                Thrust_pct_increase = self.thrust_increase(h,nstage)
             Thrust = Thrust_ideal*Thrust_pct_increase
             Force = Thrust - drag
             #note that Force will be negative during reentry
             
-            #OLD EQUATIONS, from David Wright
-            #requires us to know nozzle area, which we don't
-            #p0 = self.pressure(0)
-            #p_height = self.pressure(h)
-            #self.nozarea = .3 #[m^2] for TD-1
-            #if (t + deltat/5) > burntimetot:
-            #   Thrust = 0.0
-            #elif nstage == 1:  
-            #   Thrust = self.Isp0[1]*self.dMdt[1]*9.81 + self.nozarea*(p0-p_height)
-            #elif nstage > 1:
-            #   Thrust = self.Isp0[nstage]*self.dMdt[nstage]*9.81
-    
-                
             #
             g = g0*Rearth**2/(h+Rearth)**2 #calculate grav accel at height
             
@@ -172,7 +432,6 @@ class Simulation(object):
             #
             # calculate gamma
             
-            vertical_flight_period = 5
             if t < vertical_flight_period:
                 #force gamma to be constant early in flight
                 dgamma = 0.0
@@ -194,6 +453,7 @@ class Simulation(object):
             ETA_half = self.eta(h_half,t_half)
             # Increment time
             t += deltat
+            self.steps += 1
             #
             d_psi_half = (v_half*cos(gamma_half))/(Rearth+h_half) * deltat
             psi = psi_old + d_psi_half
@@ -202,7 +462,6 @@ class Simulation(object):
                 apogee = h
                 v_apogee = v
 
-            vertical_flight_period = 5
             if t <= vertical_flight_period:
                 dgamma_half = 0.0
             elif (t > vertical_flight_period) and (t <= burntimetot):
@@ -219,25 +478,22 @@ class Simulation(object):
     
             dv_half = (Force/m_half)*cos(ETA_half) - g*sin(gamma_half)
             v = v_old + dv_half*deltat
+            
+            #look for events inside the step
+            vz_old = vz
+            vz = v*sin(gamma)
+            if (vz_old > 0 and vz <= 0) or (h_old < h_atmosphere) != (h < h_atmosphere) or h <= 0:
+                self.step_events(self.rk2_step(t_old,[v_old,h_old,psi_old,gamma_old,m_old],t,[v,h,psi,gamma,m]))
                         
             #Print data at stage burnout
             if (t + deltat / 5) > tlimit and flag == True:
-                if __name__ == "__main__":
-                    #Simple text printout
-                    print "Stage %i burnout" % nstage
-                    print "Velocity (km/s): ",v/1000
-                    print "Angle (deg h): ",gamma*180/pi
-                    print "Range (km): ",Rearth*psi/1000
-                    print "Time (sec): ",t
-                else:
-                    #GUI printout
-                    app.Results.StageVelocityResult[nstage].SetValue("%4.2f" % float(v/1000))
-                    app.Results.StageAngleResult[nstage].SetValue("%4.2f" % float(gamma*180/pi))
-                    app.Results.StageHeightResult[nstage].SetValue("%4.2f" % float(h/1000))
-                    app.Results.StageRangeResult[nstage].SetValue("%4.2f" % float(Rearth*psi/1000))
-                    app.Results.StageTimeResult[nstage].SetValue("%4.2f" % t)
-        
-                m = mtot - self.m0[nstage]
+                #burnout may be up to deltat/5 past the step, extrapolate to it
+                step = self.rk2_step(t_old,[v_old,h_old,psi_old,gamma_old,m_old],t,[v,h,psi,gamma,m])
+                t_burnout,y_burnout = step.state(step.fraction(tlimit))
+                self.add_event(BURNOUT,t_burnout,y_burnout,nstage)
+                if nstage == self.numstages:
+                    self.add_event(BOOST_END,t_burnout,y_burnout,nstage)
+                m = self.mtot - self.m0[nstage]
                 if nstage < self.numstages:
                     nstage += 1
                     tlimit += self.burntime[nstage] #set time to next print burnout
@@ -246,30 +502,250 @@ class Simulation(object):
                     flag = False
                 
             #END BIG LOOP
+        return t,h,v,psi,apogee
+    
+    def integrate_dopri5(self,resume=None):
+        """Adaptive integration with the Dormand-Prince 5(4) pair and error control.
+        The end of vertical flight, each stage burnout and the end of boost are step
+        boundaries, so the jumps in thrust, mass and steering never fall inside a step.
+        Returns final t,h,v,psi and apogee. resume is the state saved at end of boost
+        by an earlier run, to carry on from."""
+        tEND = self.tEND
+        burntimetot = self.burntimetot
+        rtol = self.rtol
+        #angles are held to the same tolerance as arc length on the surface
+        atol = [self.atol,self.atol,self.atol/Rearth,self.atol/Rearth,self.atol]
+        
+        #times at which stages burn out, and boundaries between smooth pieces of flight
+        tlimit = ['']
+        for i in range(1,self.numstages+1):
+            tlimit.append(sum(self.burntime[1:i+1]))
+        boundaries = [vertical_flight_period,tEND] + tlimit[1:]
+        if self.trajectory == 'Thrust Vector':
+            boundaries.extend([self.TStartTurn,self.TEndTurn])
+        boundaries = [b for b in boundaries if 0 < b <= tEND]
+        boundaries = dict.fromkeys(boundaries).keys() #remove duplicates
+        boundaries.sort()
+        
+        t = 0.0
+        y = [0.0,0.001,0.0,pi/2,self.mtot] # v,h,psi,gamma,m
+        nstage = 1
+        apogee = 0.0
+        self.m_coast = self.mtot
+        self.Thrust = 0.0
+        self.drag = 0.0
+        dt = .01 #first trial step
+        kepler = self.coast == 'kepler' #coast not yet tried analytically
+        if resume is None:
+            self.record(t,y)
+        else:
+            t,y,nstage,apogee,self.m_coast,dt,self.Thrust,self.drag = resume
+            y = list(y)
+        for boundary in boundaries:
+            if t >= tEND or y[1] <= 0:
+                break
+            #steering and burning are constant until the next boundary
+            burning = t < burntimetot
+            if self.boost_key is not None and not burning:
+                #end of boost, save the state for runs that differ only after it
+                self.end_boost((t,list(y),nstage,apogee,self.m_coast,dt,self.Thrust,self.drag))
+            if t < vertical_flight_period:
+                steering = 'vertical'
+            elif burning:
+                steering = 'pitch'
+            else:
+                steering = 'turn'
+            def f(t,y):
+                return self.derivs(t,y,nstage,burning,steering)
+            #heights where density or thrust jump, steps are cut to end just past them
+            jumps = []
+            if (burning and self.area_missile) or (not burning and self.area_rv):
+                jumps.extend([19200,47000])
+            if burning:
+                jumps.append(h_vacuum)
+            k = f(t,y)
+            while t < boundary and y[1] > 0:
+                if kepler and not burning and y[1] >= h_atmosphere:
+                    #above the atmosphere with thrust off, jump along the ellipse to reentry
+                    kepler = False
+                    jump = self.kepler_coast(t,y,dt)
+                    if jump:
+                        t,y = jump
+                        k = f(t,y)
+                        self.record(t,y)
+                        continue
+                step = min(dt,boundary - t)
+                ynew,knew,err = dopri5_step(f,t,y,k,step)
+                error = error_norm(err,y,ynew,rtol,atol)
+                if error > 1:
+                    dt = next_step(step,error)
+                    continue
+                if ynew[1] < -self.atol:
+                    #below ground, shorten step to land just under the surface
+                    dt = step*(y[1] + self.atol/2)/(y[1] - ynew[1])
+                    continue
+                crossed = [H for H in jumps if (y[1] - H)*(ynew[1] - H) < 0 and abs(ynew[1] - H) > self.atol]
+                if crossed:
+                    H = crossed[0]
+                    if ynew[1] > H:
+                        dt = step*(H - y[1] + self.atol/2)/(ynew[1] - y[1])
+                    else:
+                        dt = step*(y[1] - H + self.atol/2)/(y[1] - ynew[1])
+                    continue
+                if step == boundary - t:
+                    t = boundary
+                else:
+                    t += step
+                self.steps += 1
+                if ynew[1] > y[1]:
+                    apogee = ynew[1]
+                if (k[1] > 0 and knew[1] <= 0) or (y[1] < h_atmosphere) != (ynew[1] < h_atmosphere) or ynew[1] <= 0:
+                    self.step_events(Step(t - step,y,k,t,ynew,knew))
+                y,k = ynew,knew
+                self.record(t,y)
+                dt = next_step(step,error)
+            #stage burnout
+            if nstage <= self.numstages and t == tlimit[nstage]:
+                self.add_event(BURNOUT,t,y,nstage)
+                if nstage == self.numstages:
+                    self.add_event(BOOST_END,t,y,nstage)
+                self.m_coast = y[4] #RK2 scheme carries the last boost mass into re-entry
+                y[4] = self.mtot - self.m0[nstage]
+                nstage += 1
+        v,h,psi,gamma,m = y
+        return t,h,v,psi,apogee
+    
+    def derivs(self,t,y,nstage,burning,steering):
+        """Equations of motion for the adaptive integrator, as used in the RK2 scheme.
+        y is v,h,psi,gamma,m; steering is 'vertical', 'pitch' or 'turn'."""
+        v,h,psi,gamma,m = y
+        if burning:
+            area = self.area_missile
+            Thrust = self.Isp0[nstage]*self.dMdt[nstage]*9.81*self.thrust_increase(h,nstage)
+            dMdt = -self.dMdt[nstage]
+            mass = m
+        else:
+            area = self.area_rv
+            Thrust = 0.0
+            dMdt = 0.0
+            mass = self.m_coast
+        rho = self.air.density(h)
+        if rho and area:
+            drag = self.air.Cdrag(v,h)*area*rho*(v**2)/2
+        else:
+            drag = 0.0
+        Force = Thrust - drag
+        g = g0*Rearth**2/(h+Rearth)**2
+        ETA = self.eta(h,t)
+        dpsi = v*cos(gamma)/(Rearth + h)
+        if steering == 'vertical':
+            dgamma = 0.0
+        elif steering == 'pitch':
+            dgamma = self.pitch_rate
+        else:
+            dgamma = dpsi + Force*sin(ETA)/(v*mass) - g*cos(gamma)/v
+        dv = (Force/mass)*cos(ETA) - g*sin(gamma)
+        #keep forces for output
+        self.Thrust = Thrust
+        self.drag = drag
+        return [dv,v*sin(gamma),dpsi,dgamma,dMdt]
+    
+    def kepler_coast(self,t,y,spacing):
+        """Follows the coast from time t and state y = v,h,psi,gamma,m along its ellipse,
+        to reentry at the top of the atmosphere or to the time limit. Apogee and reentry
+        are added as events, and samples every spacing seconds are saved as the recording
+        policy wants. Returns the time and state at the end, or None if the missile is not
+        on an ellipse that comes back into the atmosphere."""
+        v,h,psi,gamma,m = y
+        conic = Conic(t,v,h,psi,gamma,g0*Rearth**2,Rearth)
+        if not conic.bound():
+            return None
+        t_end = conic.time_at_radius(Rearth + h_atmosphere)
+        if t_end is None:
+            return None
+        t_apogee = conic.time_of_apogee()
+        if t_apogee is not None and t_apogee < self.tEND:
+            self.add_event(APOGEE,t_apogee,list(conic.state(t_apogee)) + [m])
+        reentry = t_end < self.tEND
+        t_end = min(t_end,self.tEND)
+        times = t + spacing*numpy.arange(1,int(ceil((t_end - t)/spacing)))
+        times = times[self.data.due_times(times)]
+        if len(times):
+            v,h,psi,gamma = conic.state(times)
+            self.data.extend(times,h,m,v,0.0,0.0,gamma,Rearth*psi)
+        y = list(conic.state(t_end)) + [m]
+        if reentry:
+            self.add_event(REENTRY,t_end,y)
+            #hand back just inside, so the next step does not find the crossing again
+            y[1] = min(y[1],h_atmosphere - 1e-6)
+        return t_end,y
     
-        if t >= tEND:
-            if __name__ == "__main__":
-                print "Simulation exceeded time limit."
+    def record(self,t,y):
+        "Saves state of the adaptive integrator to the trajectory, if the recording policy wants it"
+        if self.data.due(t):
+            v,h,psi,gamma,m = y
+            self.data.append(t,h,m,v,self.Thrust,self.drag,gamma,Rearth*psi)
+    
+    def add_event(self,kind,t,y,stage=None):
+        "Records an event at time t and state y = v,h,psi,gamma,m"
+        v,h,psi,gamma,m = y
+        event = Event(kind,t,h,v,gamma,Rearth*psi,m,stage)
+        self.events.append(event)
+        if self.profile is not None:
+            #phases of flight end at these events
+            if kind == BURNOUT:
+                self.profile.enter(stage < self.numstages and 'boost %i' % (stage + 1) or 'coast',t)
+            elif kind == REENTRY:
+                self.profile.enter('reentry',t)
+        return event
+    
+    def step_events(self,step):
+        "Locates apogee, crossings of the top of the atmosphere and impact inside a step"
+        h0,h1 = step.y0[1],step.y1[1]
+        if step.f0[1] > 0 and step.f1[1] <= 0:
+            t,y = step.state(step.peak())
+            self.add_event(APOGEE,t,y)
+        if (h0 < h_atmosphere) != (h1 < h_atmosphere):
+            t,y = step.state(step.crossing(h_atmosphere))
+            if h1 > h0:
+                self.add_event(ATMOSPHERE_EXIT,t,y)
             else:
-                dlg = wx.MessageDialog(self.parent,"Exceeded time limit, results are likely invalid.","Simulation error",wx.OK | wx.ICON_INFORMATION)
-                dlg.ShowModal()
-                dlg.Destroy()
-
-
-        #print "Done"
-        if __name__ == "__main__":
-            #print final results
-            print "Range (km): ",psi*Rearth/1000
-            print "Apogee (km): ",apogee/1000
-            print "Time to target (sec): ",t
+                self.add_event(REENTRY,t,y)
+        if h1 <= 0 < h0:
+            t,y = step.state(step.crossing(0))
+            self.add_event(IMPACT,t,y)
+    
+    def rk2_step(self,t0,y0,t1,y1):
+        "Interpolant of an RK2 step, cubic in height and range angle and linear in the rest"
+        def f(y):
+            v,h,psi,gamma,m = y
+            return [None,v*sin(gamma),v*cos(gamma)/(Rearth + h),None,None]
+        return Step(t0,y0,f(y0),t1,y1,f(y1))
+    
+    def thrust_increase(self,h,nstage):
+        "Ratio of thrust at altitude to ideal thrust"
+        #NEW EQUATIONS, from Charles Vick
+        if h < h_vacuum:
+            h_norm = h / h_vacuum
+            return -.4339*(h_norm)**3+.6233*(h_norm)**2-.01*(h_norm)+1.004
+            #3rd order polynomial line fit from Saturn-V data on thrust vs. height
+        elif nstage == 1:
+            return 1.19
         else:
-            #put results in frame
-            app.Results.ApogeeResult.SetValue("%4.2f" % float(apogee/1000))
-            app.Results.ApogeeVelocityResult.SetValue("%4.3f" % float(v/1000))
-            app.Results.RangeResult.SetValue("%4.3f" % float(Rearth*psi/1000))
-            app.Results.FlightTimeResult.SetValue("%4.1f" % t)
-            
-        return (self.data)
+            return 1
+            #assuming that stage Isp is correct for vacuum
+        
+        #OLD EQUATIONS, from David Wright
+        #requires us to know nozzle area, which we don't
+        #p0 = self.pressure(0)
+        #p_height = self.pressure(h)
+        #self.nozarea = .3 #[m^2] for TD-1
+        #if (t + deltat/5) > burntimetot:
+        #   Thrust = 0.0
+        #elif nstage == 1:  
+        #   Thrust = self.Isp0[1]*self.dMdt[1]*9.81 + self.nozarea*(p0-p_height)
+        #elif nstage > 1:
+        #   Thrust = self.Isp0[nstage]*self.dMdt[nstage]*9.81
             
                 
     def eta(self,h,t):
@@ -363,7 +839,7 @@ if __name__ == "__main__":
     print "the simulation object"
     print "using simple text interface, minimum energy trajectory"
     print ""
-    sim = Simulation(None) #this simulation object has no parent
+    sim = Simulation()
     sim.numstages = int(raw_input("Number of stages: "))
     for i in range(1,sim.numstages+1):
         sim.fuelmass.append(float(raw_input("Fuel mass: ")))
@@ -381,37 +857,21 @@ if __name__ == "__main__":
     
     print '\n'
     sim.trajectory = "Minimum Energy"
-    results = sim.integrate(sim.trajectory)
+    result = sim.integrate(sim.trajectory)
+    for event in result.stages:
+        print "Stage %i burnout" % event.stage
+        print "Velocity (km/s): ",event.v/1000
+        print "Angle (deg h): ",event.gamma*180/pi
+        print "Range (km): ",event.range/1000
+        print "Time (sec): ",event.t
+    if result.timed_out:
+        print "Simulation exceeded time limit."
+    print "Range (km): ",result.range/1000
+    print "Apogee (km): ",result.apogee/1000
+    print "Time to target (sec): ",result.flight_time
     print '\n'
     
+    from export import write_csv
     path = 'data.txt'
-    outfile = open(path,'w')
-    for i in range(1,sim.numstages+1):
-                outfile.write("STAGE %i Parameters:\n" % i)
-                outfile.write("Fuel mass (kg): " + str(sim.fuelmass[i]) + '\n')
-                outfile.write("Dry mass (kg): " + str(sim.m0[i] - sim.fuelmass[i]) + '\n')
-                outfile.write("Fuel fract: " + str(sim.fuelfraction[i]) + '\n')
-                outfile.write("Isp @ SL: " + str(sim.Isp0[i]) + '\n')
-                outfile.write("Burn time (sec): " + str(sim.burntime[i]) + '\n')
-                outfile.write("Thrust (N): " + str(sim.thrust0[i]) + '\n')
-                outfile.write("dM/dt: " + str(sim.dMdt[i]) + '\n')
-                
-    outfile.write("\nTIME,HEIGHT,VELOCITY,MASS,THRUST,DRAG,GAMMA,RANGE\n")
-    flat = zip(results['Time'],
-                results['Height'],
-                results['Velocity'],
-                results['Mass'],
-                results['Thrust'],
-                results['Drag'],
-                results['Gamma'],
-                results['Range'])
-    for i in range(1,len(flat)):
-        for n in range(0,len(flat[i])):
-            outfile.write('%.3f' % flat[i][n])
-            outfile.write(',')
-        outfile.write('\n')
+    write_csv(path,result.data,stages=sim)
     print "Data written to '%s'" % path
-    outfile.close()
-else:
-    import wx
-    #using gui
@@ -0,0 +1,608 @@
+"""Solves for the value of one missile parameter that gives a target range.
+
+The range is found as a root of range(x) - target. The root is first bracketed,
+from the current value of the parameter outward until the range passes the target,
+and then refined by Brent's method or by the Illinois variant of regula falsi.
+Trial runs keep no trajectory samples; the solved value is run once more with the
+recording settings of the config to give its trajectory.
+
+solve_parallel does the same with a set of trial values at a time, run across a
+process pool or together in the vectorized batch engine, narrowing the bracket
+to the pair of neighbouring trial values the range passes the target between.
+
+maximize finds the value that gives the longest range instead, by default the
+burnout angle. A grid of trial values, run together, brackets the peak, which
+golden section search or Brent's parabolic interpolation then closes in on.
+
+Works on SimConfig objects and in-memory floats, so it serves the GUI and scripts
+alike. Ranges are in m, as in SimResult."""
+
+from math import pi
+import multiprocessing
+from sim import simulate,Rearth
+from trajectory import RECORD_SUMMARY
+from batch import BatchSimulation
+
+class SolverError(Exception):
+    "The target range could not be bracketed or the solver did not converge"
+    pass
+
+class Variable(object):
+    """A scalar input of SimConfig the solver can vary. Subclasses give get(config),
+    its value in config, and set(config,x), a copy of config with the value x.
+    bounds are the lowest and highest values it may take, None where open.
+    resolution is the smallest change in it worth telling apart: the RK2 range jumps
+    where a burnout crosses a whole step, so a solve stops once the bracket is this
+    narrow."""
+    name = ''
+    bounds = (None,None)
+    resolution = 0.0
+
+    def __repr__(self):
+        return "<%s>" % self.name
+
+class Payload(Variable):
+    "Payload [kg]"
+    name = 'Payload'
+    bounds = (1.0,None) #the reentry vehicle's mass after boost
+    resolution = 1e-3
+
+    def get(self,config):
+        return float(config.payload)
+
+    def set(self,config,x):
+        return config.copy(payload=x)
+
+class RVDiameter(Variable):
+    "Diameter of the reentry vehicle [m], which only matters after boost"
+    name = 'RV Diameter'
+    bounds = (0.0,None)
+    resolution = 1e-5
+
+    def get(self,config):
+        return float(config.rvdiam)
+
+    def set(self,config,x):
+        return config.copy(rvdiam=x)
+
+class EstRange(Variable):
+    "Estimated range [km] that sets the burnout angle of a 'Minimum Energy' trajectory"
+    name = 'Estimated Range'
+    bounds = (0.0,20000.0) #half way round the earth
+    resolution = 1e-4
+
+    def get(self,config):
+        return float(config.estrange)
+
+    def set(self,config,x):
+        return config.copy(estrange=x)
+
+class StageVariable(Variable):
+    "Entry of one of the stage lists of SimConfig, for stage 1 and up"
+    attribute = ''
+
+    def __init__(self,stage=1):
+        self.stage = stage
+        self.name = "Stage %i %s" % (stage,self.name)
+
+    def get(self,config):
+        return float(getattr(config,self.attribute)[self.stage])
+
+    def set(self,config,x):
+        config = config.copy()
+        getattr(config,self.attribute)[self.stage] = x
+        return config
+
+class Thrust(StageVariable):
+    "Sea level thrust of a stage [kgf]"
+    name = 'Thrust'
+    attribute = 'thrust0'
+    bounds = (1e-3,None) #burn time is infinite at 0
+    resolution = 1e-3
+
+class Isp(StageVariable):
+    "Sea level specific impulse of a stage [sec]"
+    name = 'Isp'
+    attribute = 'Isp0'
+    bounds = (1e-3,None)
+    resolution = 1e-5
+
+class FuelFraction(StageVariable):
+    "Fuel mass / stage mass of a stage, keeping the stage mass (fuel + dry) constant"
+    name = 'Fuel Fraction'
+    bounds = (.01,.99) #as the Advanced panel allows
+    resolution = 1e-7
+
+    def get(self,config):
+        fuel,dry = float(config.fuelmass[self.stage]),float(config.drymass[self.stage])
+        return fuel/(fuel + dry)
+
+    def set(self,config,x):
+        config = config.copy()
+        mass = float(config.fuelmass[self.stage]) + float(config.drymass[self.stage])
+        config.fuelmass[self.stage] = x*mass
+        config.drymass[self.stage] = mass - x*mass
+        return config
+
+class BurnoutAngle(Variable):
+    """Flight path angle at burnout [deg from horizontal], flown as a 'Burnout Angle'
+    trajectory. Starts from the Wheelon estimate for the config's estimated range if
+    the config has no burnout angle."""
+    name = 'Burnout Angle'
+    bounds = (.1,89.9)
+    resolution = 1e-5
+
+    def get(self,config):
+        if config.burnout_angle is not None:
+            return float(config.burnout_angle)
+        return (pi/2 - .25*(float(config.estrange)*1000/Rearth + pi))*180/pi
+
+    def set(self,config,x):
+        return config.copy(trajectory='Burnout Angle',burnout_angle=x)
+
+class Solution(object):
+    """Outcome of a solve: the value x of the variable, the config with it, the
+    SimResult run from that config, with its trajectory, and the counts of solver
+    iterations and of simulation runs, including those to bracket the root.
+    converged is False if the range jumps across the target at x instead of meeting
+    it, as it can with the fixed RK2 steps, where burnouts fall on whole steps."""
+    def __init__(self,variable,x,config,result,iterations,evaluations,converged):
+        self.variable = variable
+        self.x = x
+        self.config = config
+        self.result = result
+        self.range = result.range
+        self.iterations = iterations
+        self.evaluations = evaluations
+        self.converged = converged
+
+def solve(config,variable,target,lo=None,hi=None,method='brent',tolerance=1.0,xtol=1e-9,maxiter=50,callback=None):
+    """Value of variable in config that gives a range of target [m], within tolerance [m],
+    or within xtol of it relative to its size where the range is not continuous.
+    lo and hi bracket the value, if known; otherwise the bracket is searched for from
+    the value in config. method is 'brent' or 'illinois'. callback, if given, is called
+    as callback(evaluations,x,range) after each simulation run.
+    A bracket narrower than the variable's resolution stops the solve at the end nearer the
+    target, which is not converged if the range jumps across the target there.
+    Returns a Solution, raises SolverError if no solution is found."""
+    if method not in ('brent','illinois'):
+        raise ValueError("unknown solver method %r" % method)
+    trial_config = config.copy(record=RECORD_SUMMARY)
+    ranges = {} #range of each x run so far
+    def f(x):
+        if x not in ranges:
+            ranges[x] = simulate(variable.set(trial_config,x)).range
+            if callback is not None:
+                callback(len(ranges),x,ranges[x])
+        return ranges[x] - target
+
+    if lo is None or hi is None:
+        a,fa,b,fb = bracket(f,variable.get(config),variable.bounds)
+    else:
+        a,fa,b,fb = lo,f(lo),hi,f(hi)
+        if fa*fb > 0:
+            raise SolverError("range %.1f km is not between %.1f and %.1f km" % (target/1000,(fa + target)/1000,(fb + target)/1000))
+    xtol = narrowest(variable,xtol,a,b)
+    if method == 'brent':
+        x,iterations = brent(f,a,fa,b,fb,xtol,tolerance,maxiter)
+    else:
+        x,iterations = illinois(f,a,fa,b,fb,xtol,tolerance,maxiter)
+
+    solved = variable.set(config,x)
+    converged = abs(f(x)) <= tolerance
+    return Solution(variable,x,solved,simulate(solved),iterations,len(ranges),converged)
+
+def solve_parallel(config,variable,target,lo=None,hi=None,points=None,engine='pool',pool=None,
+        tolerance=1.0,xtol=1e-9,maxiter=30,callback=None):
+    """As solve, but runs points trial values at a time. engine is 'pool' to run them in
+    a multiprocessing pool, the one given or one made for the solve, with a point per
+    processor by default, or 'batch' to run them together in a BatchSimulation, for RK2
+    configs, with 64 points by default, since lockstep steps only pay off for many lanes.
+    iterations of the Solution counts rounds of trials, evaluations single runs."""
+    if engine not in ('pool','batch'):
+        raise ValueError("unknown solver engine %r" % engine)
+    if engine == 'batch' and config.integrator != 'RK2':
+        raise ValueError("the batch engine integrates with RK2 only")
+    if points is None:
+        if engine == 'batch':
+            points = 64
+        else:
+            points = multiprocessing.cpu_count()
+    points = max(points,2)
+    trial_config = config.copy(record=RECORD_SUMMARY)
+    ranges = {} #range of each x run so far
+    own_pool = engine == 'pool' and pool is None
+    if own_pool:
+        pool = multiprocessing.Pool(points)
+    def f(xs):
+        "f of each of xs, running those not run yet together"
+        new = [x for x in dict.fromkeys(xs) if x not in ranges]
+        if new:
+            configs = [variable.set(trial_config,x) for x in new]
+            if engine == 'batch':
+                results = BatchSimulation.from_configs(configs).integrate(config.trajectory)['Range']
+            else:
+                results = pool.map(run_range,configs)
+            for x,range in zip(new,results):
+                ranges[x] = float(range)
+                if callback is not None:
+                    callback(len(ranges),x,ranges[x])
+        return [ranges[x] - target for x in xs]
+
+    try:
+        if lo is None or hi is None:
+            #a few trials at a time, far out values can take long to fly and a batch waits for them
+            a,fa,b,fb = parallel_bracket(f,variable.get(config),variable.bounds,min(points,8))
+        else:
+            (a,fa),(b,fb) = zip((lo,hi),f([lo,hi]))
+            if fa*fb > 0:
+                raise SolverError("range %.1f km is not between %.1f and %.1f km" % (target/1000,(fa + target)/1000,(fb + target)/1000))
+        x,iterations = multisection(f,a,fa,b,fb,points,narrowest(variable,xtol,a,b),tolerance,maxiter)
+    finally:
+        if own_pool:
+            pool.close()
+            pool.join()
+
+    solved = variable.set(config,x)
+    converged = abs(ranges[x] - target) <= tolerance
+    return Solution(variable,x,solved,simulate(solved),iterations,len(ranges),converged)
+
+def maximize(config,variable=None,lo=None,hi=None,method='brent',points=None,engine=None,pool=None,
+        xtol=1e-4,maxiter=50,callback=None):
+    """Value of variable in config between lo and hi that gives the longest range, by default
+    the BurnoutAngle() between 5 and 85 deg, which replaces guessing the estimated range of a
+    'Minimum Energy' trajectory. points evenly spaced trials over lo..hi are run first, together
+    if engine is 'pool', in a multiprocessing pool, the one given or one made for the search,
+    or 'batch', in a BatchSimulation for RK2 configs, and in this process if it is None.
+    The trials either side of the best then bracket the peak, which method, 'brent' or
+    'golden', narrows to xtol of hi - lo. callback, if given, is called as
+    callback(evaluations,x,range) after each simulation run.
+    Returns a Solution, with the maximum range. converged is False if the longest range is
+    at lo or hi, where the peak may lie outside them."""
+    if method not in ('brent','golden'):
+        raise ValueError("unknown maximize method %r" % method)
+    if engine not in (None,'pool','batch'):
+        raise ValueError("unknown maximize engine %r" % engine)
+    if engine == 'batch' and config.integrator != 'RK2':
+        raise ValueError("the batch engine integrates with RK2 only")
+    if variable is None:
+        variable = BurnoutAngle()
+        if lo is None:
+            lo = 5.0
+        if hi is None:
+            hi = 85.0
+    if lo is None:
+        lo = variable.bounds[0]
+    if hi is None:
+        hi = variable.bounds[1]
+    if lo is None or hi is None:
+        raise ValueError("%s is unbounded, give lo and hi" % variable.name)
+    if points is None:
+        if engine == 'batch':
+            points = 64
+        elif engine == 'pool':
+            points = max(multiprocessing.cpu_count(),5)
+        else:
+            points = 5
+    points = max(points,3)
+    trial_config = config.copy(record=RECORD_SUMMARY)
+    ranges = {} #range of each x run so far
+    def record(x,range):
+        ranges[x] = float(range)
+        if callback is not None:
+            callback(len(ranges),x,ranges[x])
+    def f(x):
+        "Minus the range, to minimize"
+        if x not in ranges:
+            record(x,simulate(variable.set(trial_config,x)).range)
+        return -ranges[x]
+
+    grid = [lo + (hi - lo)*i/float(points - 1) for i in range(points)]
+    configs = [variable.set(trial_config,x) for x in grid]
+    if engine == 'batch':
+        results = BatchSimulation.from_configs(configs).integrate(configs[0].trajectory)['Range']
+    elif engine == 'pool':
+        own_pool = pool is None
+        if own_pool:
+            pool = multiprocessing.Pool(min(points,multiprocessing.cpu_count()))
+        try:
+            results = pool.map(run_range,configs)
+        finally:
+            if own_pool:
+                pool.close()
+                pool.join()
+    else:
+        results = [run_range(trial) for trial in configs]
+    for x,result in zip(grid,results):
+        record(x,result)
+    #the batch engine's ranges only place the bracket, the search runs configs as given
+    i = grid.index(max(grid,key=ranges.get))
+    j = min(max(i,1),points - 2)
+    a,b,x = grid[j-1],grid[j+1],grid[i]
+    if method == 'brent':
+        x,iterations = parabolic(f,a,b,x,f(x),xtol*(hi - lo),maxiter)
+    else:
+        x,iterations = golden(f,a,b,x,f(x),xtol*(hi - lo),maxiter)
+
+    solved = variable.set(config,x)
+    converged = lo + xtol*(hi - lo) < x < hi - xtol*(hi - lo)
+    return Solution(variable,x,solved,simulate(solved),iterations,len(ranges),converged)
+
+def run_range(config):
+    "Range of a config, for worker processes"
+    return simulate(config).range
+
+def narrowest(variable,xtol,a,b):
+    "Width of bracket to stop at, xtol relative to the size of a and b, or the resolution of variable if wider"
+    return max(xtol*max(abs(a),abs(b)),variable.resolution)
+
+def clip(x,bounds):
+    "x limited to bounds"
+    lo,hi = bounds
+    if lo is not None and x < lo:
+        return lo
+    if hi is not None and x > hi:
+        return hi
+    return x
+
+def bracket(f,x0,bounds,step=.05,grow=1.6,maxiter=30):
+    """Searches outward from x0 for a and b where f changes sign, staying inside bounds.
+    The first trial is a fraction step of x0 away, or of the bounds if x0 is 0, and
+    each further one grow times further past the end where |f| is smaller.
+    Returns a,f(a),b,f(b)."""
+    x1 = clip(x0,bounds)
+    f1 = f(x1)
+    if f1 == 0:
+        return x1,f1,x1,f1
+    if x1 != 0:
+        dx = step*abs(x1)
+    elif None not in bounds:
+        dx = step*(bounds[1] - bounds[0])
+    else:
+        dx = step
+    x2 = clip(x1 + dx,bounds)
+    if x2 == x1:
+        x2 = clip(x1 - dx,bounds)
+    f2 = f(x2)
+    for i in range(maxiter):
+        if f1*f2 <= 0:
+            return x1,f1,x2,f2
+        if abs(f1) < abs(f2):
+            x1,f1,x2,f2 = x2,f2,x1,f1
+        #x2 is nearer the root, carry on past it
+        x = clip(x2 + grow*(x2 - x1),bounds)
+        if x == x2:
+            raise SolverError("no bracket for the range within the bounds %s of the variable" % (bounds,))
+        x1,f1,x2,f2 = x2,f2,x,f(x)
+    raise SolverError("no bracket for the range after %i trials" % maxiter)
+
+def parallel_bracket(f,x0,bounds,points,step=.05,grow=2.0,maxiter=20):
+    """As bracket, for f taking a list of points. The first round tries x0 and points
+    evenly spaced step apart on both sides of it. Each later round carries on outward
+    past the end where |f| is smaller, spreading its trials evenly out to grow times
+    as far as the last round reached. Returns a,f(a),b,f(b) for neighbouring trials."""
+    x0 = clip(x0,bounds)
+    if x0 != 0:
+        dx = step*abs(x0)
+    elif None not in bounds:
+        dx = step*(bounds[1] - bounds[0])
+    else:
+        dx = step
+    tried = {}
+    reach = {} #distance from x0 covered on each side
+    def side(direction,start,end,count):
+        "count trials evenly spread past start out to end on one side, stopping at the bound"
+        xs = []
+        for k in range(count):
+            x = clip(x0 + direction*(start + (end - start)*(k + 1)/count),bounds)
+            if x not in tried and x not in xs:
+                xs.append(x)
+        reach[direction] = abs(x - x0)
+        return xs
+    for i in range(maxiter):
+        if i == 0:
+            count = max(points//2,1)
+            xs = [x0] + side(1,0,count*dx,count) + side(-1,0,count*dx,count)
+        else:
+            low,high = min(tried),max(tried)
+            direction = abs(tried[high]) < abs(tried[low]) and 1 or -1
+            xs = side(direction,reach[direction],reach[direction]*grow,points)
+            if not xs:
+                #at the bound on this side, try the other
+                xs = side(-direction,reach[-direction],reach[-direction]*grow,points)
+        if not xs:
+            raise SolverError("no bracket for the range within the bounds %s of the variable" % (bounds,))
+        for x,fx in zip(xs,f(xs)):
+            tried[x] = fx
+        order = sorted(tried)
+        for a,b in zip(order[:-1],order[1:]):
+            if tried[a]*tried[b] <= 0:
+                return a,tried[a],b,tried[b]
+    raise SolverError("no bracket for the range after %i rounds" % maxiter)
+
+def multisection(f,a,fa,b,fb,points,xtol,ftol,maxiter):
+    """Root of f between a and b, for f taking a list of points. Each round tries points
+    evenly spread over a window around the false position estimate and keeps the pair of
+    neighbouring trials f changes sign between. The window spans the bracket, or a
+    fraction of it after a round where the root fell between two trials, since the estimate
+    is then close. Stops when |f| <= ftol or the bracket is narrower than xtol.
+    Returns x and rounds."""
+    if a > b:
+        a,fa,b,fb = b,fb,a,fa
+    window = 1.0 #fraction of the bracket the trials span
+    for i in range(maxiter):
+        if abs(fa) <= ftol or abs(fb) <= ftol or b - a <= xtol:
+            if abs(fa) < abs(fb):
+                return a,i
+            return b,i
+        width = (b - a)*window
+        estimate = (a*fb - b*fa)/(fb - fa)
+        start = min(max(a,estimate - width/2),b - width)
+        xs = [start + width*(j + 1)/(points + 1) for j in range(points)]
+        trials = [a] + xs + [b]
+        values = [fa] + f(xs) + [fb]
+        for j in range(len(trials) - 1):
+            if values[j]*values[j+1] <= 0:
+                break
+        if 0 < j < points:
+            window = 2.0/(points + 1)
+        else:
+            window = 1.0
+        a,fa,b,fb = trials[j],values[j],trials[j+1],values[j+1]
+    raise SolverError("multisection did not converge in %i rounds" % maxiter)
+
+def brent(f,a,fa,b,fb,xtol,ftol,maxiter):
+    """Root of f between a and b by Brent's method, as in Numerical Recipes' zbrent.
+    Stops when |f| <= ftol or the bracket is narrower than xtol. Returns x and iterations."""
+    eps = 2.2e-16
+    c,fc = b,fb
+    d = e = b - a
+    for i in range(maxiter):
+        if (fb > 0 and fc > 0) or (fb < 0 and fc < 0):
+            c,fc = a,fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a,b,c = b,c,b
+            fa,fb,fc = fb,fc,fb
+        tol = 2*eps*abs(b) + xtol/2
+        xm = (c - b)/2
+        if abs(fb) <= ftol or abs(xm) <= tol:
+            return b,i
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            #inverse quadratic interpolation, or secant if only two points
+            s = fb/fa
+            if a == c:
+                p = 2*xm*s
+                q = 1 - s
+            else:
+                q = fa/fc
+                r = fb/fc
+                p = s*(2*xm*q*(q - r) - (b - a)*(r - 1))
+                q = (q - 1)*(r - 1)*(s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2*p < min(3*xm*q - abs(tol*q),abs(e*q)):
+                e = d
+                d = p/q
+            else:
+                #interpolation failed, bisect
+                d = xm
+                e = d
+        else:
+            d = xm
+            e = d
+        a,fa = b,fb
+        if abs(d) > tol:
+            b += d
+        elif xm > 0:
+            b += tol
+        else:
+            b -= tol
+        fb = f(b)
+    raise SolverError("Brent's method did not converge in %i iterations" % maxiter)
+
+def illinois(f,a,fa,b,fb,xtol,ftol,maxiter):
+    """Root of f between a and b by the Illinois method: regula falsi, halving the
+    weight of an end that is kept twice in a row. Stops when |f| <= ftol or the
+    bracket is narrower than xtol, at the end where |f| is smaller. Returns x and iterations."""
+    if abs(fa) <= ftol:
+        return a,0
+    for i in range(maxiter):
+        if abs(fb) <= ftol:
+            return b,i
+        if abs(b - a) <= xtol:
+            if abs(f(a)) < abs(fb):
+                return a,i #fa is weighted
+            return b,i
+        x = (a*fb - b*fa)/(fb - fa)
+        fx = f(x)
+        if fx*fb < 0:
+            a,fa = b,fb
+        else:
+            fa = fa/2
+        b,fb = x,fx
+    raise SolverError("Illinois method did not converge in %i iterations" % maxiter)
+
+#golden section, the fraction of an interval to step into its larger part
+golden_ratio = (3 - 5**0.5)/2
+
+def golden(f,a,b,x,fx,xtol,maxiter):
+    """Minimum of f between a and b by golden section search, from x inside them.
+    Stops when the interval is narrower than xtol. Returns x and iterations."""
+    for i in range(maxiter):
+        if b - a <= xtol:
+            return x,i
+        if b - x > x - a:
+            u = x + golden_ratio*(b - x)
+        else:
+            u = x - golden_ratio*(x - a)
+        fu = f(u)
+        if fu <= fx:
+            if u >= x:
+                a = x
+            else:
+                b = x
+            x,fx = u,fu
+        elif u >= x:
+            b = u
+        else:
+            a = u
+    raise SolverError("golden section search did not converge in %i iterations" % maxiter)
+
+def parabolic(f,a,b,x,fx,xtol,maxiter):
+    """Minimum of f between a and b by Brent's method, parabolic interpolation through the
+    best three points with golden section steps as a fallback, as in Numerical Recipes'
+    brent, from x inside them. Stops when the interval is narrower than xtol about x.
+    Returns x and iterations."""
+    w,fw = v,fv = x,fx #second best and previous second best
+    d = e = 0.0 #last step and the one before
+    tol = xtol/2
+    for i in range(maxiter):
+        xm = (a + b)/2
+        if abs(x - xm) <= 2*tol - (b - a)/2:
+            return x,i
+        if abs(e) > tol:
+            #parabola through x, w and v
+            r = (x - w)*(fx - fv)
+            q = (x - v)*(fx - fw)
+            p = (x - v)*q - (x - w)*r
+            q = 2*(q - r)
+            if q > 0:
+                p = -p
+            q = abs(q)
+            last = e
+            e = d
+            if abs(p) >= abs(q*last/2) or p <= q*(a - x) or p >= q*(b - x):
+                #parabola failed, golden section step
+                e = a - x if x >= xm else b - x
+                d = golden_ratio*e
+            else:
+                d = p/q
+                u = x + d
+                if u - a < 2*tol or b - u < 2*tol:
+                    d = tol if xm >= x else -tol
+        else:
+            e = a - x if x >= xm else b - x
+            d = golden_ratio*e
+        if abs(d) >= tol:
+            u = x + d
+        else:
+            u = x + (tol if d > 0 else -tol)
+        fu = f(u)
+        if fu <= fx:
+            if u >= x:
+                a = x
+            else:
+                b = x
+            v,fv,w,fw,x,fx = w,fw,x,fx,u,fu
+        else:
+            if u < x:
+                a = u
+            else:
+                b = u
+            if fu <= fw or w == x:
+                v,fv,w,fw = w,fw,u,fu
+            elif fu <= fv or v == x or v == w:
+                v,fv = u,fu
+    raise SolverError("Brent's method did not converge in %i iterations" % maxiter)
@@ -0,0 +1,200 @@
+"""Response surface of range, apogee and flight time around a missile, for instant estimates.
+
+A surrogate is fitted to full runs at a Latin hypercube design of experiments over
+a box around a config: by default the payload and the fuel fraction, Isp and
+thrust of each stage, each within a fraction span of its value. The fit is a
+polynomial, cubic by default, in coordinates scaled to -1..1 across the box, by
+least squares. Runs held out of the fit give its error.
+
+The box, with the parameters that were not varied, is the trust region: a config
+outside it is run in full instead. Surrogates are saved to and loaded from .npz
+files, and an estimate costs tens of microseconds."""
+
+import itertools
+import multiprocessing
+import numpy
+import solver
+from sim import simulate
+from trajectory import RECORD_SUMMARY
+from batch import BatchSimulation
+from sweep import run_block
+
+#the quantities estimated, as attributes of SimResult
+OUTPUTS = ('range','apogee','flight_time')
+
+class Surrogate(object):
+    """Polynomial response surface over the box lo..hi of variables, solver Variables,
+    for configs that match key in everything else. exponents has a row of the powers of
+    the scaled variables in each term, coefficients a column of term coefficients per
+    output. rms and max_error are the errors of each output on the holdout runs."""
+    def __init__(self,variables,lo,hi,exponents,coefficients,key,rms,max_error,holdout):
+        self.variables = variables
+        self.lo = numpy.asarray(lo,dtype=float)
+        self.hi = numpy.asarray(hi,dtype=float)
+        self.exponents = numpy.asarray(exponents)
+        self.coefficients = numpy.asarray(coefficients,dtype=float)
+        self.key = key
+        self.rms = numpy.asarray(rms,dtype=float)
+        self.max_error = numpy.asarray(max_error,dtype=float)
+        self.holdout = holdout
+        self.center = (self.lo + self.hi)/2
+        self.half = (self.hi - self.lo)/2
+        self.fallbacks = 0 #configs run in full by predict
+
+    def scaled(self,config):
+        "Coordinates of config in the box, -1..1 inside it, or None if it differs in anything else"
+        if config_key(config,self.variables) != self.key:
+            return None
+        x = numpy.array([variable.get(config) for variable in self.variables])
+        return (x - self.center)/self.half
+
+    def inside(self,config):
+        "True if config is in the trust region"
+        u = self.scaled(config)
+        return u is not None and bool(numpy.all(abs(u) <= 1 + 1e-9))
+
+    def estimate(self,config):
+        "Range [m], apogee [m] and flight time [sec] of config, or None outside the trust region"
+        u = self.scaled(config)
+        if u is None or numpy.any(abs(u) > 1 + 1e-9):
+            return None
+        terms = numpy.prod(u**self.exponents,axis=1)
+        return tuple(terms.dot(self.coefficients))
+
+    def predict(self,config):
+        "As estimate, but runs config in full outside the trust region"
+        outputs = self.estimate(config)
+        if outputs is None:
+            self.fallbacks += 1
+            result = simulate(config.copy(record=RECORD_SUMMARY))
+            outputs = tuple(getattr(result,name) for name in OUTPUTS)
+        return outputs
+
+    def save(self,path):
+        "Writes the surrogate to an .npz file"
+        names = [variable.__class__.__name__ for variable in self.variables]
+        stages = [getattr(variable,'stage',0) for variable in self.variables]
+        numpy.savez(path,names=numpy.array(names),stages=numpy.array(stages),lo=self.lo,hi=self.hi,
+            exponents=self.exponents,coefficients=self.coefficients,key=numpy.array(self.key),
+            rms=self.rms,max_error=self.max_error,holdout=numpy.array(self.holdout))
+
+    def load(cls,path):
+        "Reads a surrogate written by save"
+        data = numpy.load(path)
+        variables = []
+        for name,stage in zip(data['names'],data['stages']):
+            if stage:
+                variables.append(getattr(solver,str(name))(int(stage)))
+            else:
+                variables.append(getattr(solver,str(name))())
+        return cls(variables,data['lo'],data['hi'],data['exponents'],data['coefficients'],str(data['key']),
+            data['rms'],data['max_error'],int(data['holdout']))
+    load = classmethod(load)
+
+def config_key(config,variables):
+    """Everything about config that a surrogate over variables holds fixed, as a string.
+    Stage masses count, as a FuelFraction keeps them, and numbers are to 9 digits."""
+    varied = [(variable.__class__.__name__,getattr(variable,'stage',0)) for variable in variables]
+    stages = []
+    for i in range(1,config.numstages+1):
+        stage = ['%.9g' % (float(config.fuelmass[i]) + float(config.drymass[i]))]
+        for name,attribute in (('FuelFraction','fuelmass'),('Isp','Isp0'),('Thrust','thrust0')):
+            if (name,i) not in varied:
+                stage.append('%.9g' % float(getattr(config,attribute)[i]))
+        stages.append(stage)
+    fixed = [config.numstages,stages,config.missilediam,config.rvdiam,config.trajectory,config.integrator,
+        config.atmosphere,config.coast]
+    if ('Payload',0) not in varied:
+        fixed.append(config.payload)
+    if config.integrator == 'DOPRI5':
+        fixed += [config.rtol,config.atol]
+    else:
+        fixed.append(config.step)
+    if config.trajectory != 'Burnout Angle':
+        fixed.append(config.estrange)
+    if config.trajectory == 'Burnout Angle':
+        fixed.append(config.burnout_angle)
+    elif config.trajectory == 'Thrust Vector':
+        fixed += [config.TStartTurn,config.TEndTurn,config.TurnAngle]
+    elif config.trajectory == 'Turn Angle':
+        fixed += [config.TurnTimeStart,config.TurnTimeEnd,config.TurnAngleStart,config.TurnAngleEnd]
+    #numbers alike whether they came in as ints or floats
+    return repr([isinstance(x,(int,float)) and '%.9g' % x or x for x in fixed])
+
+def exponents(n,degree):
+    "Powers of n variables in each term of a full polynomial of degree, constant first"
+    rows = [[0]*n]
+    for d in range(1,degree+1):
+        for combo in itertools.combinations_with_replacement(range(n),d):
+            row = [0]*n
+            for i in combo:
+                row[i] += 1
+            rows.append(row)
+    return numpy.array(rows)
+
+def build(config,variables=None,span=.05,degree=3,samples=None,holdout=50,seed=0,engine='pool',processes=None):
+    """Fits a Surrogate around config. variables default to Payload() and FuelFraction, Isp
+    and Thrust of every stage, and each is varied by a fraction span of its value in config,
+    within its bounds. samples runs, by default twice the number of terms, are fitted and
+    holdout more are kept back to measure the error. The design is a Latin hypercube drawn
+    from seed. engine is 'pool' to run them in a multiprocessing pool of processes (by default
+    one per processor, 1 runs in this process), or 'batch' in a BatchSimulation, for RK2 configs."""
+    if engine not in ('pool','batch'):
+        raise ValueError("unknown surrogate engine %r" % engine)
+    if engine == 'batch' and config.integrator != 'RK2':
+        raise ValueError("the batch engine integrates with RK2 only")
+    if variables is None:
+        variables = [solver.Payload()]
+        for i in range(1,config.numstages+1):
+            variables += [solver.FuelFraction(i),solver.Isp(i),solver.Thrust(i)]
+    lo,hi = [],[]
+    for variable in variables:
+        x = variable.get(config)
+        a,b = solver.clip(x - span*abs(x),variable.bounds),solver.clip(x + span*abs(x),variable.bounds)
+        if a == b:
+            raise ValueError("%s has no room to vary around %g" % (variable.name,x))
+        lo.append(a)
+        hi.append(b)
+    lo,hi = numpy.array(lo),numpy.array(hi)
+    powers = exponents(len(variables),degree)
+    if samples is None:
+        samples = 2*len(powers)
+    count = samples + holdout
+
+    #Latin hypercube: one point in each of count slices of every variable, paired at random
+    random = numpy.random.RandomState(seed)
+    u = 2*(numpy.argsort(random.rand(count,len(variables)),axis=0) + random.rand(count,len(variables)))/count - 1
+    trial_config = config.copy(record=RECORD_SUMMARY)
+    configs = []
+    for row in u:
+        trial = trial_config
+        for variable,x in zip(variables,lo + (row + 1)*(hi - lo)/2):
+            trial = variable.set(trial,x)
+        configs.append(trial)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if engine == 'batch':
+        results = BatchSimulation.from_configs(configs).integrate(configs[0].trajectory)
+        rows = zip(results['Range'],results['Apogee'],results['FlightTime'],results['TimedOut'])
+    elif processes > 1:
+        size = (count + processes - 1)//processes
+        pool = multiprocessing.Pool(processes)
+        try:
+            rows = sum(pool.map(run_block,[configs[i:i+size] for i in range(0,count,size)]),[])
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        rows = run_block(configs)
+    outputs = numpy.array([row[:3] for row in rows],dtype=float)
+    landed = ~numpy.array([row[3] for row in rows],dtype=bool)
+
+    terms = numpy.prod(u[:,numpy.newaxis,:]**powers,axis=2)
+    fit = numpy.arange(count) < samples
+    coefficients = numpy.linalg.lstsq(terms[fit & landed],outputs[fit & landed],rcond=None)[0]
+    test = ~fit & landed
+    errors = terms[test].dot(coefficients) - outputs[test]
+    if not len(errors):
+        errors = numpy.zeros((1,len(OUTPUTS)))
+    return Surrogate(variables,lo,hi,powers,coefficients,config_key(config,variables),
+        numpy.sqrt((errors**2).mean(axis=0)),abs(errors).max(axis=0),int(test.sum()))
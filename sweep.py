@@ -0,0 +1,196 @@
+"""Trade curves: range, apogee and flight time against one missile parameter.
+
+A sweep runs a variable of solver.py, such as Payload(), EstRange() or
+BurnoutAngle(), over an interval. It starts from evenly spaced points and then
+adds midpoints where the range curve bends, until the curve is smooth to a
+tolerance or a point budget is spent. Each round of points runs across a
+process pool or together in the vectorized batch engine.
+
+Neighbouring points go to the same worker, in order, so a sweep over something
+that only matters after boost, like RVDiameter(), flies the boost once per worker
+and resumes every other point from the boost cache.
+
+Payload and the other parameters of the boost change it for every point, so there
+is nothing to reuse when each point flies the config's own steering. With optimal,
+each point flies the burnout angle of longest range instead, searched for by
+solver.maximize, and that search is warm started: it spans a few degrees about the
+angle the solved points nearest it predict, rather than the whole range of angles.
+A range-payload curve of the longest range then takes about a quarter fewer runs
+than searching each point afresh."""
+
+import multiprocessing
+import numpy
+from sim import simulate
+from trajectory import RECORD_SUMMARY
+from batch import BatchSimulation
+from solver import BurnoutAngle,EstRange,maximize
+
+WARM_WIDTH = 2.0 #half width of the window about a predicted burnout angle [deg]
+
+class Curve(object):
+    """Outcome of a sweep, in order of x: arrays of the variable x, range [m], apogee [m],
+    flight time [sec] and timed out flags, and the number of refinement rounds and of
+    simulation runs. burnout_angle is the array of angles [deg] of an optimal sweep, or None."""
+    def __init__(self,variable,x,range,apogee,flight_time,timed_out,rounds,runs,burnout_angle=None):
+        self.variable = variable
+        self.x = x
+        self.range = range
+        self.apogee = apogee
+        self.flight_time = flight_time
+        self.timed_out = timed_out
+        self.rounds = rounds
+        self.runs = runs
+        self.burnout_angle = burnout_angle
+
+    def __len__(self):
+        return len(self.x)
+
+    def points(self,quantity='range'):
+        """Array of (x, quantity) pairs, ready for a plot.PolyLine, with range and apogee
+        in km and flight time in sec"""
+        y = getattr(self,quantity)
+        if quantity != 'flight_time':
+            y = y/1000
+        return numpy.column_stack((self.x,y))
+
+    def table(self):
+        "Text table of the curve, one point per line"
+        header = "%s,RANGE (km),APOGEE (km),TIME (sec)" % self.variable.name.upper()
+        if self.burnout_angle is not None:
+            header += ",BURNOUT ANGLE (deg)"
+        lines = [header]
+        for i in range(len(self.x)):
+            line = "%.6g,%.3f,%.3f,%.3f" % (self.x[i],self.range[i]/1000,self.apogee[i]/1000,self.flight_time[i])
+            if self.burnout_angle is not None:
+                line += ",%.3f" % self.burnout_angle[i]
+            if self.timed_out[i]:
+                line += ",timed out"
+            lines.append(line)
+        return '\n'.join(lines) + '\n'
+
+def sweep(config,variable,lo,hi,points=9,tolerance=.005,maxpoints=65,maxrounds=6,engine='pool',processes=None,
+        optimal=False):
+    """Curve of config as variable goes from lo to hi. Starts from points evenly spaced
+    values, then halves the intervals on both sides of each point where the range strays
+    from the line through its neighbours by more than tolerance of the range spanned,
+    until no point does, maxrounds have been run, or there are maxpoints.
+    engine is 'pool' to run each round in a multiprocessing pool of processes (by default
+    one per processor, 1 runs in this process), or 'batch' to run it together in a
+    BatchSimulation, for RK2 configs. With optimal, each point flies the burnout angle of
+    longest range, searched for from the angles of the points nearest it, in the pool."""
+    if engine not in ('pool','batch'):
+        raise ValueError("unknown sweep engine %r" % engine)
+    if engine == 'batch' and config.integrator != 'RK2':
+        raise ValueError("the batch engine integrates with RK2 only")
+    if optimal and engine == 'batch':
+        raise ValueError("an optimal sweep runs in the pool engine only")
+    if optimal and isinstance(variable,(BurnoutAngle,EstRange)):
+        raise ValueError("an optimal sweep sets the burnout angle, it cannot sweep %s" % variable.name)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    trial_config = config.copy(record=RECORD_SUMMARY)
+    pool = None
+    if engine == 'pool' and processes > 1:
+        pool = multiprocessing.Pool(processes)
+    outcomes = {} #range, apogee, flight time, timed out, burnout angle and runs of each x
+    def run(xs):
+        configs = [variable.set(trial_config,x) for x in xs]
+        if optimal:
+            solved = [(x,outcomes[x][4]) for x in outcomes]
+            jobs = [(zip(xs,configs),solved)]
+            if pool is not None:
+                size = (len(configs) + processes - 1)//processes
+                jobs = [(zip(xs,configs)[i:i+size],solved) for i in range(0,len(configs),size)]
+                rows = sum(pool.map(optimal_block,jobs),[])
+            else:
+                rows = optimal_block(jobs[0])
+        elif engine == 'batch':
+            results = BatchSimulation.from_configs(configs).integrate(configs[0].trajectory)
+            rows = [row + (None,1) for row in zip(results['Range'],results['Apogee'],results['FlightTime'],results['TimedOut'])]
+        elif pool is None:
+            rows = run_block(configs)
+        else:
+            #neighbours to the same worker, to share its boost cache
+            size = (len(configs) + processes - 1)//processes
+            blocks = [configs[i:i+size] for i in range(0,len(configs),size)]
+            rows = sum(pool.map(run_block,blocks),[])
+        for x,row in zip(xs,rows):
+            outcomes[x] = row
+
+    try:
+        run(list(numpy.linspace(lo,hi,points)))
+        rounds = 0
+        while rounds < maxrounds and len(outcomes) < maxpoints:
+            xs = sorted(outcomes)
+            ranges = [outcomes[x][0] for x in xs]
+            span = max(ranges) - min(ranges)
+            split = {} #intervals to halve, by their left end
+            for i in range(1,len(xs) - 1):
+                line = ranges[i-1] + (ranges[i+1] - ranges[i-1])*(xs[i] - xs[i-1])/(xs[i+1] - xs[i-1])
+                if abs(ranges[i] - line) > tolerance*span:
+                    split[i-1] = True
+                    split[i] = True
+            new = [(xs[i] + xs[i+1])/2 for i in sorted(split)][:maxpoints - len(outcomes)]
+            new = [x for x in new if x not in outcomes]
+            if not new:
+                break
+            run(new)
+            rounds += 1
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    xs = sorted(outcomes)
+    columns = zip(*[outcomes[x] for x in xs])
+    angles = None
+    if optimal:
+        angles = numpy.array(columns[4],dtype=float)
+    return Curve(variable,numpy.array(xs),numpy.array(columns[0],dtype=float),numpy.array(columns[1],dtype=float),
+        numpy.array(columns[2],dtype=float),numpy.array(columns[3],dtype=bool),rounds,sum(columns[5]),angles)
+
+def run_block(configs):
+    """Runs configs in order, for worker processes. Returns a list of range, apogee,
+    flight time, timed out, None for the burnout angle, and 1 run for each."""
+    rows = []
+    for config in configs:
+        result = simulate(config)
+        rows.append((result.range,result.apogee,result.flight_time,result.timed_out,None,1))
+    return rows
+
+def predict(solved,x):
+    "Burnout angle at x from the line through the two of solved, (x, angle) pairs, nearest it, or None"
+    nearest = sorted(solved,key=lambda point: abs(point[0] - x))[:2]
+    if not nearest:
+        return None
+    if len(nearest) == 1 or nearest[0][0] == nearest[1][0]:
+        return nearest[0][1]
+    (x1,a1),(x2,a2) = nearest
+    return a1 + (a2 - a1)*(x - x1)/(x2 - x1)
+
+def optimal_block(job):
+    """Flies each of a list of (x, config), in order, at its burnout angle of longest range,
+    for worker processes. The search spans WARM_WIDTH either side of the angle predicted
+    from the points solved so far, the (x, angle) pairs given and those of the block,
+    with the same tolerance in degrees as a search over all angles, which it falls back
+    to if there is no prediction or the peak lies outside. Returns rows as run_block."""
+    points,solved = job
+    solved = list(solved)
+    rows = []
+    for x,config in points:
+        runs = 0
+        solution = None
+        seed = predict(solved,x)
+        if seed is not None:
+            lo,hi = max(seed - WARM_WIDTH,5.0),min(seed + WARM_WIDTH,85.0)
+            solution = maximize(config,lo=lo,hi=hi,points=3,xtol=1e-4*80.0/(hi - lo))
+            runs += solution.evaluations
+            if not solution.converged:
+                solution = None
+        if solution is None:
+            solution = maximize(config)
+            runs += solution.evaluations
+        result = solution.result
+        solved.append((x,solution.x))
+        rows.append((result.range,result.apogee,result.flight_time,result.timed_out,solution.x,runs))
+    return rows
@@ -0,0 +1,18 @@
+"""Shared fixtures of the tests. The modules under test sit in the directory above."""
+
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+import presets
+
+def library():
+    "Dict of the presets in presets.txt, read without writing an index"
+    return presets.load(os.path.join(ROOT,'presets.txt'))
+
+@pytest.fixture(scope='session')
+def catalogue():
+    return library()
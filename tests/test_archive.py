@@ -0,0 +1,35 @@
+"""Round trips through the trajectory archive."""
+
+import pytest
+import archive
+from sim import SimConfig,simulate
+from trajectory import COLUMNS,RECORD_STEPS
+
+def test_round_trip(tmpdir,catalogue):
+    names = ['Germany - V2','DPRK - TD-2']
+    runs = []
+    for name in names:
+        config = SimConfig.from_preset(catalogue[name],record=RECORD_STEPS,record_every=5)
+        runs.append((simulate(config),config,name))
+    runs.append((simulate(config.copy(dtype='float32')),config.copy(dtype='float32'),'float32'))
+    path = str(tmpdir.join('runs.irbm'))
+    archive.write(path,runs)
+    opened = archive.Archive(path)
+    assert len(opened) == 3
+    for i,(result,config,name) in enumerate(runs):
+        run = opened[i]
+        assert opened[name] is run
+        assert run.name == name
+        assert (run.range,run.apogee,run.flight_time,run.steps) == \
+            (result.range,result.apogee,result.flight_time,result.steps)
+        assert run.dtype == result.data.buffer.dtype
+        assert [event.__dict__ for event in run.events] == [event.__dict__ for event in result.events]
+        for column in COLUMNS:
+            assert (run[column] == result.data[column]).all(), column
+    del opened #unmaps the file
+
+def test_not_an_archive(tmpdir):
+    path = tmpdir.join('data.txt')
+    path.write('TIME,HEIGHT\n')
+    with pytest.raises(ValueError):
+        archive.Archive(str(path))
@@ -0,0 +1,49 @@
+"""Tabulated atmosphere and drag against the model they are built from."""
+
+import numpy
+import pytest
+import atmosphere
+from math import sqrt
+from sim import SimConfig,Simulation,simulate
+from trajectory import RECORD_SUMMARY
+
+@pytest.fixture(scope='module')
+def model(catalogue):
+    return Simulation(SimConfig.from_preset(catalogue['Russia - Scud-B']))
+
+def sound_speed(model,h):
+    return sqrt(1.4*287*(model.temperature(h) + 273.15))
+
+@pytest.mark.parametrize('accuracy,rtol',[('fine',1e-5),('medium',1e-4),('coarse',2e-3)])
+def test_tables(model,accuracy,rtol):
+    table = atmosphere.table(accuracy,model)
+    assert table is atmosphere.table(accuracy,model) #built once per process
+    heights = numpy.random.RandomState(0).uniform(0,60000,500)
+    for h in heights:
+        assert abs(table.density(h) - model.density(h)) <= rtol*model.density(0)
+        assert abs(table.sound_speed(h) - sound_speed(model,h)) <= rtol*sound_speed(model,h)
+        for v in (100.0,300.0,700.0,2000.0):
+            assert abs(table.Cdrag(v,h) - model.Cdrag(v,h)) <= rtol*model.Cdrag(v,0) + 1e-9
+    #arrays look up the same values as numbers
+    assert (table.density(heights) == [table.density(h) for h in heights]).all()
+    assert numpy.allclose(table.Cdrag(500.0,heights),[table.Cdrag(500.0,h) for h in heights],rtol=1e-12)
+
+def test_jumps_and_limits(model):
+    table = atmosphere.table('coarse',model)
+    assert table.density(atmosphere.h_atmosphere) == 0.0
+    for h in (11000.0,19200.0):
+        for side in (h - 1e-3,h + 1e-3):
+            assert abs(table.density(side) - model.density(side)) < 1e-6
+    #the drag curve is linear in Mach between table nodes, so sea level is exact
+    for mach in numpy.linspace(0,6,61):
+        v = mach*sound_speed(model,0)
+        assert abs(table.Cdrag(v,0) - model.Cdrag(v,0)) < 1e-9
+    assert atmosphere.table('exact',model) is None
+    with pytest.raises(ValueError):
+        atmosphere.table('rough',model)
+
+def test_ranges(catalogue):
+    config = SimConfig.from_preset(catalogue['Russia - Scud-B'],record=RECORD_SUMMARY,boost_cache=False)
+    exact = simulate(config).range
+    for accuracy,tolerance in (('fine',.1),('medium',1.0),('coarse',10.0)):
+        assert abs(simulate(config.copy(atmosphere=accuracy)).range - exact) < tolerance
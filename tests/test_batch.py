@@ -0,0 +1,26 @@
+"""The batch engine against the scalar one, lane by lane."""
+
+import pytest
+from batch import BatchSimulation
+from sim import SimConfig,simulate
+from trajectory import RECORD_SUMMARY
+
+TRAJECTORIES = [
+    ('Minimum Energy',{}),
+    ('Burnout Angle',{'burnout_angle':40.0}),
+    ('Thrust Vector',{'TStartTurn':10.0,'TEndTurn':30.0,'TurnAngle':2.0}),
+    ]
+
+@pytest.mark.parametrize('trajectory,parameters',TRAJECTORIES)
+def test_parity(catalogue,trajectory,parameters):
+    "Every preset in one batch, against its own scalar run"
+    names = sorted(catalogue.keys())
+    configs = [SimConfig.from_preset(catalogue[name],trajectory=trajectory,record=RECORD_SUMMARY,
+        boost_cache=False,**parameters) for name in names]
+    results = BatchSimulation.from_configs(configs).integrate(trajectory)
+    for i,config in enumerate(configs):
+        result = simulate(config)
+        assert abs(results['Range'][i] - result.range) < 1e-3, names[i]
+        assert abs(results['Apogee'][i] - result.apogee) < 1e-3, names[i]
+        assert abs(results['FlightTime'][i] - result.flight_time) < 1e-6, names[i]
+        assert bool(results['TimedOut'][i]) == result.timed_out, names[i]
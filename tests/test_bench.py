@@ -0,0 +1,42 @@
+"""Benchmarks and their comparison."""
+
+import json
+import bench
+
+def case(preset,wall=1.0,range_km=300.0,apogee_km=80.0,error=None,integrator='RK2'):
+    measured = {'preset':preset,'trajectory':'Minimum Energy','integrator':integrator}
+    if error is not None:
+        measured['error'] = error
+    else:
+        measured.update({'wall':wall,'range_km':range_km,'apogee_km':apogee_km})
+    return measured
+
+def test_compare():
+    baseline = {'cases':[case('A'),case('B'),case('C'),case('D'),case('E'),case('F',error='ValueError: x'),case('G')]}
+    current = {'cases':[case('A',wall=1.2),case('B',wall=1.3),case('C',range_km=300.001),case('D',error='ZeroDivisionError: y'),
+        case('F',error='ValueError: x'),case('G',integrator='DOPRI5'),case('H')]}
+    flags = bench.compare(baseline,current,threshold=.25,drift=1e-6)
+    assert [flag[0] for flag in flags] == ['B','C','D','E','G']
+    assert flags[0][3].startswith('30% slower')
+    assert flags[1][3] == 'range_km 300.001000 from 300.000000'
+    assert flags[2][3] == 'fails, ZeroDivisionError: y'
+    assert flags[3][3] == flags[4][3] == 'missing'
+    assert bench.compare(baseline,current,threshold=.5,drift=1e-5)[:2] == [flags[2],flags[3]]
+
+def test_run_and_compare(catalogue,tmpdir,capsys):
+    benchmark = bench.run(catalogue,['Germany - V2'],['Minimum Energy'],['RK2','DOPRI5'],repeat=1,isolate=False)
+    assert [bench.key(measured) for measured in benchmark['cases']] == \
+        [('Germany - V2','Minimum Energy','RK2'),('Germany - V2','Minimum Energy','DOPRI5')]
+    for measured in benchmark['cases']:
+        assert measured['wall'] > 0 and measured['steps'] > 0 and 200 < measured['range_km'] < 300
+        assert sum([phase['steps'] for phase in measured['phases']]) == measured['steps']
+    assert bench.compare(benchmark,benchmark) == []
+    assert 'Germany - V2' in bench.table(benchmark)
+    #compare from files exits 1 when a case is flagged
+    path,slower = str(tmpdir.join('base.json')),str(tmpdir.join('slower.json'))
+    json.dump(benchmark,open(path,'w'))
+    benchmark['cases'][0]['wall'] *= 2
+    json.dump(benchmark,open(slower,'w'))
+    assert bench.main(['compare',path,path]) == 0
+    assert bench.main(['compare',path,slower]) == 1
+    assert capsys.readouterr()[0].splitlines()[-1] == "1 of 2 cases flagged"
@@ -0,0 +1,46 @@
+"""Runs resumed from the cache of states at the end of boost."""
+
+import pytest
+import boostcache
+from sim import SimConfig,simulate
+from trajectory import RECORD_ALL,RECORD_STEPS,RECORD_SUMMARY
+
+@pytest.mark.parametrize('integrator',['RK2','DOPRI5'])
+@pytest.mark.parametrize('record',[RECORD_SUMMARY,RECORD_ALL,RECORD_STEPS])
+def test_boost_cache(catalogue,integrator,record):
+    "Runs resumed from the boost cache match full runs, whatever recorded the boost"
+    config = SimConfig.from_preset(catalogue['Iraq - Al-Husayn'],integrator=integrator,record=record,record_every=10)
+    exact = simulate(config.copy(boost_cache=False))
+    cache = boostcache.BoostCache()
+    hits = 0
+    for first in (RECORD_SUMMARY,RECORD_ALL,record):
+        cache.clear()
+        simulate(config.copy(record=first,boost_cache=cache))
+        result = simulate(config.copy(boost_cache=cache))
+        assert (result.range,result.apogee,result.steps) == (exact.range,exact.apogee,exact.steps)
+        assert result.data.size == exact.data.size
+        assert (result.data['Height'] == exact.data['Height']).all()
+        hits += cache.hits
+    assert hits >= 2
+
+def test_shared_boost(catalogue):
+    "Runs that differ only after boost share its state, those that differ in it do not"
+    config = SimConfig.from_preset(catalogue['Russia - Scud-B'],record=RECORD_SUMMARY,boost_cache=boostcache.BoostCache())
+    cache = config.boost_cache
+    simulate(config)
+    assert (cache.hits,cache.misses,len(cache)) == (0,1,1)
+    for changed in (config.copy(coast='kepler'),config.copy(record=RECORD_ALL)):
+        simulate(changed)
+    simulate(config.copy(payload=config.payload + 100.0))
+    assert cache.hits == 1 and len(cache) == 2
+
+def test_least_recently_used():
+    cache = boostcache.BoostCache(size=2)
+    for key in 'abc':
+        cache.put(key,boostcache.BoostState(None,[],0,[]))
+        cache.get('a')
+    assert 'a' in cache and 'b' not in cache and 'c' in cache
+    cache.put('d',boostcache.BoostState(None,[],0,None))
+    assert cache.get('d') is None and cache.get('d',samples=False) is not None
+    cache.clear()
+    assert len(cache) == 0 and cache.hits == 4 and cache.misses == 1
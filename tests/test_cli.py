@@ -0,0 +1,46 @@
+"""Exit codes and output of the command line runner."""
+
+import json
+import os
+import pytest
+import archive
+import cli
+from conftest import ROOT
+
+PRESETS = os.path.join(ROOT,'presets.txt')
+
+def run(capsys,*args):
+    "Exit code and stdout lines of cli.main"
+    try:
+        code = cli.main(['--presets',PRESETS] + list(args))
+    except SystemExit,e:
+        code = e.code
+    return code,capsys.readouterr()[0].splitlines()
+
+def test_csv(capsys):
+    code,lines = run(capsys,'-p','Russia - Scud-B','--set','payload=900,1000')
+    assert code == 0
+    assert lines[0] == ','.join(['case','payload'] + cli.FIELDS)
+    assert [line.split(',')[:2] for line in lines[1:]] == [['Russia - Scud-B','900.0'],['Russia - Scud-B','1000.0']]
+    assert float(lines[1].split(',')[2]) > float(lines[2].split(',')[2]) #less payload flies further
+
+def test_jsonl_and_archive(capsys,tmpdir):
+    path = str(tmpdir.join('runs.irbm'))
+    code,lines = run(capsys,'-p','Germany - V2','-p','Russia - Scud-B','--format','jsonl','--jobs','2','--archive',path)
+    assert code == 0
+    rows = [json.loads(line) for line in lines]
+    assert [row['case'] for row in rows] == ['Germany - V2','Russia - Scud-B']
+    assert rows[0]['error'] == '' and 200 < rows[0]['range_km'] < 300
+    assert [stored.name for stored in archive.Archive(path)] == ['Germany - V2','Russia - Scud-B']
+
+def test_failing_run(capsys):
+    "A run that raises is reported in its row and fails the exit code, the others still run"
+    code,lines = run(capsys,'-p','Russia - Scud-B','--set','payload=0,1000')
+    assert code == 1
+    assert lines[1].endswith('ZeroDivisionError: float division by zero')
+    assert lines[2].endswith(',')
+
+@pytest.mark.parametrize('args',[['stray'],['-p','No Such Missile'],[],['-a','--set','payload'],
+    ['-p','Russia - Scud-B','--set','thrust0.3=1'],['-a','--integrator','Euler']])
+def test_usage_errors(capsys,args):
+    assert run(capsys,*args)[0] == 2
@@ -0,0 +1,43 @@
+"""Accuracy against cost of the integrator settings."""
+
+import pytest
+from sim import SimConfig
+import convergence
+
+@pytest.fixture(scope='module')
+def result(catalogue):
+    configs = [(name,SimConfig.from_preset(catalogue[name])) for name in ('Germany - V2','Russia - Scud-B')]
+    return convergence.study(configs,convergence.settings([.2,.05],[1e-6,1e-9],['integrate']),repeat=1)
+
+def test_settings():
+    chosen = convergence.settings([.1],[1e-6])
+    assert [label for label,changes in chosen] == ['RK2 step=0.1','DOPRI5 rtol=1e-06','RK2 step=0.1 kepler','DOPRI5 rtol=1e-06 kepler']
+    assert chosen[1][1] == {'integrator':'DOPRI5','rtol':1e-6,'atol':1e-6*convergence.ATOL,'coast':'integrate'}
+
+def test_errors_shrink(result):
+    assert result.presets == ['Germany - V2','Russia - Scud-B'] and len(result.rows) == 8
+    for preset in result.presets:
+        rows = dict([(row['setting'],row) for row in result.select(preset)])
+        assert rows['RK2 step=0.05']['steps'] > 3*rows['RK2 step=0.2']['steps']
+        assert rows['RK2 step=0.05']['range_error'] < rows['RK2 step=0.2']['range_error']
+        assert rows['DOPRI5 rtol=1e-09']['range_error'] < rows['DOPRI5 rtol=1e-06']['range_error'] < 100.0
+        points = result.points(preset)
+        assert points.shape == (4,2) and (points[1:,0] >= points[:-1,0]).all()
+    assert len(result.table().splitlines()) == 9
+
+def test_cheapest(result):
+    assert result.cheapest(1e9,cost='steps')[0] == 'DOPRI5 rtol=1e-06'
+    setting,worst,steps = result.cheapest(10.0,cost='steps')
+    assert setting == 'DOPRI5 rtol=1e-09' and worst <= 10.0
+    assert steps == sum([row['steps'] for row in result.select(setting=setting)])
+    assert result.cheapest(0.0) is None
+
+def test_failed_runs():
+    "A setting that failed on any preset is never the cheapest"
+    rows = [{'preset':'A','setting':'fast','error':'ZeroDivisionError: float division'},
+        {'preset':'B','setting':'fast','steps':10,'wall':.1,'range_error':1.0,'apogee_error':1.0,'flight_time_error':0.0},
+        {'preset':'A','setting':'slow','steps':100,'wall':1.0,'range_error':2.0,'apogee_error':1.0,'flight_time_error':0.0},
+        {'preset':'B','setting':'slow','steps':100,'wall':1.0,'range_error':3.0,'apogee_error':1.0,'flight_time_error':0.0}]
+    result = convergence.Study(['A','B'],['fast','slow'],rows)
+    assert result.cheapest(5.0) == ('slow',3.0,2.0)
+    assert result.table().splitlines()[1] == 'A,fast,,,,,,ZeroDivisionError: float division'
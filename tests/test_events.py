@@ -0,0 +1,64 @@
+"""Location of flight events inside integration steps."""
+
+import pytest
+import numpy
+from events import Step,bisect,find,BURNOUT,BOOST_END,ATMOSPHERE_EXIT,APOGEE,REENTRY,IMPACT,h_atmosphere
+from sim import SimConfig,Simulation,simulate
+from trajectory import RECORD_SUMMARY
+
+def cubic(t):
+    return 2.0 + 3.0*t + 40.0*t**2 - 30.0*t**3
+
+def slope(t):
+    return 3.0 + 80.0*t - 90.0*t**2
+
+def step(t0,t1):
+    "Step with the cubic as height, state entry 1, and a linear mass, entry 4"
+    y0 = [0.0,cubic(t0),0.0,0.0,100.0]
+    y1 = [0.0,cubic(t1),0.0,0.0,90.0]
+    return Step(t0,y0,[None,slope(t0),None,None,None],t1,y1,[None,slope(t1),None,None,None])
+
+def test_hermite_is_exact_for_a_cubic():
+    s = step(.5,1.5)
+    for fraction in numpy.linspace(0,1,11):
+        t,y = s.state(fraction)
+        assert abs(y[1] - cubic(t)) < 1e-12
+        assert abs(y[4] - (100.0 - 10.0*fraction)) < 1e-12
+        assert abs(s.slope(1,fraction) - slope(t)*s.dt) < 1e-12
+
+def test_peak_and_crossing():
+    s = step(.5,1.5)
+    top = (80.0 + (80.0**2 + 4*90*3.0)**.5)/180 #root of the slope
+    assert abs(s.t0 + s.peak()*s.dt - top) < 1e-9
+    level = cubic(.8)
+    assert abs(s.t0 + s.crossing(level)*s.dt - .8) < 1e-9
+    assert s.fraction(1.0) == .5
+
+def test_bisect_elementwise():
+    roots = numpy.array([.1,.5,.9])
+    assert numpy.allclose(bisect(lambda s: s - roots),roots,atol=1e-9)
+    assert abs(bisect(lambda s: s - .25) - .25) < 1e-9
+
+@pytest.mark.parametrize('name',['Germany - V2','DPRK - TD-2'])
+def test_events_of_a_flight(catalogue,name):
+    config = SimConfig.from_preset(catalogue[name],record=RECORD_SUMMARY,boost_cache=False)
+    sim = Simulation(config)
+    burnouts = numpy.cumsum([sim.fuelmass[i]/sim.dMdt[i] for i in range(1,sim.numstages+1)])
+    results = [simulate(config.copy(step=step)) for step in (.1,.05)]
+    for result in results:
+        kinds = [event.kind for event in result.events]
+        assert kinds.count(BURNOUT) == sim.numstages
+        assert kinds.index(BOOST_END) < kinds.index(APOGEE) < kinds.index(REENTRY) < kinds.index(IMPACT) == len(kinds) - 1
+        assert [event.t for event in result.events] == sorted([event.t for event in result.events])
+        #burnouts fall where the fuel runs out, not on a step
+        for stage,t in enumerate(burnouts):
+            assert abs(find(result.events,BURNOUT,stage + 1).t - t) < 1e-6
+        assert find(result.events,BOOST_END).t == find(result.events,BURNOUT,sim.numstages).t
+        assert abs(find(result.events,ATMOSPHERE_EXIT).h - h_atmosphere) < 1e-6
+        assert abs(find(result.events,REENTRY).h - h_atmosphere) < 1e-6
+        impact = find(result.events,IMPACT)
+        assert abs(impact.h) < 1e-6 and impact.range == result.range and impact.t == result.flight_time
+        assert find(result.events,APOGEE).h == result.apogee
+    #times inside the step agree across step sizes far closer than a step
+    for kind in (APOGEE,IMPACT):
+        assert abs(find(results[0].events,kind).t - find(results[1].events,kind).t) < .2
@@ -0,0 +1,59 @@
+"""Text export of trajectories."""
+
+import gzip
+import numpy
+import pytest
+from sim import SimConfig,Simulation,simulate
+from trajectory import RECORD_STEPS
+from export import CSVWriter,EXPORT_COLUMNS,write_csv
+
+@pytest.fixture(scope='module')
+def run(catalogue):
+    config = SimConfig.from_preset(catalogue['Germany - V2'],record=RECORD_STEPS,record_every=7)
+    return config,simulate(config)
+
+def read(path):
+    "Header and array of values of a csv file"
+    stream = path.endswith('.gz') and gzip.open(path) or open(path)
+    lines = stream.read().splitlines()
+    stream.close()
+    return lines[0].split(','),numpy.array([[float(x) for x in line.split(',')] for line in lines[1:]])
+
+def test_round_trip(run,tmpdir):
+    config,result = run
+    path = str(tmpdir.join('v2.csv'))
+    write_csv(path,result.data,precision=6,block=100)
+    header,values = read(path)
+    assert header == [column.upper() for column in EXPORT_COLUMNS]
+    assert len(values) == result.data.size
+    for i,column in enumerate(EXPORT_COLUMNS):
+        assert numpy.allclose(values[:,i],result.data[column],rtol=0,atol=1e-6), column
+
+def test_units(run,tmpdir):
+    config,result = run
+    path = str(tmpdir.join('v2.csv.gz'))
+    write_csv(path,result.data,columns=['Time','Range','Gamma'],units={'Range':'km','Gamma':'deg'})
+    header,values = read(path)
+    assert header == ['TIME','RANGE (km)','GAMMA (deg)']
+    assert numpy.allclose(values[:,1],result.data['Range']/1000,atol=1e-3)
+    assert numpy.allclose(values[:,2],numpy.degrees(result.data['Gamma']),atol=1e-3)
+    with pytest.raises(ValueError):
+        CSVWriter(str(tmpdir.join('bad.csv')),units={'Range':'miles'})
+    with pytest.raises(ValueError):
+        CSVWriter(str(tmpdir.join('bad.csv')),columns=['Pressure'])
+
+def test_runs_and_stages(run,tmpdir):
+    "Sweeps name the run of each row, after the stage parameters of each run"
+    config,result = run
+    path = str(tmpdir.join('sweep.csv'))
+    writer = CSVWriter(path,columns=['Time','Height'],run_column=True,stages=[Simulation(config)]*2)
+    writer.write(result.data,run='100%')
+    writer.write(result.data,run=2)
+    writer.close()
+    assert writer.rows == 2*result.data.size
+    lines = open(path).read().splitlines()
+    assert lines[0] == "STAGE 1 Parameters:" and lines.count("STAGE 1 Parameters:") == 2
+    header = lines.index('RUN,TIME,HEIGHT')
+    rows = lines[header + 1:]
+    assert len(rows) == writer.rows
+    assert rows[0].startswith('100%,0.000,') and rows[-1].startswith('2,')
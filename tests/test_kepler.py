@@ -0,0 +1,56 @@
+"""The analytic coast above the atmosphere against step by step integration."""
+
+import numpy
+import pytest
+from math import pi
+from kepler import Conic
+from sim import SimConfig,simulate
+from trajectory import RECORD_SECONDS,RECORD_SUMMARY
+
+MU = 9.81*6370000.0**2
+REARTH = 6370000.0
+
+def test_conic():
+    conic = Conic(10.0,3000.0,100000.0,.01,.6,MU,REARTH)
+    assert conic.bound()
+    assert numpy.allclose(conic.state(10.0),(3000.0,100000.0,.01,.6),rtol=1e-9,atol=1e-9)
+    times = numpy.linspace(10.0,conic.time_at_radius(REARTH + 100000.0),50)
+    v,h,psi,gamma = conic.state(times)
+    r = REARTH + h
+    #energy and angular momentum are kept, range only grows
+    assert numpy.allclose(v**2/2 - MU/r,3000.0**2/2 - MU/(REARTH + 100000.0),rtol=1e-9)
+    assert numpy.allclose(r*v*numpy.cos(gamma),conic.ang,rtol=1e-9)
+    assert (numpy.diff(psi) > 0).all()
+    #apogee where the path is level, and the descent back through the start height mirrors the climb
+    top = conic.state(conic.time_of_apogee())
+    assert abs(top[3]) < 1e-9 and top[1] >= h.max()
+    assert abs(gamma[-1] + .6) < 1e-9 and abs(psi[-1] - .01 - 2*(top[2] - .01)) < 1e-9
+    assert conic.time_at_radius(REARTH + 2*top[1]) is None
+    assert not Conic(0.0,20000.0,100000.0,0.0,.5,MU,REARTH).bound()
+
+@pytest.mark.parametrize('name',['Germany - V2','DPRK - Nodong-A','DPRK - TD-2'])
+def test_coast(catalogue,name):
+    config = SimConfig.from_preset(catalogue[name],integrator='DOPRI5',record=RECORD_SUMMARY,boost_cache=False)
+    integrated = simulate(config)
+    kepler = simulate(config.copy(coast='kepler'))
+    assert abs(kepler.range - integrated.range) < 1.0
+    assert abs(kepler.apogee - integrated.apogee) < 1.0
+    assert abs(kepler.flight_time - integrated.flight_time) < 1e-3
+    assert [event.kind for event in kepler.events] == [event.kind for event in integrated.events]
+
+def test_fewer_steps(catalogue):
+    config = SimConfig.from_preset(catalogue['DPRK - TD-2'],record=RECORD_SUMMARY,boost_cache=False)
+    integrated = simulate(config)
+    kepler = simulate(config.copy(coast='kepler'))
+    assert kepler.steps < .2*integrated.steps
+    assert abs(kepler.range - integrated.range) < 100.0
+
+def test_samples(catalogue):
+    "The coast is sampled as the recording policy asks, from steps of the integrator's size"
+    config = SimConfig.from_preset(catalogue['DPRK - Nodong-A'],record=RECORD_SECONDS,record_every=5.0,boost_cache=False)
+    integrated = simulate(config).data
+    kepler = simulate(config.copy(coast='kepler')).data
+    assert (numpy.floor(kepler['Time']/5.0 + 1e-9) == numpy.arange(kepler.size)).all()
+    assert kepler.size == integrated.size
+    assert numpy.allclose(kepler['Time'],integrated['Time'],atol=.2)
+    assert numpy.allclose(kepler['Height'],integrated['Height'],atol=100.0)
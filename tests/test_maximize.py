@@ -0,0 +1,44 @@
+"""Search for the longest range."""
+
+import pytest
+from sim import SimConfig
+from trajectory import RECORD_SUMMARY
+import solver
+
+@pytest.fixture
+def config(catalogue):
+    return SimConfig.from_preset(catalogue['Russia - Scud-B'],record=RECORD_SUMMARY)
+
+@pytest.mark.parametrize('method',['brent','golden'])
+def test_maximize(config,method):
+    solution = solver.maximize(config,method=method)
+    assert solution.converged
+    assert 5.0 < solution.x < 85.0
+    assert solution.config.trajectory == 'Burnout Angle' and solution.config.burnout_angle == solution.x
+    for angle in (solution.x - 1.0,solution.x + 1.0):
+        nearby = solver.simulate(solver.BurnoutAngle().set(config,angle))
+        assert nearby.range <= solution.range
+
+def test_maximize_methods_agree(config):
+    brent = solver.maximize(config,method='brent')
+    golden = solver.maximize(config,method='golden')
+    assert abs(brent.x - golden.x) < .5
+    assert abs(brent.range - golden.range) < 100.0
+    assert brent.evaluations < golden.evaluations
+
+@pytest.mark.parametrize('engine',['pool','batch'])
+def test_maximize_engines(config,engine):
+    serial = solver.maximize(config)
+    runs = []
+    solution = solver.maximize(config,engine=engine,points=4,callback=lambda n,x,range: runs.append(n))
+    assert runs == range(1,solution.evaluations + 1)
+    assert abs(solution.x - serial.x) < .5
+    assert abs(solution.range - serial.range) < 100.0
+
+def test_maximum_at_a_bound(config):
+    "The longest range at an end of the interval is not converged"
+    solution = solver.maximize(config,solver.Payload(),500.0,2000.0)
+    assert not solution.converged
+    assert solution.x < 501.0
+    with pytest.raises(ValueError):
+        solver.maximize(config,solver.EstRange(),method='newton')
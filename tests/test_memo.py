@@ -0,0 +1,56 @@
+"""The in-memory memo of results."""
+
+import pickle
+import pytest
+from sim import SimConfig,simulate
+from trajectory import RECORD_SUMMARY
+from memo import Memo
+from resultcache import ResultCache
+
+@pytest.fixture
+def config(catalogue):
+    return SimConfig.from_preset(catalogue['Russia - Scud-B'],record=RECORD_SUMMARY,boost_cache=False)
+
+def test_hits(config):
+    memo = Memo(size=2)
+    config = config.copy(result_cache=memo)
+    first = simulate(config)
+    assert simulate(config.copy()) is first
+    assert (memo.hits,memo.misses) == (1,1)
+    assert first.range == simulate(config.copy(result_cache=None)).range
+    #least recently used results go first
+    simulate(config.copy(payload=900.0))
+    simulate(config)
+    simulate(config.copy(payload=800.0))
+    assert config in memo and config.copy(payload=900.0) not in memo and len(memo) == 2
+
+def test_digits(config):
+    "Configs that agree to the digits share a result"
+    memo = Memo(digits=6)
+    config = config.copy(result_cache=memo)
+    result = simulate(config)
+    assert simulate(config.copy(payload=config.payload*(1 + 1e-8))) is result
+    assert simulate(config.copy(payload=config.payload*(1 + 1e-4))) is not result
+    assert Memo().key(config.copy(payload=config.payload*(1 + 1e-8))) != Memo().key(config)
+
+def test_invalidate_and_clear(config):
+    memo = Memo()
+    config = config.copy(result_cache=memo)
+    result = simulate(config)
+    assert memo.invalidate(config) and not memo.invalidate(config)
+    assert simulate(config) is not result
+    memo.clear()
+    assert len(memo) == 0 and (memo.hits,memo.misses) == (0,2)
+    simulate(config)
+    #a copy sent to another process starts empty
+    assert len(pickle.loads(pickle.dumps(memo,2))) == 0
+
+def test_backing(config,tmpdir):
+    "Misses go on to the disk cache, which keeps them for the next session"
+    disk = ResultCache(str(tmpdir))
+    memo = Memo(backing=disk)
+    result = simulate(config.copy(result_cache=memo))
+    assert len(disk) == 1
+    later = Memo(backing=ResultCache(str(tmpdir)))
+    assert simulate(config.copy(result_cache=later)).range == result.range
+    assert later.backing.hits == 1 and later.misses == 1
@@ -0,0 +1,66 @@
+"""Monte Carlo runs and their streaming statistics."""
+
+import pytest
+import numpy
+from sim import SimConfig
+from montecarlo import Dispersion,Quantile,RunningStats,run
+
+@pytest.mark.parametrize('p',[.1,.5,.9])
+@pytest.mark.parametrize('distribution',['normal','exponential','uniform'])
+def test_quantile(p,distribution):
+    "P-square estimates against the exact quantile of the same samples"
+    random = numpy.random.RandomState(1)
+    samples = getattr(random,distribution)(size=5000)
+    estimate = Quantile(p)
+    for x in samples:
+        estimate.add(x)
+    exact = numpy.percentile(samples,p*100)
+    spread = numpy.percentile(samples,75) - numpy.percentile(samples,25)
+    assert abs(estimate.value() - exact) < .05*spread
+
+def test_quantile_few():
+    "Exact while there are five samples or fewer"
+    estimate = Quantile(.5)
+    assert estimate.value() is None
+    for x in (3.0,1.0,2.0):
+        estimate.add(x)
+    assert estimate.value() == 2.0
+
+def test_running_stats():
+    samples = numpy.random.RandomState(2).normal(10.0,3.0,size=1000)
+    stats = RunningStats()
+    for x in samples:
+        stats.add(x)
+    assert stats.count == 1000
+    assert abs(stats.mean - samples.mean()) < 1e-9
+    assert abs(stats.std() - samples.std(ddof=1)) < 1e-9
+    assert (stats.min,stats.max) == (samples.min(),samples.max())
+
+@pytest.fixture
+def config(catalogue):
+    return SimConfig.from_preset(catalogue['Russia - Scud-B'])
+
+def test_run(config):
+    "The outcome depends on the seed alone, not on how the chunks are run"
+    dispersion = Dispersion(thrust=.01,Isp=.005,burntime=.01,burnout_angle=.5)
+    chunks = []
+    one = run(config,dispersion,40,seed=3,processes=1,chunk=16,callback=lambda s: chunks.append(s.samples))
+    two = run(config,dispersion,40,seed=3,processes=2,chunk=16)
+    assert chunks == [16,32,40]
+    assert one.samples == one.range.count + one.timed_out == 40
+    for name in ('range','apogee','flight_time','miss'):
+        assert (getattr(one,name).mean,getattr(one,name).std()) == (getattr(two,name).mean,getattr(two,name).std())
+    assert one.rep.value() == two.rep.value() and 0 < one.rep.value() < one.rep90.value()
+    assert run(config,dispersion,40,seed=4,processes=1,chunk=16).range.mean != one.range.mean
+
+def test_no_dispersion(config):
+    statistics = run(config,Dispersion(),10,processes=1)
+    assert statistics.miss.min == statistics.miss.max == 0.0
+
+def test_batch(config):
+    "The batch engine draws the same samples"
+    dispersion = Dispersion(thrust=.01,fuelmass=.01)
+    pool = run(config,dispersion,32,processes=1)
+    batch = run(config,dispersion,32,engine='batch')
+    assert abs(batch.range.mean - pool.range.mean) < 200.0
+    assert abs(batch.range.std() - pool.range.std()) < .05*pool.range.std()
@@ -0,0 +1,38 @@
+"""Reading the presets file and its index."""
+
+import os
+import presets
+
+def write(tmpdir,entries):
+    "Path of a presets file of entries, a list of (name, entry)"
+    path = tmpdir.join('presets.txt')
+    path.write('{\n' + ''.join(['%r: %r,\n' % (name,entry) for name,entry in entries]) + '}\n')
+    return str(path)
+
+def test_index(tmpdir,catalogue):
+    path = write(tmpdir,sorted(catalogue.items()))
+    library = presets.Presets(path)
+    assert os.path.exists(presets.index_path(path))
+    assert not library.errors
+    assert sorted(library.keys()) == sorted(catalogue.keys())
+    assert dict(library.items()) == catalogue
+    #read again from the index
+    assert dict(presets.Presets(path).items()) == catalogue
+
+def test_query(tmpdir,catalogue):
+    library = presets.Presets(write(tmpdir,sorted(catalogue.items())))
+    assert library.query(country='DPRK',estrange=(1000,3000)) == ['DPRK - Nodong-A','DPRK - Nodong-A1','DPRK - TD-1']
+    assert library.query(numstages=2) == sorted([name for name,entry in catalogue.items() if entry['numstages'] == 2])
+
+def test_errors(tmpdir,catalogue):
+    name,entry = sorted(catalogue.items())[0]
+    bad = dict(entry,payload=-1)
+    text = '{\n%r: %r,\n%r: %r,\n%r: %r,\n}\n' % (name,entry,'broken',bad,name,dict(entry,payload=1.0))
+    entries,errors = presets.parse(text)
+    assert [(kept,line) for kept,value,line in entries] == [(name,2)]
+    assert entries[0][1] == entry
+    assert [(error.name,error.line) for error in errors] == [('broken',3),(name,4)]
+    library = presets.Presets(write(tmpdir,[(name,entry),('broken',bad),(name,dict(entry,payload=1.0))]))
+    assert len(library) == 1 and library.keys() == [name]
+    assert library[name] == entry
+    assert len(library.errors) == 2
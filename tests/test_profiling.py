@@ -0,0 +1,49 @@
+"""Profiles of the phases of a run."""
+
+import pytest
+import boostcache
+from sim import SimConfig,simulate
+from trajectory import RECORD_SUMMARY
+from profiling import COUNTED,aggregate
+
+@pytest.fixture
+def config(catalogue):
+    return SimConfig.from_preset(catalogue['DPRK - TD-2'],record=RECORD_SUMMARY,boost_cache=False)
+
+@pytest.mark.parametrize('integrator',['RK2','DOPRI5'])
+def test_phases(config,integrator):
+    config = config.copy(integrator=integrator)
+    plain = simulate(config)
+    result = simulate(config.copy(profile=True))
+    assert plain.profile is None
+    assert (result.range,result.apogee,result.steps) == (plain.range,plain.apogee,plain.steps)
+    profile = result.profile
+    assert [phase.name for phase in profile.phases] == ['boost 1','boost 2','coast','reentry']
+    total = profile.total()
+    assert total.steps == result.steps
+    assert abs(total.time - result.flight_time) < 1e-6
+    assert all([phase.steps > 0 and phase.calls['density'] > 0 for phase in profile.phases])
+    assert profile.phases[0].calls['Cdrag'] > 0 and profile.phases[0].calls['thrust_increase'] > 0
+    assert profile.phases[2].calls['thrust_increase'] == 0
+    assert (total.calls['derivs'] > 0) == (integrator == 'DOPRI5')
+    assert len(profile.table().splitlines()) == 6
+    #the counting wrappers are gone after the run
+    assert simulate(config.copy(profile=True)).profile.total().calls == total.calls
+
+def test_resumed_boost(config):
+    "A run resumed from the boost cache has one boost phase, with the steps of the run that flew it"
+    config = config.copy(boost_cache=boostcache.BoostCache())
+    flown = simulate(config.copy(profile=True))
+    resumed = simulate(config.copy(profile=True))
+    assert config.boost_cache.hits == 1
+    assert [phase.name for phase in resumed.profile.phases] == ['boost, cached','coast','reentry']
+    assert resumed.profile.total().steps == resumed.steps == flown.steps
+    assert resumed.profile.phases[0].steps == flown.profile.phases[0].steps + flown.profile.phases[1].steps
+
+def test_aggregate(config):
+    profiles = [simulate(config.copy(profile=True,payload=payload)).profile for payload in (800.0,900.0)]
+    total = aggregate(profiles + [None])
+    assert [phase.name for phase in total.phases] == ['boost 1','boost 2','coast','reentry']
+    assert total.total().steps == profiles[0].total().steps + profiles[1].total().steps
+    for name in COUNTED:
+        assert total.total().calls[name] == profiles[0].total().calls[name] + profiles[1].total().calls[name]
@@ -0,0 +1,41 @@
+"""Range tables solved by continuation."""
+
+import numpy
+import pytest
+from sim import SimConfig
+from trajectory import RECORD_SUMMARY
+import solver
+from rangetable import solve_table
+
+@pytest.fixture
+def config(catalogue):
+    return SimConfig.from_preset(catalogue['Russia - Scud-B'],record=RECORD_SUMMARY)
+
+TARGETS = [300e3,200e3,220e3,240e3,260e3,280e3] #out of order on purpose
+
+def test_continuation(config):
+    "Each target starts from the ones before it, so the table takes fewer runs than separate solves"
+    table = solve_table(config,solver.Payload(),TARGETS,processes=1,tolerance=10.0)
+    assert list(table.target) == sorted(TARGETS)
+    assert table.converged.all() and (abs(table.residual()) <= 10.0).all()
+    assert (numpy.diff(table.x) < 0).all() #a longer range carries less
+    separate = [solver.solve(config,solver.Payload(),target,tolerance=10.0) for target in table.target]
+    assert numpy.allclose(table.x,[solution.x for solution in separate],atol=5.0)
+    assert table.evaluations.sum() < .8*sum([solution.evaluations for solution in separate])
+    assert abs(table.lookup(250e3) - (table.x[2] + table.x[3])/2) < 1e-9
+    assert len(table.table().splitlines()) == len(TARGETS) + 1
+
+def test_segments(config):
+    "Segments solved side by side in the pool give the same table"
+    one = solve_table(config,solver.Payload(),TARGETS,processes=1,tolerance=10.0)
+    two = solve_table(config,solver.Payload(),TARGETS,processes=2,tolerance=10.0)
+    assert numpy.allclose(one.x,two.x,atol=5.0)
+    assert two.converged.all()
+
+def test_unreachable(config):
+    "Targets out of reach are reported, the rest are solved"
+    table = solve_table(config,solver.Payload(),[250e3,5000e3],processes=1,tolerance=10.0)
+    assert list(table.converged) == [True,False]
+    assert table.errors[0] is None and table.errors[1]
+    assert numpy.isnan(table.x[1]) and table.lookup(250e3) == table.x[0]
+    assert table.table().splitlines()[2].startswith("5000.000,,,")
@@ -0,0 +1,80 @@
+"""Keys and round trips of the result cache."""
+
+import pytest
+from sim import SimConfig,simulate
+from trajectory import RECORD_ALL,RECORD_STEPS,RECORD_SUMMARY
+import resultcache
+
+@pytest.fixture
+def config(catalogue):
+    return SimConfig.from_preset(catalogue['Iraq - Al-Husayn'],boost_cache=False)
+
+def same(result,other):
+    "True if two SimResults are equal to the bit"
+    if (result.range,result.apogee,result.velocity,result.flight_time,result.timed_out,result.steps) != \
+            (other.range,other.apogee,other.velocity,other.flight_time,other.timed_out,other.steps):
+        return False
+    if [event.__dict__ for event in result.events] != [event.__dict__ for event in other.events]:
+        return False
+    return result.data.size == other.data.size and \
+        (result.data.buffer[:,:result.data.size] == other.data.buffer[:,:other.data.size]).all()
+
+def test_canonical_is_stable(config):
+    key = resultcache.canonical(config)
+    assert resultcache.canonical(config.copy()) == key
+    #numbers are the same whether int or float
+    assert resultcache.canonical(config.copy(payload=int(config.payload))) == \
+        resultcache.canonical(config.copy(payload=float(config.payload)))
+    #settings the result does not depend on
+    assert resultcache.canonical(config.copy(boost_cache=True,profile=True)) == key
+    assert resultcache.canonical(config.copy(trajectory='Burnout Angle',burnout_angle=40.0,estrange=1.0)) == \
+        resultcache.canonical(config.copy(trajectory='Burnout Angle',burnout_angle=40.0,estrange=2.0))
+    #and ones it does
+    for changes in ({'payload':config.payload + 1},{'estrange':config.estrange + 1},{'step':.05},
+            {'integrator':'DOPRI5'},{'record':RECORD_SUMMARY},{'dtype':'float32'}):
+        assert resultcache.canonical(config.copy(**changes)) != key, changes
+
+def test_canonical_schema(config,monkeypatch):
+    "A new setting of SimConfig or a new engine revision changes every key"
+    key = resultcache.canonical(config)
+    changed = config.copy()
+    changed.new_setting = None
+    assert resultcache.canonical(changed) != key
+    monkeypatch.setattr(resultcache,'ENGINE_VERSION','irbm-sim %i' % (resultcache.ENGINE_REVISION + 1))
+    assert resultcache.canonical(config) != key
+
+def test_canonical_digits(config):
+    near = config.copy(payload=config.payload*(1 + 1e-9))
+    assert resultcache.canonical(near) != resultcache.canonical(config)
+    assert resultcache.canonical(near,digits=6) == resultcache.canonical(config,digits=6)
+
+@pytest.mark.parametrize('record',[RECORD_ALL,RECORD_STEPS,RECORD_SUMMARY])
+def test_pack_round_trip(config,record):
+    config = config.copy(record=record,record_every=10)
+    result = simulate(config)
+    assert same(resultcache.unpack(resultcache.pack(result),config),result)
+
+def test_cache_round_trip(tmpdir,config):
+    cache = resultcache.ResultCache(str(tmpdir))
+    config = config.copy(result_cache=cache)
+    first = simulate(config)
+    assert (cache.misses,cache.stores,cache.hits) == (1,1,0)
+    assert config in cache and len(cache) == 1
+    again = simulate(config)
+    assert cache.hits == 1
+    assert same(again,first)
+    assert same(again,simulate(config.copy(result_cache=None)))
+
+def test_summaries_only(tmpdir,config):
+    cache = resultcache.ResultCache(str(tmpdir),trajectories=False)
+    simulate(config.copy(result_cache=cache))
+    assert len(cache) == 0
+    simulate(config.copy(result_cache=cache,record=RECORD_SUMMARY))
+    assert len(cache) == 1
+
+def test_eviction(tmpdir,config):
+    cache = resultcache.ResultCache(str(tmpdir),max_bytes=1)
+    for payload in (400,500,600):
+        simulate(config.copy(result_cache=cache,payload=payload))
+    assert len(cache) <= 1
+    assert cache.evictions >= 2
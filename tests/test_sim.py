@@ -0,0 +1,46 @@
+"""Ranges of the headless scalar engine against the baseline."""
+
+import subprocess
+import sys
+import pytest
+from sim import SimConfig,simulate
+from trajectory import RECORD_ALL,RECORD_SUMMARY
+from conftest import ROOT,library
+
+#range [km] of each preset, 'Minimum Energy', by the RK2 integrator of the original sim.py
+BASELINE = {
+    'DPRK - Nodong-A':853.138,
+    'DPRK - Nodong-A1':1202.415,
+    'DPRK - Nodong-B':1916.973,
+    'DPRK - TD-1':1019.010,
+    'DPRK - TD-2':4731.353,
+    'Germany - V2':238.246,
+    'Iraq - Al-Husayn':546.679,
+    'Russia - Scud-B':297.799,
+    }
+TOLERANCE = 300.0 #[m], the stage burnouts are now found inside the step
+
+def test_presets_are_the_baseline():
+    assert sorted(library().keys()) == sorted(BASELINE.keys())
+
+@pytest.mark.parametrize('name',sorted(BASELINE.keys()))
+def test_rk2_range(catalogue,name):
+    config = SimConfig.from_preset(catalogue[name],record=RECORD_SUMMARY,boost_cache=False)
+    result = simulate(config)
+    assert not result.timed_out and result.landed
+    assert abs(result.range - BASELINE[name]*1000) < TOLERANCE
+    assert len(result.stages) == config.numstages
+
+def test_result(catalogue):
+    config = SimConfig.from_preset(catalogue['DPRK - TD-2'],record=RECORD_ALL,boost_cache=False)
+    result = simulate(config)
+    assert result.data.size == result.steps
+    assert result.data['Range'][-1] <= result.range
+    assert result.data['Height'].max() <= result.apogee
+    assert result.flight_time - config.step < result.data['Time'][-1] <= result.flight_time
+    assert [event.stage for event in result.stages] == [1,2]
+
+def test_no_wx():
+    "The engine runs without importing wx, so it can run in worker processes"
+    script = "import sys,sim,solver,sweep,batch; assert 'wx' not in sys.modules"
+    assert subprocess.call([sys.executable,'-c',script],cwd=ROOT) == 0
@@ -0,0 +1,73 @@
+"""Convergence of the root finders."""
+
+import pytest
+from sim import SimConfig,simulate
+from trajectory import RECORD_SUMMARY
+import solver
+
+@pytest.fixture
+def config(catalogue):
+    return SimConfig.from_preset(catalogue['Russia - Scud-B'],record=RECORD_SUMMARY)
+
+@pytest.mark.parametrize('method',['brent','illinois'])
+def test_solve_payload(config,method):
+    solution = solver.solve(config,solver.Payload(),250e3,method=method,tolerance=10.0)
+    assert solution.converged
+    assert abs(solution.range - 250e3) <= 10.0
+    assert solution.config.payload == solution.x
+    assert solution.x > config.payload == 1000 #a shorter range carries more, the config is not changed
+    assert solution.evaluations < 30
+
+def test_solve_agrees(config):
+    "Both methods find the same payload"
+    brent = solver.solve(config,solver.Payload(),250e3,method='brent',tolerance=1.0)
+    illinois = solver.solve(config,solver.Payload(),250e3,method='illinois',tolerance=1.0)
+    assert abs(brent.x - illinois.x) < 1.0
+
+def test_solve_out_of_reach(config):
+    with pytest.raises(solver.SolverError):
+        solver.solve(config,solver.Payload(),1000e3,lo=500.0,hi=1000.0)
+
+@pytest.mark.parametrize('method',['brent','illinois'])
+def test_burnout_jump(catalogue,method):
+    "Where the RK2 range jumps across the target, the nearer end comes back not converged"
+    config = SimConfig.from_preset(catalogue['DPRK - Nodong-A'])
+    target = 1.1*simulate(config.copy(record=RECORD_SUMMARY)).range
+    variable = solver.FuelFraction(1)
+    solution = solver.solve(config,variable,target,method=method,maxiter=25)
+    assert not solution.converged
+    assert abs(solution.range - target) > 100.0
+    #the range passes the target within a few resolutions of x
+    near = [simulate(variable.set(config,solution.x + dx).copy(record=RECORD_SUMMARY)).range - target
+        for dx in (-2*variable.resolution,2*variable.resolution)]
+    assert near[0]*near[1] < 0
+    #where the range is continuous the same solve converges
+    solution = solver.solve(config.copy(integrator='DOPRI5'),variable,target,method=method,maxiter=25)
+    assert solution.converged
+
+def test_multisection():
+    "Rounds of trials narrow an analytic root"
+    calls = []
+    def f(xs):
+        calls.append(len(xs))
+        return [x**3 - 2.0 for x in xs]
+    x,rounds = solver.multisection(f,0.0,-2.0,4.0,62.0,7,1e-12,1e-10,50)
+    assert abs(x - 2.0**(1.0/3)) < 1e-9
+    assert rounds < 15 and set(calls) == set([7])
+    with pytest.raises(solver.SolverError):
+        solver.multisection(f,0.0,-2.0,4.0,62.0,7,1e-12,1e-10,2)
+
+@pytest.mark.parametrize('engine',['pool','batch'])
+def test_solve_parallel(config,engine):
+    solution = solver.solve_parallel(config,solver.Payload(),250e3,points=4,engine=engine,tolerance=10.0)
+    assert solution.converged
+    assert abs(solution.range - 250e3) <= 10.0
+    serial = solver.solve(config,solver.Payload(),250e3,tolerance=10.0)
+    assert abs(solution.x - serial.x) < 5.0
+    assert solution.iterations < serial.evaluations
+
+def test_solve_parallel_engines(config):
+    with pytest.raises(ValueError):
+        solver.solve_parallel(config,solver.Payload(),250e3,engine='threads')
+    with pytest.raises(ValueError):
+        solver.solve_parallel(config.copy(integrator='DOPRI5'),solver.Payload(),250e3,engine='batch')
@@ -0,0 +1,60 @@
+"""Response surfaces and their error bounds."""
+
+import numpy
+import pytest
+from sim import SimConfig,simulate
+import surrogate
+
+@pytest.fixture(scope='module')
+def config(catalogue):
+    return SimConfig.from_preset(catalogue['Russia - Scud-B'],integrator='DOPRI5')
+
+@pytest.fixture(scope='module')
+def fitted(config):
+    return surrogate.build(config,processes=1)
+
+def fresh(fitted,config,count,seed):
+    "Configs at random points of the box"
+    random = numpy.random.RandomState(seed)
+    configs = []
+    for i in range(count):
+        trial = config
+        for variable,lo,hi in zip(fitted.variables,fitted.lo,fitted.hi):
+            trial = variable.set(trial,random.uniform(lo,hi))
+        configs.append(trial)
+    return configs
+
+def test_error_bounds(fitted,config):
+    "The holdout errors are those of points the fit has not seen"
+    assert fitted.holdout == 50
+    errors = []
+    for trial in fresh(fitted,config,30,9):
+        result = simulate(trial)
+        errors.append(numpy.array(fitted.estimate(trial)) - [result.range,result.apogee,result.flight_time])
+    errors = numpy.array(errors)
+    rms = numpy.sqrt((errors**2).mean(axis=0))
+    assert (rms < 2*fitted.rms).all() and (rms > fitted.rms/2).all()
+    assert (abs(errors).max(axis=0) < 2*fitted.max_error).all()
+    assert fitted.rms[0] < 200.0 #[m] of about 300 km
+
+def test_trust_region(fitted,config):
+    trial = fresh(fitted,config,1,1)[0]
+    assert fitted.inside(trial) and fitted.predict(trial) == fitted.estimate(trial)
+    for outside in (config.copy(payload=fitted.hi[0] + 10.0),config.copy(rvdiam=config.rvdiam + .1)):
+        assert not fitted.inside(outside) and fitted.estimate(outside) is None
+        assert fitted.predict(outside)[0] == simulate(outside).range
+    assert fitted.fallbacks == 2
+
+def test_save(fitted,config,tmpdir):
+    path = str(tmpdir.join('scud.npz'))
+    fitted.save(path)
+    loaded = surrogate.Surrogate.load(path)
+    trial = fresh(fitted,config,1,2)[0]
+    assert loaded.estimate(trial) == fitted.estimate(trial)
+    assert [variable.name for variable in loaded.variables] == [variable.name for variable in fitted.variables]
+    assert (loaded.rms == fitted.rms).all() and loaded.holdout == fitted.holdout
+
+def test_exponents():
+    powers = surrogate.exponents(3,2)
+    assert len(powers) == 10 and list(powers[0]) == [0,0,0]
+    assert powers.sum(axis=1).max() == 2
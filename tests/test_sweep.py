@@ -0,0 +1,43 @@
+"""Trade curves of sweep.py."""
+
+import pytest
+import numpy
+from sim import SimConfig
+import solver
+from sweep import sweep
+
+@pytest.fixture
+def config(catalogue):
+    return SimConfig.from_preset(catalogue['DPRK - Nodong-A'],integrator='DOPRI5')
+
+def test_optimal_warm_start(config):
+    "Warm started searches take fewer runs than searching each payload afresh, for the same ranges"
+    curve = sweep(config,solver.Payload(),200.0,2000.0,points=7,maxrounds=0,processes=1,optimal=True)
+    cold = [solver.maximize(solver.Payload().set(config,x)) for x in curve.x]
+    assert curve.runs < .85*sum([solution.evaluations for solution in cold])
+    for x,angle,range,solution in zip(curve.x,curve.burnout_angle,curve.range,cold):
+        assert abs(angle - solution.x) < .5, x
+        assert abs(range - solution.range) < 20.0, x
+    #the longest range falls as the payload grows
+    assert (numpy.diff(curve.range) < 0).all()
+
+def test_optimal_needs_the_pool(config):
+    with pytest.raises(ValueError):
+        sweep(config.copy(integrator='RK2'),solver.Payload(),200.0,2000.0,engine='batch',optimal=True)
+    with pytest.raises(ValueError):
+        sweep(config,solver.BurnoutAngle(),10.0,60.0,optimal=True)
+
+def test_refinement(catalogue):
+    "Points gather where the curve bends, and the straight part is left coarse"
+    config = SimConfig.from_preset(catalogue['Russia - Scud-B'],integrator='DOPRI5')
+    curve = sweep(config,solver.BurnoutAngle(),5.0,85.0,processes=1)
+    assert curve.rounds >= 1 and curve.runs == len(curve) > 9
+    spacing = numpy.diff(curve.x)
+    assert spacing[curve.x[:-1] < 60.0].max() < spacing[curve.x[:-1] > 70.0].min()
+    #the curve between its points is close to a fresh run
+    middle = (curve.x[:-1] + curve.x[1:])/2
+    fresh = [solver.simulate(solver.BurnoutAngle().set(config,x)).range for x in middle[::4]]
+    line = numpy.interp(middle[::4],curve.x,curve.range)
+    assert (abs(line - fresh) < .01*curve.range.ptp()).all()
+    assert len(sweep(config,solver.BurnoutAngle(),5.0,85.0,processes=1,maxpoints=15)) == 15
+    assert len(sweep(config,solver.BurnoutAngle(),5.0,85.0,processes=1,maxrounds=0)) == 9
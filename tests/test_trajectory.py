@@ -0,0 +1,40 @@
+"""Recording policies of the trajectory storage."""
+
+import numpy
+import pytest
+from sim import SimConfig,simulate
+from trajectory import Trajectory,RECORD_ALL,RECORD_STEPS,RECORD_SECONDS,RECORD_SUMMARY
+
+@pytest.fixture(scope='module')
+def runs(catalogue):
+    config = SimConfig.from_preset(catalogue['Russia - Scud-B'],boost_cache=False)
+    return dict((record,simulate(config.copy(record=record,record_every=every)))
+        for record,every in ((RECORD_ALL,1),(RECORD_STEPS,10),(RECORD_SECONDS,5.0),(RECORD_SUMMARY,1)))
+
+def test_summary_unchanged(runs):
+    full = runs[RECORD_ALL]
+    for result in runs.values():
+        assert (result.range,result.apogee,result.flight_time,result.steps) == \
+            (full.range,full.apogee,full.flight_time,full.steps)
+        assert [(event.kind,event.t) for event in result.events] == [(event.kind,event.t) for event in full.events]
+
+def test_samples(runs):
+    full = runs[RECORD_ALL].data
+    assert full.size == runs[RECORD_ALL].steps
+    assert (runs[RECORD_STEPS].data['Time'] == full['Time'][::10]).all()
+    seconds = runs[RECORD_SECONDS].data['Time']
+    assert len(seconds) == int(full['Time'][-1]/5.0 + 1e-9) + 1
+    assert (numpy.diff(numpy.floor(seconds/5.0 + 1e-9)) == 1).all()
+    summary = runs[RECORD_SUMMARY].data
+    assert summary.size == 0 and summary.buffer.size == 0
+
+@pytest.mark.parametrize('record,every',[(RECORD_ALL,1),(RECORD_STEPS,3),(RECORD_SECONDS,.25),(RECORD_SUMMARY,1)])
+def test_due_times_matches_due(record,every):
+    times = numpy.cumsum(numpy.full(200,.1))
+    one,many = Trajectory(record=record,every=every),Trajectory(record=record,every=every)
+    expected = [one.due(t) for t in times]
+    assert list(many.due_times(times[:77])) + list(many.due_times(times[77:])) == expected
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Trajectory(record='often')
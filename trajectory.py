@@ -0,0 +1,112 @@
+"""Storage for the trajectory of one run.
+
+Samples go into a preallocated NumPy array with one row per quantity, grown in
+chunks, instead of one Python list of boxed floats per quantity. Indexing by
+quantity name gives the filled part of its row, a contiguous array ready for
+plotting and export.
+
+A recording policy decides which steps are kept: every step, every k-th step,
+one step per N seconds, or none at all for runs that only need the summary."""
+
+import numpy
+from math import floor
+
+#quantities recorded at each sample, in the order append takes them
+#units: sec, m, kg, m/s, N, N, radians from horizontal, m
+COLUMNS = ('Time','Height','Mass','Velocity','Thrust','Drag','Gamma','Range')
+
+#recording policies
+RECORD_ALL = 'all' #every integration step
+RECORD_STEPS = 'steps' #every k-th step
+RECORD_SECONDS = 'seconds' #first step at or after each multiple of N seconds
+RECORD_SUMMARY = 'summary' #no samples, only events and final results
+
+class Trajectory(object):
+    """Samples of a trajectory, read like the old results dict of lists:
+    data['Height'] is an array of heights in order of time.
+    dtype may be float32 to halve the memory again, at 7 significant digits.
+    record is one of the policies above, every the k or N it needs."""
+    def __init__(self,dtype=numpy.float64,chunk=4096,record=RECORD_ALL,every=1):
+        if record not in (RECORD_ALL,RECORD_STEPS,RECORD_SECONDS,RECORD_SUMMARY):
+            raise ValueError("unknown recording policy %r" % record)
+        self.record = record
+        self.every = every
+        self.count = 0 #steps offered to due()
+        self.next_time = 0 #for RECORD_SECONDS, in multiples of every
+        if record == RECORD_SUMMARY:
+            chunk = 0
+        self.chunk = chunk
+        self.buffer = numpy.empty((len(COLUMNS),chunk),dtype)
+        self.size = 0 #samples filled
+
+    def due(self,t):
+        "True if the step ending at time t is to be saved"
+        if self.record == RECORD_ALL:
+            return True
+        if self.record == RECORD_SUMMARY:
+            return False
+        if self.record == RECORD_STEPS:
+            self.count += 1
+            return (self.count - 1) % self.every == 0
+        #slack for step times summed in floating point, like 4.9999999
+        n = t/self.every + 1e-9
+        if n >= self.next_time:
+            self.next_time = floor(n) + 1
+            return True
+        return False
+
+    def due_times(self,times):
+        """Mask of the steps ending at an array of times that are to be saved,
+        as due() called for each in turn"""
+        times = numpy.asarray(times,dtype=float)
+        if self.record == RECORD_ALL:
+            return numpy.ones(len(times),dtype=bool)
+        if self.record == RECORD_SUMMARY:
+            return numpy.zeros(len(times),dtype=bool)
+        if self.record == RECORD_STEPS:
+            keep = (self.count + numpy.arange(len(times))) % self.every == 0
+            self.count += len(times)
+            return keep
+        n = numpy.floor(times/self.every + 1e-9)
+        keep = n >= self.next_time
+        keep[1:] &= n[1:] != n[:-1]
+        if keep.any():
+            self.next_time = n[keep][-1] + 1
+        return keep
+
+    def append(self,t,h,m,v,thrust,drag,gamma,range):
+        "Adds one sample, growing the buffer when full"
+        if self.size == self.buffer.shape[1]:
+            self.grow()
+        self.buffer[:,self.size] = (t,h,m,v,thrust,drag,gamma,range)
+        self.size += 1
+
+    def extend(self,t,h,m,v,thrust,drag,gamma,range):
+        "Adds samples from arrays of equal length, scalars apply to all of them"
+        count = len(t)
+        if self.size + count > self.buffer.shape[1]:
+            self.grow(self.size + count)
+        for row,values in enumerate((t,h,m,v,thrust,drag,gamma,range)):
+            self.buffer[row,self.size:self.size + count] = values
+        self.size += count
+
+    def grow(self,needed=0):
+        "Doubles the capacity, in whole chunks, or more if needed samples would not fit"
+        capacity = self.buffer.shape[1]
+        capacity_new = max(capacity + max(capacity,self.chunk),needed)
+        buffer = numpy.empty((len(COLUMNS),capacity_new),self.buffer.dtype)
+        buffer[:,:capacity] = self.buffer
+        self.buffer = buffer
+
+    def __getitem__(self,name):
+        return self.buffer[COLUMNS.index(name),:self.size]
+
+    def __contains__(self,name):
+        return name in COLUMNS
+
+    def keys(self):
+        return list(COLUMNS)
+
+    def nbytes(self):
+        "Memory held by the samples filled so far"
+        return self.size*len(COLUMNS)*self.buffer.itemsize